@@ -0,0 +1,80 @@
+"""Ingest throughput benchmark for AcmiParser.parse_file.
+
+Builds a scaled-up copy of ``data/samples/full_flight_sim.acmi`` (several
+aircraft, timeline repeated) and parses it twice: once with row-at-a-time
+writes and default PRAGMAs, once with the batched writer and ingest PRAGMAs,
+then once per extra ``--workers`` count in parallel decode mode.
+
+Run from the repo root:
+    python -m benchmarks.bench_ingest --aircraft 8 --repeat 20 --workers 2 4
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from src.db_init import init_db
+from src.parser import AcmiParser
+
+SAMPLE = os.path.join("data", "samples", "full_flight_sim.acmi")
+
+
+def build_scaled_sample(path, aircraft=8, repeat=20, source=SAMPLE):
+    with open(source, "r", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    header = [l for l in lines if l.startswith("0,")]
+    body = [l for l in lines if not l.startswith("0,")]
+    frame_times = [float(l[1:]) for l in body if l.startswith("#")]
+    span = (max(frame_times) + 1.0) if frame_times else 1.0
+
+    with open(path, "w", encoding="utf-8") as out:
+        out.write("\n".join(header) + "\n")
+        for r in range(repeat):
+            base = r * span
+            for line in body:
+                if line.startswith("#"):
+                    out.write(f"#{float(line[1:]) + base:.2f}\n")
+                    continue
+                obj_id, rest = line.split(",", 1)
+                for a in range(aircraft):
+                    out.write(f"{int(obj_id) + a:x},{rest}\n")
+    return os.path.getsize(path)
+
+
+def run_parse(acmi_path, db_path, **parser_kwargs):
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    init_db(db_path)
+    started = time.perf_counter()
+    AcmiParser(db_path=db_path, **parser_kwargs).parse_file(acmi_path)
+    return time.perf_counter() - started
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--aircraft", type=int, default=8)
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--workers", type=int, nargs="*", default=[], help="parallel worker counts to compare")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        acmi_path = os.path.join(tmp, "scaled.acmi")
+        size = build_scaled_sample(acmi_path, args.aircraft, args.repeat)
+        mb = size / (1024 * 1024)
+        print(f"Scaled sample: {mb:.1f} MB ({args.aircraft} aircraft x {args.repeat} repeats)")
+
+        cases = [
+            ("row-at-a-time", dict(batch_size=1, tune_pragmas=False)),
+            ("batched", dict()),
+        ]
+        cases += [(f"{w} workers", dict(workers=w)) for w in args.workers if w > 1]
+        timings = {}
+        for label, kwargs in cases:
+            elapsed = run_parse(acmi_path, os.path.join(tmp, f"{label}.db"), **kwargs)
+            timings[label] = elapsed
+            print(f"{label:>14}: {elapsed:7.2f}s  {mb / elapsed:6.2f} MB/s  (~{elapsed * 100 / mb:.0f}s per 100MB)")
+        print(f"speedup: {timings['row-at-a-time'] / timings['batched']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
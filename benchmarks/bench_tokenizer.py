@@ -0,0 +1,101 @@
+"""Line tokenizer microbenchmark.
+
+Compares the per-line work parse_file used to do (split into a fields dict,
+then re.search for T=/IAS=/G= and a fresh float closure per line) with
+src.tokenizer.tokenize_line on a synthetic ACMI file.
+
+Run from the repo root:
+    python -m benchmarks.bench_tokenizer --lines 2000000
+"""
+import argparse
+import math
+import os
+import re
+import tempfile
+import time
+
+from src.tokenizer import AcmiRecord, tokenize_line, iter_logical_lines
+
+
+def write_synthetic(path, n_lines, aircraft=16):
+    written = 0
+    frame = 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("0,ReferenceTime=2026-02-01T10:00:00Z,ReferenceLongitude=40,ReferenceLatitude=41\n")
+        while written < n_lines:
+            f.write(f"#{frame * 0.2:.2f}\n")
+            written += 1
+            for a in range(aircraft):
+                r = 30 * math.sin(frame / 10 + a)
+                f.write(f"{a + 1:x},T={0.001 * frame:.6f}|{0.0002 * a:.6f}|{3000 + a}|{r:.2f}|2.5|{(frame + a) % 360}"
+                        f"|{frame * 10.5:.1f}|{a * 7.25:.1f}|{(frame + a) % 360},IAS={250 + a},G={1 + abs(r) / 10:.2f}\n")
+                written += 1
+
+
+def legacy_scan(line):
+    if line.startswith('#'):
+        return float(line[1:])
+    parts = line.split(',', 1)
+    fields = {}
+    if len(parts) > 1:
+        for seg in parts[1].split(','):
+            if '=' in seg:
+                k, v = seg.split('=', 1)
+                fields[k] = v
+    t_match = re.search(r'T=([^,]*)', line)
+    if t_match:
+        coords = t_match.group(1).split('|')
+
+        def to_float_nullable(v):
+            try:
+                return float(v) if v != '' else None
+            except ValueError:
+                return None
+
+        vals = [to_float_nullable(coords[i]) if len(coords) > i else None for i in range(9)]
+        ias = 0
+        ias_match = re.search(r'IAS=([^,]*)', line)
+        if ias_match: ias = float(ias_match.group(1))
+        g_force = 1.0
+        g_match = re.search(r'G=([^,]*)', line)
+        if g_match: g_force = float(g_match.group(1))
+        return vals, ias, g_force, fields
+
+
+def tokenizer_scan(line, rec):
+    tokenize_line(line, rec)
+    if rec.coords is not None:
+        return rec.coords, rec.get('IAS', 0), rec.get('G', 1.0), rec.props
+
+
+def time_pass(path, fn):
+    count = 0
+    started = time.perf_counter()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in iter_logical_lines(f):
+            fn(line)
+            count += 1
+    return count, time.perf_counter() - started
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--lines", type=int, default=2_000_000)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.acmi")
+        write_synthetic(path, args.lines)
+        print(f"Synthetic file: {os.path.getsize(path) / (1024 * 1024):.1f} MB")
+
+        rec = AcmiRecord()
+        results = {}
+        for label, fn in [("regex (before)", legacy_scan), ("tokenizer (after)", lambda l: tokenizer_scan(l, rec))]:
+            count, elapsed = time_pass(path, fn)
+            results[label] = count / elapsed
+            print(f"{label:>18}: {count:,} lines in {elapsed:.2f}s  ->  {count / elapsed:,.0f} lines/sec")
+        print(f"speedup: {results['tokenizer (after)'] / results['regex (before)']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
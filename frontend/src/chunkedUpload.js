@@ -0,0 +1,53 @@
+// Client for the resumable upload protocol (see src/uploads.py).
+const MAX_RETRIES = 5;
+// Files up to this size are hashed in the browser first, so a recording the
+// server already has is not sent again.
+const HASH_MAX_BYTES = 256 * 1024 * 1024;
+
+async function json(res) {
+    const data = await res.json().catch(() => ({}));
+    if (!res.ok) throw new Error(data.detail || `HTTP ${res.status}`);
+    return data;
+}
+
+async function sha256Hex(file) {
+    if (!globalThis.crypto?.subtle || file.size > HASH_MAX_BYTES) return null;
+    const digest = await crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+    return Array.from(new Uint8Array(digest), (b) => b.toString(16).padStart(2, '0')).join('');
+}
+
+// Uploads `file` in parts and returns the finalize response ({ job_id, sortie_id, deduplicated, ... }).
+// A failed part is retried from the offset the server reports.
+export async function uploadFile(file, onProgress = () => {}) {
+    const sha256 = await sha256Hex(file);
+    const init = await json(await fetch('/api/uploads', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ file_name: file.name, size: file.size, sha256 }),
+    }));
+    if (init.deduplicated) {
+        onProgress(100);
+        return init;
+    }
+    const url = `/api/uploads/${init.upload_id}`;
+    let offset = 0;
+    let retries = 0;
+    while (offset < file.size) {
+        const part = file.slice(offset, offset + init.chunk_size);
+        try {
+            const status = await json(await fetch(`${url}?offset=${offset}`, { method: 'PUT', body: part }));
+            offset = status.offset;
+            retries = 0;
+        } catch (err) {
+            if (++retries > MAX_RETRIES) throw err;
+            await new Promise((resolve) => setTimeout(resolve, 500 * retries));
+            offset = (await json(await fetch(url))).offset;
+        }
+        onProgress(Math.round((offset / file.size) * 100));
+    }
+    return json(await fetch(`${url}/finalize`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ sha256 }),
+    }));
+}
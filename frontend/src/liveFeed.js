@@ -0,0 +1,37 @@
+// Client for live sessions (see src/realtime.py). Keeps the latest state of every object:
+// objects: obj_id -> [lon, lat, alt, roll, pitch, yaw, u, v, heading], meta: obj_id -> { name, type, ... }.
+const decoder = new TextDecoder();
+
+export function watchLive(sessionId, { onUpdate = () => {}, onEnd = () => {} } = {}) {
+    const scheme = location.protocol === 'https:' ? 'wss' : 'ws';
+    const ws = new WebSocket(`${scheme}://${location.host}/api/live/${sessionId}/ws`);
+    ws.binaryType = 'arraybuffer';
+    const state = { n: 0, t: 0, sortieId: null, objects: new Map(), meta: new Map() };
+
+    ws.onmessage = (event) => {
+        const msg = JSON.parse(decoder.decode(event.data));
+        if (msg.type === 'end') {
+            onEnd(msg);
+            return;
+        }
+        if (msg.type === 'snapshot') {
+            state.objects = new Map(Object.entries(msg.objects));
+            state.meta = new Map(Object.entries(msg.meta));
+        } else if (msg.n <= state.n) {
+            // already part of the snapshot we were sent after falling behind
+            return;
+        } else {
+            for (const [id, s] of Object.entries(msg.objects)) state.objects.set(id, s);
+            for (const [id, m] of Object.entries(msg.meta)) state.meta.set(id, m);
+            for (const id of msg.removed) {
+                state.objects.delete(id);
+                state.meta.delete(id);
+            }
+        }
+        state.n = msg.n;
+        state.t = msg.t;
+        state.sortieId = msg.sortie_id;
+        onUpdate(state, msg);
+    };
+    return () => ws.close();
+}
@@ -0,0 +1,33 @@
+// Decoder for the packed column telemetry format (see src/packed.py).
+export const PACKED_MEDIA_TYPE = 'application/vnd.dcs-webtac.columns';
+
+const ARRAY_TYPES = { f8: Float64Array, f4: Float32Array, u4: Uint32Array };
+
+export function decodeColumns(buffer) {
+    const view = new DataView(buffer);
+    const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+    if (magic !== 'DWTC') throw new Error('Not a packed telemetry response');
+    const headerLen = view.getUint32(4, true);
+    const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 8, headerLen)));
+    const columns = {};
+    for (const spec of header.columns) {
+        columns[spec.name] = new ARRAY_TYPES[spec.dtype](buffer, spec.offset, header.rows);
+    }
+    return { rows: header.rows, columns, dictionaries: header.dictionaries };
+}
+
+// Row objects shaped like the JSON response (NaN -> null).
+export function columnsToRows({ rows, columns, dictionaries }) {
+    const names = Object.keys(columns);
+    const out = new Array(rows);
+    for (let i = 0; i < rows; i++) {
+        const row = {};
+        for (const name of names) {
+            const v = columns[name][i];
+            const dict = dictionaries[name];
+            row[name] = dict ? dict[v] : (Number.isNaN(v) ? null : v);
+        }
+        out[i] = row;
+    }
+    return out;
+}
@@ -0,0 +1,183 @@
+"""Compressed line archive of ingested ACMI recordings.
+
+Instead of a JSON ``raw`` payload per telemetry row, the parser can keep the
+original logical lines in a block-compressed archive and store only the line
+number (``telemetry.raw_line``). Raw payloads are rebuilt on demand for the
+rows that are actually requested.
+
+File layout (``data/archive/<sortie_id>.acmiz``)::
+
+    [zlib block 0][zlib block 1]...      up to BLOCK_LINES lines each, NUL separated
+    [int64 offsets x (n_blocks + 1)]     block start offsets + end of last block
+    [int64 first line x (n_blocks + 1)]  first line number of each block + total lines
+    [uint32 block_lines][uint64 n_blocks][8-byte MAGIC]
+
+Blocks are normally ``BLOCK_LINES`` long; a parse checkpoint closes the
+current block early so the file on disk holds exactly the checkpointed
+lines (see ``ArchiveWriter.checkpoint``).
+"""
+import bisect
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+
+MAGIC = b'DWTACMZ2'
+BLOCK_LINES = 4096
+SEPARATOR = '\0'
+_FOOTER = struct.Struct('<IQ8s')
+
+
+def archive_root(db_path):
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), 'archive')
+
+
+def archive_path(db_path, sortie_id):
+    return os.path.join(archive_root(db_path), f"{sortie_id}.acmiz")
+
+
+class ArchiveWriter:
+    def __init__(self, path, block_lines=BLOCK_LINES, state=None):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.tmp_path = path
+        self.block_lines = block_lines
+        self._buf = []
+        if state is None:
+            self._f = open(path, 'wb')
+            self._offsets = []
+            self._starts = []
+            self.lines = 0
+        else:
+            # resume: drop whatever was written after the checkpoint
+            self._f = open(path, 'r+b')
+            self._f.truncate(state["bytes"])
+            self._f.seek(state["bytes"])
+            self._offsets = list(state["offsets"])
+            self._starts = list(state["starts"])
+            self.lines = state["lines"]
+
+    def checkpoint(self):
+        """Close the current block and sync; returns the state to resume from."""
+        self._flush_block()
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        return {"path": self.tmp_path, "bytes": self._f.tell(), "offsets": list(self._offsets),
+                "starts": list(self._starts), "lines": self.lines}
+
+    @classmethod
+    def resume(cls, state, block_lines=BLOCK_LINES):
+        return cls(state["path"], block_lines, state)
+
+    def append(self, line):
+        """Archive one logical line and return its line number."""
+        self._buf.append(line)
+        n = self.lines
+        self.lines += 1
+        if len(self._buf) >= self.block_lines:
+            self._flush_block()
+        return n
+
+    def _flush_block(self):
+        if not self._buf:
+            return
+        data = SEPARATOR.join(self._buf).encode('utf-8', errors='replace')
+        self._offsets.append(self._f.tell())
+        self._starts.append(self.lines - len(self._buf))
+        self._f.write(zlib.compress(data, 6))
+        self._buf = []
+
+    def close(self, final_path=None):
+        self._flush_block()
+        offsets = self._offsets + [self._f.tell()]
+        starts = self._starts + [self.lines]
+        self._f.write(struct.pack(f'<{len(offsets)}q', *offsets))
+        self._f.write(struct.pack(f'<{len(starts)}q', *starts))
+        self._f.write(_FOOTER.pack(self.block_lines, len(self._offsets), MAGIC))
+        self._f.close()
+        if final_path and final_path != self.tmp_path:
+            os.replace(self.tmp_path, final_path)
+            return final_path
+        return self.tmp_path
+
+    def abort(self):
+        self._f.close()
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
+
+
+class ArchiveReader:
+    """Random access to archived lines, with a small decompressed-block cache."""
+
+    def __init__(self, path, cache_blocks=16):
+        self.path = path
+        self._cache = OrderedDict()
+        self._cache_blocks = cache_blocks
+        self._lock = threading.Lock()
+        with open(path, 'rb') as f:
+            f.seek(-_FOOTER.size, os.SEEK_END)
+            self.block_lines, n_blocks, magic = _FOOTER.unpack(f.read(_FOOTER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not an ACMI line archive")
+            table = 8 * (n_blocks + 1)
+            f.seek(-_FOOTER.size - 2 * table, os.SEEK_END)
+            self._offsets = struct.unpack(f'<{n_blocks + 1}q', f.read(table))
+            self._starts = struct.unpack(f'<{n_blocks + 1}q', f.read(table))
+
+    def _block(self, i):
+        with self._lock:
+            block = self._cache.get(i)
+            if block is not None:
+                self._cache.move_to_end(i)
+                return block
+        start, end = self._offsets[i], self._offsets[i + 1]
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            block = zlib.decompress(f.read(end - start)).decode('utf-8').split(SEPARATOR)
+        with self._lock:
+            self._cache[i] = block
+            while len(self._cache) > self._cache_blocks:
+                self._cache.popitem(last=False)
+        return block
+
+    def line(self, line_no):
+        block = bisect.bisect_right(self._starts, line_no) - 1
+        return self._block(block)[line_no - self._starts[block]]
+
+    def lines(self, line_nos):
+        """Map each requested line number to its line, touching each block once."""
+        out = {}
+        for n in sorted(set(line_nos)):
+            out[n] = self.line(n)
+        return out
+
+
+_readers = {}
+_readers_lock = threading.Lock()
+
+
+def open_reader(db_path, sortie_id):
+    """Shared ArchiveReader for ``sortie_id``, or None if no archive exists."""
+    path = archive_path(db_path, sortie_id)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    with _readers_lock:
+        cached = _readers.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, ArchiveReader(path))
+            _readers[path] = cached
+        return cached[1]
+
+
+def delete_archive(db_path, sortie_id):
+    path = archive_path(db_path, sortie_id)
+    with _readers_lock:
+        _readers.pop(path, None)
+    try:
+        os.remove(path)
+    except OSError:
+        pass
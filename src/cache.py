@@ -0,0 +1,70 @@
+"""Byte-bounded in-process LRU caches.
+
+Keys are tuples whose first element is the sortie id, so everything
+cached for a sortie can be dropped at once when it is re-parsed or
+deleted. Callers pass the size of each value; eviction keeps the total
+under ``max_bytes``.
+"""
+import threading
+from collections import OrderedDict
+
+
+class SizedLRU:
+    def __init__(self, max_bytes, max_entry_bytes=None):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes or max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, nbytes):
+        """Store ``value``; values larger than ``max_entry_bytes`` are not kept."""
+        if nbytes > self.max_entry_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = (value, nbytes)
+            self.bytes += nbytes
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+
+    def invalidate(self, sortie_id):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == sortie_id]:
+                self.bytes -= self._entries.pop(key)[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+
+def columns_nbytes(columns):
+    """Approximate memory held by a dict of column arrays (strings counted by length)."""
+    total = 0
+    for arr in columns.values():
+        if arr.dtype == object:
+            total += 8 * len(arr) + sum(len(v) + 49 for v in arr if isinstance(v, str))
+        else:
+            total += arr.nbytes
+    return total
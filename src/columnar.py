@@ -0,0 +1,293 @@
+"""Columnar per-sortie telemetry store.
+
+At the end of ingest each sortie's telemetry is written next to the SQLite
+database as one ``.npy`` file per channel, rows grouped by object and sorted
+by time::
+
+    data/columns/<sortie_id>/index.json     object -> [start, stop) row range
+    data/columns/<sortie_id>/<channel>.npy  float64 (``id`` is int64)
+
+Reads memory-map the arrays, so a time-range query for one object is a
+binary search on ``time_offset`` plus slices of the other channels. SQLite
+stays the source of truth; sorties without a store fall back to SQL.
+
+Each object also gets a level-of-detail pyramid: level k keeps roughly
+1/4**k of the samples (LTTB on altitude plus every event sample) and is
+stored as sorted row positions into the full-resolution arrays::
+
+    data/columns/<sortie_id>/lod_<factor>.npy  int64 row positions
+
+Queries with a point budget read the coarsest level that still has enough
+samples in the window, so overview loads do not scale with track length.
+"""
+import json
+import os
+import shutil
+from functools import lru_cache
+
+import numpy as np
+
+from . import downsample as sampling
+
+LOD_FACTOR = 4
+# stop adding levels once a level is this small
+LOD_MIN_POINTS = 1024
+
+CHANNELS = (
+    'time_offset',
+    'lat', 'lon', 'alt',
+    'roll', 'pitch', 'yaw',
+    'u', 'v', 'heading',
+    'ias', 'mach', 'g_force', 'fuel_remaining',
+    'tas', 'ground_speed', 'vertical_speed', 'turn_rate', 'specific_energy',
+)
+
+
+def store_root(db_path):
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), 'columns')
+
+
+def store_dir(db_path, sortie_id):
+    return os.path.join(store_root(db_path), str(sortie_id))
+
+
+def build_levels(columns, factor=LOD_FACTOR, min_points=LOD_MIN_POINTS):
+    """Index arrays of the LOD levels of one time-ordered track, finest first.
+
+    Each level is LTTB on altitude over the previous level with ``1/factor``
+    of its points, plus every event sample of the full-resolution track.
+    Levels stop when they get small or stop shrinking (event-dense tracks).
+    """
+    t = columns['time_offset']
+    events = np.flatnonzero(sampling.event_mask(columns))
+    alt = columns['alt']
+    levels = []
+    prev = np.arange(len(t))
+    while len(prev) > min_points:
+        picked = prev[sampling.lttb_indices(t[prev], alt[prev], len(prev) // factor)]
+        level = np.union1d(picked, events)
+        if len(level) * 2 > len(prev):
+            break
+        levels.append(level)
+        prev = level
+    return levels
+
+
+def write_store(conn, db_path, sortie_id):
+    """Build the columnar store for ``sortie_id`` from its telemetry rows.
+
+    Objects are copied one at a time into memory-mapped output files, so
+    memory use is bounded by the largest single track. The store is written
+    to a temporary directory and renamed into place.
+    """
+    counts = conn.execute(
+        "SELECT obj_id, count(*) FROM telemetry WHERE sortie_id = ? GROUP BY obj_id ORDER BY obj_id",
+        (sortie_id,)
+    ).fetchall()
+    final_dir = store_dir(db_path, sortie_id)
+    total = sum(n for _, n in counts)
+    if not total:
+        return None
+    tmp_dir = final_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    ids = np.lib.format.open_memmap(os.path.join(tmp_dir, 'id.npy'), mode='w+', dtype=np.int64, shape=(total,))
+    columns = {
+        ch: np.lib.format.open_memmap(os.path.join(tmp_dir, f'{ch}.npy'), mode='w+', dtype=np.float64, shape=(total,))
+        for ch in CHANNELS
+    }
+    objects = {}
+    lod = []
+    select = f"SELECT id, {', '.join(CHANNELS)} FROM telemetry WHERE sortie_id = ? AND obj_id = ? ORDER BY time_offset, id"
+    pos = 0
+    for obj_id, n in counts:
+        rows = conn.execute(select, (sortie_id, obj_id)).fetchall()
+        block = np.array(rows, dtype=np.float64).reshape(len(rows), len(CHANNELS) + 1)
+        ids[pos:pos + n] = block[:, 0].astype(np.int64)
+        for i, ch in enumerate(CHANNELS, start=1):
+            columns[ch][pos:pos + n] = block[:, i]
+        objects[obj_id] = [pos, pos + n]
+        track = {ch: block[:, i] for i, ch in enumerate(CHANNELS, start=1)}
+        for k, level in enumerate(build_levels(track)):
+            if k == len(lod):
+                lod.append({})
+            lod[k][obj_id] = level + pos
+        pos += n
+
+    for arr in [ids, *columns.values()]:
+        arr.flush()
+    del ids, columns
+
+    levels = []
+    for k, per_object in enumerate(lod, start=1):
+        factor = LOD_FACTOR ** k
+        ranges, start = {}, 0
+        for obj_id, positions in per_object.items():
+            ranges[obj_id] = [start, start + len(positions)]
+            start += len(positions)
+        np.save(os.path.join(tmp_dir, f'lod_{factor}.npy'), np.concatenate(list(per_object.values())))
+        levels.append({"factor": factor, "objects": ranges})
+
+    with open(os.path.join(tmp_dir, 'index.json'), 'w', encoding='utf-8') as f:
+        json.dump({"rows": total, "channels": list(CHANNELS), "objects": objects,
+                   "lod": levels}, f)
+
+    shutil.rmtree(final_dir, ignore_errors=True)
+    os.replace(tmp_dir, final_dir)
+    return final_dir
+
+
+def delete_store(db_path, sortie_id):
+    shutil.rmtree(store_dir(db_path, sortie_id), ignore_errors=True)
+
+
+class ColumnStore:
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'index.json'), encoding='utf-8') as f:
+            index = json.load(f)
+        self.rows = index["rows"]
+        self.objects = {k: tuple(v) for k, v in index["objects"].items()}
+        # coarsest level first
+        self.levels = sorted(index["lod"], key=lambda lv: -lv["factor"])
+        self._arrays = {}
+
+    def column(self, name):
+        arr = self._arrays.get(name)
+        if arr is None:
+            arr = self._arrays[name] = np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode='r')
+        return arr
+
+    def object_range(self, obj_id, start=None, end=None):
+        """Row range [lo, hi) of ``obj_id`` with start <= time_offset <= end."""
+        lo, hi = self.objects[obj_id]
+        t = self.column('time_offset')[lo:hi]
+        a = int(np.searchsorted(t, start, side='left')) if start is not None else 0
+        b = int(np.searchsorted(t, end, side='right')) if end is not None else hi - lo
+        return lo + a, lo + b
+
+    def level_positions(self, obj_id, lo, hi, budget):
+        """Row positions in [lo, hi) from the coarsest LOD level with at least ``budget`` of them.
+
+        Returns None when only the full-resolution track is dense enough.
+        """
+        for level in self.levels:
+            r = level["objects"].get(obj_id)
+            if r is None:
+                continue
+            positions = self.column(f'lod_{level["factor"]}')[r[0]:r[1]]
+            a = int(np.searchsorted(positions, lo))
+            b = int(np.searchsorted(positions, hi))
+            if b - a >= budget:
+                return positions[a:b]
+        return None
+
+    def query(self, obj_id=None, start=None, end=None, limit=None, channels=CHANNELS, target_points=None):
+        """Columns for a time window, ordered by time_offset.
+
+        Returns a dict of numpy arrays (``channels`` plus ``id`` and
+        ``obj_id``). For a single object the arrays are slices of the
+        memory map; several objects are merged with a stable sort on time.
+        With ``target_points`` each object is read from the coarsest LOD
+        level that still has its share of the budget in the window.
+        """
+        if obj_id is not None:
+            obj_ids = [obj_id] if obj_id in self.objects else []
+        else:
+            obj_ids = list(self.objects)
+        ranges = [(o, *self.object_range(o, start, end)) for o in obj_ids]
+        ranges = [r for r in ranges if r[2] > r[1]]
+
+        selections = []
+        window_rows = sum(hi - lo for _, lo, hi in ranges)
+        for o, lo, hi in ranges:
+            sel = slice(lo, hi)
+            if target_points:
+                positions = self.level_positions(o, lo, hi, target_points * (hi - lo) / window_rows)
+                if positions is not None:
+                    sel = positions
+            selections.append((o, sel))
+
+        names = ('id',) + tuple(channels)
+        if len(selections) == 1:
+            o, sel = selections[0]
+            if limit:
+                sel = sel[:limit] if isinstance(sel, np.ndarray) else slice(sel.start, min(sel.stop, sel.start + limit))
+            out = {name: self.column(name)[sel] for name in names}
+            out['obj_id'] = np.full(len(out['id']), o, dtype=object)
+            return out
+
+        parts = [{name: self.column(name)[sel] for name in names} for _, sel in selections]
+        out = {name: np.concatenate([p[name] for p in parts]) if parts
+               else np.empty(0, dtype=self.column(name).dtype) for name in names}
+        out['obj_id'] = np.concatenate([np.full(len(p['id']), o, dtype=object) for (o, _), p in zip(selections, parts)]) \
+            if parts else np.empty(0, dtype=object)
+        order = np.lexsort((out['id'], out['time_offset']))
+        if limit:
+            order = order[:limit]
+        return {name: arr[order] for name, arr in out.items()}
+
+    def page(self, obj_id=None, start=None, end=None, after=None, page_size=1000, channels=CHANNELS):
+        """Up to ``page_size`` rows ordered by (obj_id, time_offset, id), strictly after ``after``.
+
+        ``after`` is the (obj_id, time_offset, id) key of the previous page's
+        last row. Store rows are already in this order, so a page is a binary
+        search plus slices.
+        """
+        names = ('id',) + tuple(channels)
+        obj_ids = [obj_id] if obj_id is not None else list(self.objects)
+        parts, taken = [], 0
+        for o in obj_ids:
+            if o not in self.objects or (after is not None and o < after[0]):
+                continue
+            lo, hi = self.object_range(o, start, end)
+            if after is not None and o == after[0]:
+                t = self.column('time_offset')
+                lo += int(np.searchsorted(t[lo:hi], after[1], side='left'))
+                ids = self.column('id')
+                while lo < hi and t[lo] == after[1] and ids[lo] <= after[2]:
+                    lo += 1
+            hi = min(hi, lo + page_size - taken)
+            if hi > lo:
+                part = {name: self.column(name)[lo:hi] for name in names}
+                part['obj_id'] = np.full(hi - lo, o, dtype=object)
+                parts.append(part)
+                taken += hi - lo
+            if taken >= page_size:
+                break
+        if not parts:
+            out = {name: np.empty(0, dtype=self.column(name).dtype) for name in names}
+            out['obj_id'] = np.empty(0, dtype=object)
+            return out
+        return {name: np.concatenate([p[name] for p in parts]) for name in parts[0]}
+
+
+@lru_cache(maxsize=32)
+def _open_cached(path, mtime):
+    return ColumnStore(path)
+
+
+def open_store(db_path, sortie_id):
+    """ColumnStore for ``sortie_id``, or None if it has not been built."""
+    path = store_dir(db_path, sortie_id)
+    try:
+        mtime = os.stat(os.path.join(path, 'index.json')).st_mtime_ns
+    except OSError:
+        return None
+    return _open_cached(path, mtime)
+
+
+def to_rows(columns):
+    """Convert query() output to row dicts, mapping non-finite floats to None."""
+    names = [k for k in columns if k != 'id']
+    lists = []
+    for name in names:
+        arr = columns[name]
+        if arr.dtype.kind == 'f':
+            obj = arr.astype(object)
+            obj[~np.isfinite(arr)] = None
+            lists.append(obj.tolist())
+        else:
+            lists.append(arr.tolist())
+    return [dict(zip(names, values)) for values in zip(*lists)]
@@ -1,12 +1,165 @@
+"""SQLite connections for the API.
+
+Request handlers share a bounded pool of connections per database file
+instead of opening one per request. Each connection is configured once
+when it is created (WAL, a busy timeout, memory-mapped reads, a larger page
+cache) and keeps its own prepared-statement cache, so the hot telemetry and
+events queries are not re-prepared on every call. Connections are handed
+out most-recently-used first to keep their page caches warm.
+
+Ingest does not use the pool: the parser opens its own writer connection
+with ``writer.INGEST_PRAGMAS``, so a long parse never holds a reader slot
+and readers keep serving from the WAL while it runs. Neither do streamed
+responses (``stream_db``), which hold their connection for as long as the
+client takes to read.
+"""
+import os
+import queue
 import sqlite3
+import threading
 from contextlib import contextmanager
 
 DB_PATH = 'data/flight_data.db'
 
+POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 8))
+# seconds to wait for a free connection before giving up
+POOL_TIMEOUT = 30.0
+CACHED_STATEMENTS = 256
+
+# busy_timeout goes first so switching to WAL waits out a running writer
+READ_PRAGMAS = (
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA cache_size = -32768",
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+def connect(path):
+    """A reader connection to ``path`` set up with ``READ_PRAGMAS``."""
+    conn = sqlite3.connect(path, check_same_thread=False, cached_statements=CACHED_STATEMENTS)
+    conn.row_factory = sqlite3.Row
+    for pragma in READ_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+class ConnectionPool:
+    """At most ``size`` connections to ``path``; ``acquire`` blocks when all are in use.
+
+    Connections are created with ``check_same_thread=False`` because a
+    handler's threadpool thread need not be the one that opened them; the
+    pool guarantees only one user at a time.
+    """
+
+    def __init__(self, path, size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.created = 0
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _connect(self):
+        return connect(self.path)
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            grow = self.created < self.size
+            if grow:
+                self.created += 1
+        if grow:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self.created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(f"no free database connection after {self.timeout}s") from None
+
+    def release(self, conn):
+        """Return ``conn`` to the pool, rolling back anything left uncommitted."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            with self._lock:
+                self.created -= 1
+            return
+        with self._lock:
+            # checked out when the pool was closed: nobody will take it from _idle again
+            if self._closed:
+                self.created -= 1
+            else:
+                self._idle.put(conn)
+                return
+        conn.close()
+
+    def close(self):
+        """Close idle connections; ones still checked out are closed when released."""
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self.created -= 1
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path=None):
+    path = path or DB_PATH
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = _pools[path] = ConnectionPool(path)
+        return pool
+
+
+def close_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
 @contextmanager
 def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    """A pooled connection to ``DB_PATH`` for the duration of the block."""
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+
+@contextmanager
+def stream_db():
+    """A connection of its own to ``DB_PATH`` for a streamed response, closed after the block.
+
+    A stream lasts as long as the client keeps reading, so it stays out of
+    the pool instead of holding one of its ``POOL_SIZE`` slots meanwhile;
+    its body may be iterated on another thread than the one that opened it.
+    """
+    conn = connect(DB_PATH)
     try:
         yield conn
     finally:
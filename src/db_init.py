@@ -15,7 +15,8 @@ def init_db(db_path='data/flight_data.db'):
             aircraft_type TEXT,
             start_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             map_name TEXT,
-            parse_status TEXT DEFAULT 'queued'
+            parse_status TEXT DEFAULT 'queued',
+            parse_generation INTEGER DEFAULT 0
         )
     ''')
 
@@ -50,7 +51,11 @@ def init_db(db_path='data/flight_data.db'):
             ias REAL, mach REAL,
             g_force REAL,
             fuel_remaining REAL,
+            tas REAL,
+            ground_speed REAL, vertical_speed REAL, turn_rate REAL,
+            specific_energy REAL,
             raw TEXT,
+            raw_line INTEGER,
             FOREIGN KEY (sortie_id) REFERENCES sorties (id)
         )
     ''')
@@ -87,11 +92,82 @@ def init_db(db_path='data/flight_data.db'):
             status TEXT,
             progress_pct REAL,
             error TEXT,
+            file_path TEXT,
+            worker TEXT,
+            attempts INTEGER DEFAULT 0,
+            heartbeat_at TIMESTAMP,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     ''')
 
+    # Last committed position of a running parse job (see AcmiParser.parse_file)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS parse_checkpoints (
+            job_id TEXT PRIMARY KEY,
+            sortie_id INTEGER,
+            line_no INTEGER,
+            byte_offset INTEGER,
+            time_offset REAL,
+            state TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Resumable uploads (see src/uploads.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS uploads (
+            id TEXT PRIMARY KEY,
+            file_name TEXT,
+            size INTEGER,
+            sha256 TEXT,
+            status TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Stored recordings by content hash -> the parse that ingested them
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS recordings (
+            sha256 TEXT PRIMARY KEY,
+            file_name TEXT,
+            path TEXT,
+            size INTEGER,
+            job_id TEXT,
+            sortie_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Bounding boxes of trajectory segments (see src/spatial.py)
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS telemetry_rtree USING rtree(
+            id,
+            min_sortie, max_sortie,
+            min_t, max_t,
+            min_lon, max_lon,
+            min_lat, max_lat,
+            min_alt, max_alt,
+            +obj_id TEXT
+        )
+    ''')
+
+    # Per-sortie summary written at the end of ingest (see src/stats.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sortie_stats (
+            sortie_id INTEGER PRIMARY KEY,
+            duration REAL,
+            object_count INTEGER,
+            sample_count INTEGER,
+            max_g REAL,
+            max_alt REAL,
+            max_ias REAL,
+            distance_m REAL,
+            FOREIGN KEY (sortie_id) REFERENCES sorties (id)
+        )
+    ''')
+
     # Lightweight migrations
     cursor.execute("PRAGMA table_info(telemetry)")
     cols = {row[1] for row in cursor.fetchall()}
@@ -105,6 +181,12 @@ def init_db(db_path='data/flight_data.db'):
         cursor.execute("ALTER TABLE telemetry ADD COLUMN v REAL")
     if "heading" not in cols:
         cursor.execute("ALTER TABLE telemetry ADD COLUMN heading REAL")
+    if "raw_line" not in cols:
+        cursor.execute("ALTER TABLE telemetry ADD COLUMN raw_line INTEGER")
+    # derived channels (see src/enrich.py)
+    for col in ("tas", "ground_speed", "vertical_speed", "turn_rate", "specific_energy"):
+        if col not in cols:
+            cursor.execute(f"ALTER TABLE telemetry ADD COLUMN {col} REAL")
 
     cursor.execute("PRAGMA table_info(objects)")
     ocols = {row[1] for row in cursor.fetchall()}
@@ -118,10 +200,21 @@ def init_db(db_path='data/flight_data.db'):
         cursor.execute("ALTER TABLE sorties ADD COLUMN parse_status TEXT DEFAULT 'queued'")
     if "reference_time" not in scols:
         cursor.execute("ALTER TABLE sorties ADD COLUMN reference_time TEXT")
+    if "parse_generation" not in scols:
+        cursor.execute("ALTER TABLE sorties ADD COLUMN parse_generation INTEGER DEFAULT 0")
+
+    cursor.execute("PRAGMA table_info(parse_jobs)")
+    jcols = {row[1] for row in cursor.fetchall()}
+    for col, typ in [("file_path", "TEXT"), ("worker", "TEXT"), ("attempts", "INTEGER DEFAULT 0"), ("heartbeat_at", "TIMESTAMP")]:
+        if col not in jcols:
+            cursor.execute(f"ALTER TABLE parse_jobs ADD COLUMN {col} {typ}")
 
     # Indexes
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_telemetry_sortie_obj_time ON telemetry(sortie_id, obj_id, time_offset)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_objects_sortie ON objects(sortie_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_events_sortie_time ON events(sortie_id, time_offset)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_parse_jobs_status ON parse_jobs(status, created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_recordings_sortie ON recordings(sortie_id)")
 
     conn.commit()
     conn.close()
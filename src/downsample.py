@@ -0,0 +1,203 @@
+"""Telemetry downsampling on column arrays.
+
+All modes return sorted row indices into the input columns and share the
+same event-preservation rule: a sample whose G, altitude, IAS or attitude
+jumps sharply from the previous sample of the same object is always kept.
+
+Modes:
+    bucket  first sample of every ``downsample``-second bucket (legacy heuristic)
+    lttb    Largest-Triangle-Three-Buckets on ``value`` against time
+    minmax  min and max of ``value`` per bucket (envelope)
+
+Multi-object inputs are downsampled per object, so samples of different
+aircraft are never compared with each other.
+"""
+import numpy as np
+
+MODE_BUCKET = 'bucket'
+MODE_LTTB = 'lttb'
+MODE_MINMAX = 'minmax'
+MODES = (MODE_BUCKET, MODE_LTTB, MODE_MINMAX)
+
+# (channel, minimum jump between consecutive samples that marks an event)
+EVENT_JUMPS = (
+    ('g_force', 1.5),
+    ('alt', 200.0),
+    ('ias', 80.0),
+    ('yaw', 45.0),
+    ('pitch', 30.0),
+    ('roll', 60.0),
+)
+EVENT_G = 4.0
+
+
+def _finite(arr):
+    arr = np.asarray(arr, dtype=np.float64)
+    return np.where(np.isfinite(arr), arr, 0.0)
+
+
+def event_mask(columns, idx=None):
+    """True where a sample is a key event relative to the previous one."""
+    n = len(columns['time_offset']) if idx is None else len(idx)
+    mask = np.zeros(n, dtype=bool)
+    if n < 2:
+        return mask
+    for name, jump in EVENT_JUMPS:
+        col = columns.get(name)
+        if col is None:
+            continue
+        v = _finite(col if idx is None else np.asarray(col)[idx])
+        mask[1:] |= np.abs(np.diff(v)) >= jump
+        if name == 'g_force':
+            mask[1:] |= v[1:] >= EVENT_G
+    return mask
+
+
+def bucket_indices(t, step, events):
+    """Keep the first sample of each time bucket plus every event sample."""
+    n = len(t)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+    t = _finite(t)
+    bucket = np.trunc(t / step) if step > 0 else t
+    keep = events.copy()
+    keep[0] = True
+    keep[1:] |= bucket[1:] != bucket[:-1]
+    return np.flatnonzero(keep)
+
+
+def _padded_buckets(starts, ends):
+    """(n_buckets, width) index matrix of each bucket's rows plus a validity mask."""
+    width = int((ends - starts).max())
+    pos = starts[:, None] + np.arange(width)[None, :]
+    valid = pos < ends[:, None]
+    return np.where(valid, pos, (ends - 1)[:, None]), valid
+
+
+def lttb_indices(x, y, n_out, max_passes=64):
+    """Largest-Triangle-Three-Buckets selection of ``n_out`` points.
+
+    Classic LTTB picks each bucket's point using the point selected in the
+    previous bucket as the triangle's first vertex, which is sequential.
+    Here all buckets are solved at once and the anchors are refined until
+    the selection stops changing; a fixed point is exactly the sequential
+    LTTB result and is normally reached in a handful of passes.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = _finite(x)
+    y = _finite(y)
+    # bucket edges for the n - 2 interior points
+    edges = (np.arange(n_out - 1) * (n - 2) / (n_out - 2)).astype(np.int64) + 1
+    edges[-1] = n - 1
+    starts, ends = edges[:-1], edges[1:]
+    # centroid of each bucket; the third vertex is the next bucket's centroid
+    csum_x = np.concatenate(([0.0], np.cumsum(x)))
+    csum_y = np.concatenate(([0.0], np.cumsum(y)))
+    cnt = ends - starts
+    cx = (csum_x[ends] - csum_x[starts]) / cnt
+    cy = (csum_y[ends] - csum_y[starts]) / cnt
+    next_x = np.append(cx[1:], x[-1])[:, None]
+    next_y = np.append(cy[1:], y[-1])[:, None]
+
+    pos, valid = _padded_buckets(starts, ends)
+    bx, by = x[pos], y[pos]
+    rows = np.arange(len(starts))
+    # first guess: anchor on the previous bucket's centroid
+    ax, ay = np.append(x[0], cx[:-1])[:, None], np.append(y[0], cy[:-1])[:, None]
+    picked = None
+    for _ in range(max_passes):
+        area = np.abs((ax - next_x) * (by - ay) - (ax - bx) * (next_y - ay))
+        area[~valid] = -1.0
+        sel = pos[rows, np.argmax(area, axis=1)]
+        if picked is not None and np.array_equal(sel, picked):
+            break
+        picked = sel
+        anchors = np.concatenate(([0], sel[:-1]))
+        ax, ay = x[anchors][:, None], y[anchors][:, None]
+    return np.concatenate(([0], picked, [n - 1]))
+
+
+def minmax_indices(t, y, n_out):
+    """Envelope: first/last sample plus the min and max of ``y`` per bucket."""
+    n = len(t)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+    y = _finite(y)
+    n_buckets = max(1, (n_out - 2) // 2)
+    edges = np.linspace(0, n, n_buckets + 1).astype(np.int64)
+    # pad buckets into a 2D array so argmin/argmax run in one call
+    pos, valid = _padded_buckets(edges[:-1], edges[1:])
+    vals = y[pos]
+    lo = pos[np.arange(n_buckets), np.argmin(np.where(valid, vals, np.inf), axis=1)]
+    hi = pos[np.arange(n_buckets), np.argmax(np.where(valid, vals, -np.inf), axis=1)]
+    return np.unique(np.concatenate(([0, n - 1], lo, hi)))
+
+
+def _select_group(columns, idx, mode, step, n_out, value):
+    t = np.asarray(columns['time_offset'])[idx]
+    events = event_mask(columns, idx)
+    if mode == MODE_BUCKET:
+        keep = bucket_indices(t, step, events)
+    elif mode == MODE_LTTB:
+        keep = np.union1d(lttb_indices(t, np.asarray(columns[value])[idx], n_out), np.flatnonzero(events))
+    else:
+        keep = np.union1d(minmax_indices(t, np.asarray(columns[value])[idx], n_out), np.flatnonzero(events))
+    return idx[keep]
+
+
+def select(columns, downsample=None, target_points=None, mode=MODE_BUCKET, value='alt'):
+    """Row indices to keep, in input order.
+
+    ``downsample`` is the bucket width in seconds; ``target_points`` is a
+    point budget for the whole result. When only ``target_points`` is given
+    the bucket width is derived from the time span. Returns None when no
+    downsampling was requested.
+    """
+    if mode not in MODES:
+        raise ValueError(f"unknown downsample mode: {mode}")
+    t = np.asarray(columns['time_offset'], dtype=np.float64)
+    n = len(t)
+    if not downsample and not target_points:
+        return None
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+
+    obj = columns.get('obj_id')
+    if obj is not None and n and not (obj[0] == obj).all():
+        _, codes = np.unique(np.asarray(obj, dtype=str), return_inverse=True)
+        groups = [np.flatnonzero(codes == c) for c in range(codes.max() + 1)]
+    else:
+        groups = [np.arange(n)]
+
+    kept = []
+    for idx in groups:
+        share = len(idx) / n
+        n_out = max(3, int(round((target_points or 0) * share)))
+        step = downsample
+        if not step:
+            tg = t[idx]
+            span = float(np.nanmax(tg) - np.nanmin(tg)) if len(tg) else 0.0
+            step = span / max(1, n_out) if span > 0 else 0
+        if not target_points and mode != MODE_BUCKET:
+            # derive the point budget from the bucket width
+            tg = t[idx]
+            span = float(np.nanmax(tg) - np.nanmin(tg)) if len(tg) else 0.0
+            n_out = max(3, int(span / downsample) + 1)
+        kept.append(_select_group(columns, idx, mode, step, n_out, value))
+    return np.sort(np.concatenate(kept)) if len(kept) > 1 else kept[0]
+
+
+TEXT_COLUMNS = ('obj_id', 'raw')
+
+
+def columns_from_rows(rows, names=('time_offset', 'alt', 'ias', 'g_force', 'roll', 'pitch', 'yaw', 'obj_id')):
+    """Column arrays for ``select`` built from row dicts (SQLite fallback path)."""
+    out = {}
+    for name in names:
+        if name in TEXT_COLUMNS:
+            out[name] = np.array([r.get(name) for r in rows], dtype=object)
+        else:
+            out[name] = np.array([r.get(name) for r in rows], dtype=np.float64)
+    return out
@@ -0,0 +1,209 @@
+"""Derived flight channels, computed per object as rows are ingested.
+
+The parser hands every telemetry row to a ``TrackDeriver`` before it is
+written. Rows are buffered per object and derived a chunk at a time with
+numpy, so each row is inserted once with its derived columns filled and
+``telemetry`` is never rewritten:
+
+- ``ias``, ``g_force``, ``tas``, ``mach``, ``fuel_remaining``: values from
+  the recording, carried forward between the lines that set them (ACMI
+  properties keep their value until changed); never defaulted;
+- ``ground_speed`` (m/s), ``vertical_speed`` (m/s), ``turn_rate`` (deg/s,
+  positive right): central differences over ``RATE_SPAN`` samples either
+  side, which smooths the jitter of one-sample differences;
+- ``tas`` where the recording has none: from IAS through ISA density,
+  else ground speed (no wind);
+- ``mach`` where the recording has none: TAS over the ISA speed of sound;
+- ``specific_energy``: energy height ``alt + tas^2 / 2g`` (m).
+
+No derived value looks further than ``CONTEXT`` samples either side, so
+a row is written once that many later samples of its object are in (or
+the track ends), with exactly the values ``derive`` gives over the whole
+track. The deriver also aggregates the sortie's summary row
+(``stats.SortieStats``).
+"""
+import math
+
+import numpy as np
+
+from . import stats
+
+RATE_SPAN = 2
+# samples either side a derived value depends on: turn rate from course is a rate of rates
+CONTEXT = 2 * RATE_SPAN
+CHUNK_ROWS = 256
+
+G0 = 9.80665
+# ISA troposphere / lower stratosphere
+T0 = 288.15
+LAPSE = 0.0065
+TROPOPAUSE = 11000.0
+R_AIR = 287.05287
+GAMMA = 1.4
+
+_WGS84_A = 6378137.0
+_WGS84_E2 = 6.69437999014e-3
+
+# telemetry columns after the recorded ones, in writer.INSERT_SQL["telemetry"] order
+DERIVED = ('ias', 'g_force', 'tas', 'mach', 'fuel_remaining',
+           'ground_speed', 'vertical_speed', 'turn_rate', 'specific_energy')
+RECORDED = ('ias', 'g_force', 'tas', 'mach', 'fuel_remaining')
+# numeric fields 2..16 of a parser telemetry row
+_ROW = ('time_offset', 'lat', 'lon', 'alt', 'roll', 'pitch', 'yaw', 'u', 'v', 'heading',
+        'ias', 'g_force', 'tas', 'mach', 'fuel_remaining')
+
+
+def isa_temperature(alt):
+    return T0 - LAPSE * np.minimum(np.maximum(alt, 0.0), TROPOPAUSE)
+
+
+def isa_density_ratio(alt):
+    """rho / rho0 of the standard atmosphere (up to 20 km)."""
+    alt = np.maximum(alt, 0.0)
+    trop = (isa_temperature(alt) / T0) ** (G0 / (R_AIR * LAPSE) - 1.0)
+    strat = (isa_temperature(TROPOPAUSE) / T0) ** (G0 / (R_AIR * LAPSE) - 1.0) \
+        * np.exp(-G0 * (alt - TROPOPAUSE) / (R_AIR * isa_temperature(TROPOPAUSE)))
+    return np.where(alt <= TROPOPAUSE, trop, strat)
+
+
+def speed_of_sound(alt):
+    return np.sqrt(GAMMA * R_AIR * isa_temperature(alt))
+
+
+def forward_fill(x):
+    """``x`` with NaNs replaced by the last value before them (leading NaNs stay)."""
+    idx = np.where(np.isnan(x), 0, np.arange(len(x)))
+    np.maximum.accumulate(idx, out=idx)
+    return x[idx]
+
+
+def _span(n, span):
+    i = np.arange(n)
+    return np.maximum(i - span, 0), np.minimum(i + span, n - 1)
+
+
+def rate(t, x, span=RATE_SPAN):
+    """dx/dt by central differences over ``span`` samples each side (fewer at the ends)."""
+    lo, hi = _span(len(x), span)
+    dt = t[hi] - t[lo]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(dt > 0, (x[hi] - x[lo]) / dt, np.nan)
+
+
+def angle_rate(t, deg, span=RATE_SPAN):
+    """``rate`` of an angle in degrees, unwrapped sample to sample; NaN across unknown angles."""
+    step = (np.diff(deg) + 180.0) % 360.0 - 180.0
+    gap = np.isnan(step)
+    turned = np.concatenate(([0.0], np.cumsum(np.where(gap, 0.0, step))))
+    gaps = np.concatenate(([0], np.cumsum(gap)))
+    lo, hi = _span(len(deg), span)
+    dt = t[hi] - t[lo]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where((dt > 0) & (gaps[hi] == gaps[lo]), (turned[hi] - turned[lo]) / dt, np.nan)
+
+
+def derive(track):
+    """Derived channels for one object's time-ordered ``track`` (dict of float arrays named as in ``_ROW``)."""
+    t, lat, alt = track['time_offset'], track['lat'], track['alt']
+    out = {name: forward_fill(track[name]) for name in RECORDED}
+
+    # angular rates scaled by the meridian and prime vertical radii of curvature
+    phi = np.radians(lat)
+    w = 1.0 - _WGS84_E2 * np.sin(phi) ** 2
+    vn = np.radians(rate(t, lat)) * (_WGS84_A * (1.0 - _WGS84_E2) / w ** 1.5)
+    ve = np.radians(rate(t, track['lon'])) * (_WGS84_A / np.sqrt(w)) * np.cos(phi)
+    out['ground_speed'] = np.hypot(vn, ve)
+    out['vertical_speed'] = rate(t, alt)
+
+    heading = track['heading']
+    heading = np.where(np.isnan(heading), track['yaw'], heading)
+    heading = np.where(np.isnan(heading), np.degrees(np.arctan2(ve, vn)), heading)
+    out['turn_rate'] = angle_rate(t, heading)
+
+    tas = out['tas']
+    from_ias = out['ias'] / np.sqrt(isa_density_ratio(alt))
+    tas = np.where(np.isnan(tas), from_ias, tas)
+    tas = np.where(np.isnan(tas), out['ground_speed'], tas)
+    out['tas'] = tas
+    out['mach'] = np.where(np.isnan(out['mach']), tas / speed_of_sound(alt), out['mach'])
+    out['specific_energy'] = alt + tas * tas / (2.0 * G0)
+    return out
+
+
+class TrackDeriver:
+    """Turns parser telemetry rows into rows with the derived columns, per object.
+
+    ``add`` takes rows as built by the parser (``writer.INSERT_SQL["telemetry"]``
+    without the derived columns) and returns the rows that are ready, in
+    writer order. Per object it keeps the rows not yet returned, the last
+    ``CONTEXT`` returned ones before them, and the recorded air data carried
+    into the first kept row; ``state`` is that plus the stats, as JSON, and
+    is what a parse checkpoint saves after calling ``ready``.
+    """
+
+    def __init__(self, chunk=CHUNK_ROWS, state=None):
+        self.chunk = chunk
+        # obj_id -> [rows, rows already returned, recorded values carried into rows[0]]
+        self.tracks = {}
+        self.stats = stats.SortieStats()
+        if state is not None:
+            self.tracks = {obj_id: [[tuple(r) for r in rows], done, [math.nan if v is None else v for v in carry]]
+                           for obj_id, (rows, done, carry) in state["tracks"].items()}
+            self.stats = stats.SortieStats.from_state(state["stats"])
+
+    def add(self, row):
+        track = self.tracks.get(row[1])
+        if track is None:
+            track = self.tracks[row[1]] = [[], 0, [math.nan] * len(RECORDED)]
+        track[0].append(row)
+        if len(track[0]) - track[1] >= self.chunk + CONTEXT:
+            return self._emit(row[1], track, final=False)
+        return ()
+
+    def ready(self):
+        """Every row that already has ``CONTEXT`` later samples."""
+        out = []
+        for obj_id, track in self.tracks.items():
+            if len(track[0]) - track[1] > CONTEXT:
+                out += self._emit(obj_id, track, final=False)
+        return out
+
+    def finish(self):
+        """The remaining rows, derived as track ends."""
+        out = []
+        for obj_id, track in self.tracks.items():
+            if len(track[0]) > track[1]:
+                out += self._emit(obj_id, track, final=True)
+        self.tracks.clear()
+        return out
+
+    def state(self):
+        return {"tracks": {obj_id: [rows, done, [None if math.isnan(v) else v for v in carry]]
+                           for obj_id, (rows, done, carry) in self.tracks.items()},
+                "stats": self.stats.state()}
+
+    def _emit(self, obj_id, track, final):
+        rows, done, carry = track
+        block = np.array([r[2:17] for r in rows], dtype=np.float64)
+        cols = {name: block[:, i] for i, name in enumerate(_ROW)}
+        for name, value in zip(RECORDED, carry):
+            if np.isnan(cols[name][0]):
+                cols[name][0] = value
+        out = derive(cols)
+        stop = len(rows) if final else len(rows) - CONTEXT
+        # the last returned sample continues the path into this chunk
+        lead = min(done, 1)
+        part = slice(done - lead, stop)
+        self.stats.add(obj_id, cols['time_offset'][part], cols['lat'][part], cols['lon'][part], cols['alt'][part],
+                       out['ias'][part], out['g_force'][part], counted=lead)
+
+        values = np.column_stack([out[name] for name in DERIVED])[done:stop]
+        values = np.where(np.isfinite(values), values, np.nan).tolist()
+        ready = [r[:12] + tuple(v) + r[17:] for r, v in zip(rows[done:stop], values)]
+
+        keep = max(stop - CONTEXT, 0)
+        if keep:
+            track[2] = [float(forward_fill(cols[name][:keep])[-1]) for name in RECORDED]
+        track[0] = rows[keep:]
+        track[1] = stop - keep
+        return ready
@@ -0,0 +1,86 @@
+"""HTTP caching for finished sorties.
+
+Once a sortie is parsed (``parse_status = 'done'``) its data only changes
+when it is re-parsed, which bumps ``sorties.parse_generation``. A response
+is therefore identified by sortie id, generation, URL and negotiated
+format, and the ETag is computed from those without touching the data:
+
+    "s<sortie_id>-g<generation>-<digest of path, query and format>"
+
+Bounded responses (objects, events, downsampled or paged telemetry) are
+rendered once, compressed with the best encoding the client accepts
+(brotli when the optional ``brotli`` package is installed, else gzip) and
+kept in a byte-bounded LRU (``cache.SizedLRU``), so repeat loads are a
+dictionary lookup. Encoded variants get their own strong ETag (``...-gzip"``).
+"""
+import gzip
+import hashlib
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only without it
+    brotli = None
+
+CACHE_CONTROL_DONE = "public, max-age=86400"
+CACHE_CONTROL_LIVE = "no-cache"
+VARY = "Accept, Accept-Encoding"
+MAX_CACHED_BYTES = 64 * 1024 * 1024
+# only bodies up to this size are worth compressing up front and keeping
+MAX_BODY_BYTES = 8 * 1024 * 1024
+MIN_COMPRESS_BYTES = 1024
+
+
+def compute_etag(sortie_id, generation, request, fmt):
+    query = sorted(request.query_params.multi_items())
+    digest = hashlib.sha1(repr((request.url.path, query, fmt)).encode('utf-8')).hexdigest()[:16]
+    return f'"s{sortie_id}-g{generation}-{digest}"'
+
+
+def variant_etag(etag, encoding):
+    return etag if encoding == 'identity' else f'{etag[:-1]}-{encoding}"'
+
+
+def not_modified(request, etag):
+    """True if If-None-Match matches ``etag`` or one of its encoded variants."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    base = etag[:-1]
+    for tag in header.split(","):
+        tag = tag.strip().removeprefix("W/")
+        if tag == etag or (tag.startswith(base + "-") and tag.endswith('"')):
+            return True
+    return False
+
+
+def choose_encoding(accept_encoding):
+    """'br', 'gzip' or 'identity' for an Accept-Encoding header."""
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        token, *params = part.strip().split(";")
+        q = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            accepted.add(token.strip().lower())
+    if brotli is not None and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return "identity"
+
+
+def encode_body(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    return body
+
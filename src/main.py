@@ -1,16 +1,27 @@
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, BackgroundTasks
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Request, Response, Query, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from typing import List
+import functools
+import itertools
 import os
-import shutil
-from . import schemas, database, parser, db_init, logger
+import orjson
+import numpy as np
+from . import schemas, database, parser, db_init, logger, columnar, archive, packed, streaming, paging, httpcache, cache, worker, uploads, realtime, progress, snapshot, spatial, proximity, stats
+from . import downsample as sampling
 
 # Use the structured logger
 app_logger = logger.logger
 
 from contextlib import asynccontextmanager
 
+# "embedded" runs the ingest worker inside the API process; "off" when `python -m src.worker` runs separately
+INGEST_WORKER_MODE = os.environ.get("INGEST_WORKER", "embedded")
+ingest_worker = None
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup logic
@@ -29,13 +40,29 @@ async def lifespan(app: FastAPI):
                         app_logger.info(f"Loading default sample from {sample_path}")
                         acmi_parser = parser.AcmiParser()
                         acmi_parser.parse_file(sample_path)
+                # sorties ingested before the spatial index existed
+                indexed = spatial.index_missing(db, database.DB_PATH)
+                if indexed:
+                    app_logger.info(f"Spatially indexed {indexed} existing sorties")
+                summarized = stats.stats_missing(db)
+                if summarized:
+                    app_logger.info(f"Computed stats of {summarized} existing sorties")
             except Exception as inner_e:
                 app_logger.warning(f"DB check skipped: {inner_e}")
     except Exception as e:
         app_logger.error(f"Startup DB Error: {e}")
     
+    global ingest_worker
+    if INGEST_WORKER_MODE == "embedded":
+        ingest_worker = worker.Worker(on_finished=lambda job_id, sortie_id: invalidate_sortie(sortie_id),
+                                      on_progress=progress.bus.publish)
+        ingest_worker.start()
     yield
-    # Shutdown logic (if any)
+    if ingest_worker is not None:
+        ingest_worker.stop()
+        ingest_worker = None
+    realtime.stop_all()
+    database.close_pools()
 
 app = FastAPI(
     title="DCS Web-Tac API",
@@ -47,6 +74,9 @@ app = FastAPI(
 # Initialize database on startup removed (migrated to lifespan)
 
 
+# on-the-fly gzip for streamed bodies; precompressed responses pass through untouched
+app.add_middleware(GZipMiddleware, minimum_size=httpcache.MIN_COMPRESS_BYTES)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -54,107 +84,358 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# in-process cache budgets (MB)
+RESULT_CACHE_BYTES = int(os.environ.get("RESULT_CACHE_MB", 256)) * 1024 * 1024
+
 # API Endpoints
 @app.get("/api/", tags=["Health"])
 def read_root():
     return {"status": "DCS Web-Tac Online", "version": "0.2.2"}
 
+SORTIE_SORT_KEYS = ("start_time",) + stats.STAT_COLUMNS
+
 @app.get("/api/sorties", response_model=List[schemas.Sortie], tags=["Data"])
-def list_sorties():
+def list_sorties(sort: str = "start_time", order: str = "desc"):
+    if sort not in SORTIE_SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of: {', '.join(SORTIE_SORT_KEYS)}")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be asc or desc")
     with database.get_db() as db:
         cursor = db.cursor()
-        rows = cursor.execute("SELECT * FROM sorties ORDER BY start_time DESC").fetchall()
+        # stats come from the summary row written at ingest; sorties still parsing have none (sorted last)
+        rows = cursor.execute(f"SELECT s.*, {', '.join('st.' + c for c in stats.STAT_COLUMNS)} FROM sorties s "
+                              f"LEFT JOIN sortie_stats st ON st.sortie_id = s.id "
+                              f"ORDER BY {sort} {order.upper()} NULLS LAST, s.id DESC").fetchall()
         return [dict(row) for row in rows]
 
-@app.get("/api/sorties/{sortie_id}/objects", response_model=List[schemas.Object], tags=["Data"])
-def list_objects(sortie_id: int):
-    with database.get_db() as db:
-        cursor = db.cursor()
-        rows = cursor.execute("SELECT * FROM objects WHERE sortie_id = ? ORDER BY name", (sortie_id,)).fetchall()
-        return [dict(row) for row in rows]
+# rendered (and compressed) response bodies, keyed (sortie_id, etag, encoding)
+body_cache = cache.SizedLRU(httpcache.MAX_CACHED_BYTES, httpcache.MAX_BODY_BYTES)
+# decoded telemetry windows as column arrays, keyed by the normalized query
+result_cache = cache.SizedLRU(RESULT_CACHE_BYTES, RESULT_CACHE_BYTES // 4)
+
+def invalidate_sortie(sortie_id: int):
+    """Drop every cached result and body of ``sortie_id`` (re-parse, delete)."""
+    result_cache.invalidate(sortie_id)
+    body_cache.invalidate(sortie_id)
 
-@app.get("/api/sorties/{sortie_id}/events", response_model=List[schemas.Event], tags=["Data"])
-def list_events(sortie_id: int):
+def sortie_generation(sortie_id: int):
+    """parse_generation of a finished sortie, or None while its data can still change."""
     with database.get_db() as db:
-        cursor = db.cursor()
-        rows = cursor.execute("SELECT * FROM events WHERE sortie_id = ? ORDER BY time_offset", (sortie_id,)).fetchall()
-        return [dict(row) for row in rows]
+        row = db.execute("SELECT parse_status, parse_generation FROM sorties WHERE id = ?", (sortie_id,)).fetchone()
+    return row["parse_generation"] if row and row["parse_status"] == "done" else None
 
-@app.get("/api/sorties/{sortie_id}/telemetry", response_model=List[schemas.TelemetryBase], tags=["Data"])
-def get_telemetry(sortie_id: int, obj_id: str | None = None, start: float | None = None, end: float | None = None,
-                  downsample: float | None = None, limit: int | None = None, include_raw: bool = False):
-    import math
-    def num(v, default=0.0):
-        return v if isinstance(v, (int, float)) and math.isfinite(v) else default
+def cached_response(request: Request, sortie_id: int, generation: int | None, fmt: str, build, bounded: bool = True):
+    """Conditional, cacheable response for sortie data.
+
+    ``generation`` comes from ``sortie_generation``. ``build(materialize)``
+    renders the response; with ``materialize`` it must not stream, so the
+    body can be compressed once and kept in ``body_cache``.
+    """
+    if generation is None:
+        response = build(False)
+        response.headers["Cache-Control"] = httpcache.CACHE_CONTROL_LIVE
+        response.headers["Vary"] = httpcache.VARY
+        return response
+    etag = httpcache.compute_etag(sortie_id, generation, request, fmt)
+    headers = {"ETag": etag, "Cache-Control": httpcache.CACHE_CONTROL_DONE, "Vary": httpcache.VARY}
+    if httpcache.not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    if not bounded:
+        response = build(False)
+        response.headers.update(headers)
+        return response
+
+    encoding = httpcache.choose_encoding(request.headers.get("accept-encoding"))
+    entry = body_cache.get((sortie_id, etag, encoding))
+    if entry is None:
+        response = build(True)
+        if len(response.body) > httpcache.MAX_BODY_BYTES:
+            response.headers.update(headers)
+            return response
+        extra = {k: v for k, v in response.headers.items() if k.startswith("x-")}
+        if encoding != "identity" and len(response.body) >= httpcache.MIN_COMPRESS_BYTES:
+            extra["Content-Encoding"] = encoding
+            extra["ETag"] = httpcache.variant_etag(etag, encoding)
+            body = httpcache.encode_body(response.body, encoding)
+        else:
+            body = response.body
+        entry = (body, response.media_type, extra)
+        body_cache.put((sortie_id, etag, encoding), entry, len(body))
+    body, media_type, extra = entry
+    return Response(body, media_type=media_type, headers={**headers, **extra})
 
-    def sanitize_row(r: dict):
-        for k, v in list(r.items()):
-            if isinstance(v, float) and not math.isfinite(v):
-                r[k] = None
-        return r
+def json_rows_response(model, rows: list):
+    fields, defaults = streaming.plan_fields(model, rows[0] if rows else model.model_fields)
+    return Response(orjson.dumps(next(streaming.project([rows], fields, defaults))), media_type="application/json")
 
+@app.get("/api/sorties/{sortie_id}/objects", response_model=List[schemas.Object], tags=["Data"])
+def list_objects(request: Request, sortie_id: int):
+    def build(materialize: bool):
+        with database.get_db() as db:
+            rows = db.execute("SELECT * FROM objects WHERE sortie_id = ? ORDER BY name", (sortie_id,)).fetchall()
+        return json_rows_response(schemas.Object, [dict(row) for row in rows])
+
+    return cached_response(request, sortie_id, sortie_generation(sortie_id), "json", build)
+
+def decode_cursor(cursor: str | None, kind: str):
+    if cursor is None:
+        return None
     try:
+        return paging.decode_cursor(cursor, kind)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def page_headers(next_cursor: str | None, headers: dict | None = None):
+    headers = dict(headers or {})
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return headers
+
+@app.get("/api/sorties/{sortie_id}/events", response_model=List[schemas.Event] | schemas.EventPage, tags=["Data"])
+def list_events(request: Request, sortie_id: int, page_size: int | None = Query(None, ge=1, le=paging.MAX_PAGE_SIZE),
+                cursor: str | None = None):
+    after = decode_cursor(cursor, paging.EVENTS)
+
+    def build(materialize: bool):
         with database.get_db() as db:
-            cursor = db.cursor()
+            if page_size is None and after is None:
+                rows = db.execute("SELECT * FROM events WHERE sortie_id = ? ORDER BY time_offset", (sortie_id,)).fetchall()
+                return json_rows_response(schemas.Event, [dict(row) for row in rows])
+            # keyset page on (time_offset, id) via idx_events_sortie_time
+            size = page_size or paging.DEFAULT_PAGE_SIZE
+            query = "SELECT * FROM events WHERE sortie_id = ?"
             params = [sortie_id]
-            query = "SELECT * FROM telemetry WHERE sortie_id = ?"
-            if obj_id:
-                query += " AND obj_id = ?"
-                params.append(obj_id)
-            if start is not None:
-                query += " AND time_offset >= ?"
-                params.append(start)
-            if end is not None:
-                query += " AND time_offset <= ?"
-                params.append(end)
-            query += " ORDER BY time_offset"
-            if limit:
-                query += " LIMIT ?"
-                params.append(limit)
-            rows = cursor.execute(query, tuple(params)).fetchall()
-            if not rows:
+            if after is not None:
+                query += " AND (time_offset, id) > (?, ?)"
+                params += after
+            query += " ORDER BY time_offset, id LIMIT ?"
+            params.append(size + 1)
+            rows = [dict(row) for row in db.execute(query, tuple(params)).fetchall()]
+        next_cursor = None
+        if len(rows) > size:
+            rows = rows[:size]
+            next_cursor = paging.encode_cursor(paging.EVENTS, (rows[-1]["time_offset"], rows[-1]["id"]))
+        return Response(orjson.dumps({"items": rows, "next_cursor": next_cursor}), media_type="application/json",
+                        headers=page_headers(next_cursor))
+
+    return cached_response(request, sortie_id, sortie_generation(sortie_id), "json", build)
+
+def check_downsample_mode(mode: str):
+    if mode not in sampling.MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of: {', '.join(sampling.MODES)}")
+
+RESPONSE_FORMATS = ("json", "ndjson", "binary")
+# telemetry columns served to clients, in TelemetryBase order (raw is opt-in)
+TELEMETRY_COLUMNS = tuple(f for f in schemas.TelemetryBase.model_fields if f != "raw")
+
+def negotiate_format(request: Request, format: str | None) -> str:
+    """Response format from ``format=`` or, failing that, the Accept header."""
+    if format is not None:
+        if format not in RESPONSE_FORMATS:
+            raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(RESPONSE_FORMATS)}")
+        return format
+    accept = request.headers.get("accept") or ""
+    if packed.MEDIA_TYPE in accept:
+        return "binary"
+    if streaming.NDJSON_MEDIA_TYPE in accept:
+        return "ndjson"
+    return "json"
+
+def resolve_raw(sortie_id: int, rows: list):
+    """Rebuild ``raw`` for archived rows from the sortie's line archive."""
+    pending = [r for r in rows if r.get("raw") is None and r.get("raw_line") is not None]
+    if not pending:
+        return rows
+    reader = archive.open_reader(database.DB_PATH, sortie_id)
+    if reader is None:
+        return rows
+    lines = reader.lines(r["raw_line"] for r in pending)
+    for r in pending:
+        r["raw"] = parser.raw_json_for_line(lines[r["raw_line"]])
+    return rows
+
+def telemetry_where(sortie_id: int, obj_id: str | None, start: float | None, end: float | None):
+    query = "WHERE sortie_id = ?"
+    params = [sortie_id]
+    if obj_id:
+        query += " AND obj_id = ?"
+        params.append(obj_id)
+    if start is not None:
+        query += " AND time_offset >= ?"
+        params.append(start)
+    if end is not None:
+        query += " AND time_offset <= ?"
+        params.append(end)
+    return query, params
+
+def telemetry_page(sortie_id: int, obj_id: str | None, start: float | None, end: float | None, after: tuple | None,
+                   size: int, include_raw: bool, fmt: str):
+    """One keyset page of telemetry ordered by (obj_id, time_offset, id)."""
+    store = None if include_raw else columnar.open_store(database.DB_PATH, sortie_id)
+    if store is not None:
+        columns = store.page(obj_id or None, start, end, after, size + 1)
+        more = len(columns["id"]) > size
+        columns = {k: v[:size] for k, v in columns.items()}
+        last = (str(columns["obj_id"][-1]), float(columns["time_offset"][-1]), int(columns["id"][-1])) if more else None
+        fields, defaults = streaming.plan_fields(schemas.TelemetryBase, columns)
+        rows = [r for chunk in streaming.column_chunks(columns, fields, defaults) for r in chunk]
+    else:
+        names = TELEMETRY_COLUMNS + ("id",) + (("raw", "raw_line") if include_raw else ())
+        where, params = telemetry_where(sortie_id, obj_id, start, end)
+        if after is not None:
+            where += " AND (obj_id, time_offset, id) > (?, ?, ?)"
+            params += after
+        query = f"SELECT {', '.join(names)} FROM telemetry {where} ORDER BY obj_id, time_offset, id LIMIT ?"
+        with database.get_db() as db:
+            rows = [dict(zip(names, row)) for row in db.execute(query, (*params, size + 1)).fetchall()]
+        more = len(rows) > size
+        rows = rows[:size]
+        last = (rows[-1]["obj_id"], rows[-1]["time_offset"], rows[-1]["id"]) if more else None
+        if include_raw:
+            resolve_raw(sortie_id, rows)
+        fields, defaults = streaming.plan_fields(schemas.TelemetryBase, names)
+        rows = next(streaming.project([rows], fields, defaults))
+        columns = None
+    if after is None and not rows:
+        raise HTTPException(status_code=404, detail="Sortie data not found")
+
+    next_cursor = paging.encode_cursor(paging.TELEMETRY, last) if last else None
+    headers = page_headers(next_cursor)
+    if fmt == "binary":
+        columns = sampling.columns_from_rows(rows, TELEMETRY_COLUMNS) if columns is None \
+            else {f: columns[f] for f in TELEMETRY_COLUMNS}
+        return Response(packed.encode(columns), media_type=packed.MEDIA_TYPE, headers=headers)
+    if fmt == "ndjson":
+        return streaming.respond([rows], ndjson=True, headers=headers, materialize=True)
+    return Response(orjson.dumps({"items": rows, "next_cursor": next_cursor}), media_type="application/json",
+                    headers=headers)
+
+def telemetry_key(sortie_id: int, generation: int, obj_id, start, end, downsample, limit, target_points, mode,
+                  include_raw: bool):
+    """Normalized result-cache key; parameters that cannot change the result are dropped."""
+    sampled = bool(downsample or target_points)
+    return (sortie_id, generation, obj_id or None,
+            None if start is None else float(start), None if end is None else float(end),
+            float(downsample) if downsample else None, target_points or None, mode if sampled else None,
+            limit or None, include_raw)
+
+def load_telemetry(sortie_id: int, obj_id, start, end, downsample, limit, target_points, mode, include_raw: bool):
+    """A downsampled telemetry window as column arrays (``id`` and ``obj_id`` included).
+
+    Uses the columnar store when possible, SQLite otherwise; with
+    ``include_raw`` the ``raw`` column holds the JSON payloads.
+    """
+    store = None if include_raw else columnar.open_store(database.DB_PATH, sortie_id)
+    if store is not None:
+        # memory-mapped columns: binary search on time, slices for the rest;
+        # a point budget reads the coarsest sufficient LOD level
+        columns = store.query(obj_id or None, start, end, limit, target_points=target_points)
+        keep = sampling.select(columns, downsample, target_points, mode)
+        return columns if keep is None else {k: v[keep] for k, v in columns.items()}
+
+    names = TELEMETRY_COLUMNS + ("id",) + (("raw", "raw_line") if include_raw else ())
+    where, params = telemetry_where(sortie_id, obj_id, start, end)
+    query = f"SELECT {', '.join(names)} FROM telemetry {where} ORDER BY time_offset"
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+    with database.get_db() as db:
+        rows = [dict(zip(names, row)) for row in db.execute(query, tuple(params)).fetchall()]
+    keep = sampling.select(sampling.columns_from_rows(rows), downsample, target_points, mode)
+    if keep is not None:
+        rows = [rows[i] for i in keep]
+    if include_raw:
+        resolve_raw(sortie_id, rows)
+    return sampling.columns_from_rows(rows, names)
+
+def cached_telemetry(sortie_id: int, generation: int | None, *args):
+    """``load_telemetry`` through ``result_cache`` (finished sorties only)."""
+    if generation is None:
+        return load_telemetry(sortie_id, *args)
+    key = telemetry_key(sortie_id, generation, *args)
+    columns = result_cache.get(key)
+    if columns is None:
+        columns = load_telemetry(sortie_id, *args)
+        result_cache.put(key, columns, cache.columns_nbytes(columns))
+    return columns
+
+def telemetry_chunks(query: str, params: tuple, names: tuple):
+    """Row chunks straight off the cursor; the connection, outside the pool, lives as long as the stream."""
+    with database.stream_db() as db:
+        yield from streaming.cursor_chunks(db.execute(query, params), names)
+
+def stream_telemetry_rows(sortie_id: int, obj_id, start, end, include_raw: bool, fmt: str):
+    """Full-resolution window streamed off the SQLite cursor (no store, sortie still changing)."""
+    names = TELEMETRY_COLUMNS + (("raw", "raw_line") if include_raw else ())
+    where, params = telemetry_where(sortie_id, obj_id, start, end)
+    query = f"SELECT {', '.join(names)} FROM telemetry {where} ORDER BY time_offset"
+    chunks = telemetry_chunks(query, tuple(params), names)
+    first = next(chunks, None)
+    if first is None:
+        chunks.close()
+        raise HTTPException(status_code=404, detail="Sortie data not found")
+    chunks = itertools.chain([first], chunks)
+    if include_raw:
+        chunks = (resolve_raw(sortie_id, chunk) for chunk in chunks)
+    fields, defaults = streaming.plan_fields(schemas.TelemetryBase, names)
+    return streaming.respond(streaming.project(chunks, fields, defaults), fmt == "ndjson")
+
+@app.get("/api/sorties/{sortie_id}/telemetry", response_model=List[schemas.TelemetryBase] | schemas.TelemetryPage,
+         tags=["Data"])
+def get_telemetry(request: Request, sortie_id: int, obj_id: str | None = None, start: float | None = None,
+                  end: float | None = None, downsample: float | None = None, limit: int | None = None,
+                  include_raw: bool = False, target_points: int | None = None, mode: str = sampling.MODE_BUCKET,
+                  format: str | None = None, page_size: int | None = Query(None, ge=1, le=paging.MAX_PAGE_SIZE),
+                  cursor: str | None = None):
+    check_downsample_mode(mode)
+    fmt = negotiate_format(request, format)
+    if fmt == "binary" and include_raw:
+        raise HTTPException(status_code=400, detail="include_raw is only available as JSON")
+    after = decode_cursor(cursor, paging.TELEMETRY)
+    paged = page_size is not None or after is not None
+    if paged and (downsample or target_points or limit):
+        raise HTTPException(status_code=400, detail="page_size/cursor cannot be combined with downsample, target_points or limit")
+
+    # bounded responses are rendered, compressed and cached; full windows keep streaming
+    bounded = paged or bool(downsample or target_points or limit) or fmt == "binary"
+    generation = sortie_generation(sortie_id)
+    query_args = (obj_id, start, end, downsample, limit, target_points, mode, include_raw)
+
+    def build(materialize: bool):
+        try:
+            if paged:
+                return telemetry_page(sortie_id, obj_id, start, end, after, page_size or paging.DEFAULT_PAGE_SIZE,
+                                      include_raw, fmt)
+            in_memory = (generation is not None or materialize or bounded
+                         or (not include_raw and columnar.open_store(database.DB_PATH, sortie_id) is not None))
+            if not in_memory:
+                return stream_telemetry_rows(sortie_id, obj_id, start, end, include_raw, fmt)
+            columns = cached_telemetry(sortie_id, generation, *query_args)
+            if not len(columns["time_offset"]):
                 raise HTTPException(status_code=404, detail="Sortie data not found")
-            result = [sanitize_row(dict(row)) for row in rows]
-            if downsample:
-                filtered = []
-                last_bucket = None
-                last = None
-                for r in result:
-                    # preserve key events (heuristic)
-                    is_event = False
-                    if last:
-                        if abs(num(r.get("g_force")) - num(last.get("g_force"))) >= 1.5 or num(r.get("g_force")) >= 4:
-                            is_event = True
-                        if abs(num(r.get("alt")) - num(last.get("alt"))) >= 200:
-                            is_event = True
-                        if abs(num(r.get("ias")) - num(last.get("ias"))) >= 80:
-                            is_event = True
-                        if abs(num(r.get("yaw")) - num(last.get("yaw"))) >= 45 or abs(num(r.get("pitch")) - num(last.get("pitch"))) >= 30 or abs(num(r.get("roll")) - num(last.get("roll"))) >= 60:
-                            is_event = True
-                    bucket = int(num(r.get("time_offset")) / downsample) if downsample > 0 else r.get("time_offset")
-                    if bucket != last_bucket or is_event:
-                        filtered.append(r)
-                        last_bucket = bucket
-                    last = r
-                result = filtered
-            if not include_raw:
-                for r in result:
-                    r.pop("raw", None)
-            return result
-    except HTTPException:
-        raise
-    except Exception as e:
-        app_logger.exception(
-            "Telemetry endpoint failed",
-            extra={"sortie_id": sortie_id, "obj_id": obj_id, "start": start, "end": end, "downsample": downsample, "limit": limit}
-        )
-        raise HTTPException(status_code=500, detail=f"Internal Server Error: telemetry failed")
+            if fmt == "binary":
+                return Response(packed.encode({f: columns[f] for f in TELEMETRY_COLUMNS}), media_type=packed.MEDIA_TYPE)
+            fields, defaults = streaming.plan_fields(schemas.TelemetryBase, columns)
+            return streaming.respond(streaming.column_chunks(columns, fields, defaults), fmt == "ndjson",
+                                     materialize=materialize)
+        except HTTPException:
+            raise
+        except Exception as e:
+            app_logger.exception(
+                "Telemetry endpoint failed",
+                extra={"sortie_id": sortie_id, "obj_id": obj_id, "start": start, "end": end, "downsample": downsample, "limit": limit}
+            )
+            raise HTTPException(status_code=500, detail=f"Internal Server Error: telemetry failed")
+
+    return cached_response(request, sortie_id, generation, fmt, build, bounded)
 
 @app.get("/api/sorties/{sortie_id}/telemetry_compare", tags=["Data"])
-def get_telemetry_compare(sortie_id: int, obj_id: str | None = None, start: float | None = None, end: float | None = None,
-                          downsample: float | None = None, limit: int | None = None):
+def get_telemetry_compare(request: Request, sortie_id: int, obj_id: str | None = None, start: float | None = None, end: float | None = None,
+                          downsample: float | None = None, limit: int | None = None,
+                          target_points: int | None = None, mode: str = sampling.MODE_BUCKET):
     import json
     import math
+    check_downsample_mode(mode)
 
     def to_float(v):
         try:
@@ -171,6 +452,8 @@ def get_telemetry_compare(sortie_id: int, obj_id: str | None = None, start: floa
         try:
             payload = json.loads(raw_str)
             coords = payload.get("T", [])
+            if isinstance(coords, str):
+                coords = coords.split("|")
             return {
                 "lon": to_float(coords[0]) if len(coords) > 0 else None,
                 "lat": to_float(coords[1]) if len(coords) > 1 else None,
@@ -186,50 +469,15 @@ def get_telemetry_compare(sortie_id: int, obj_id: str | None = None, start: floa
         except Exception:
             return {}
 
-    with database.get_db() as db:
-        cursor = db.cursor()
-        params = [sortie_id]
-        query = "SELECT * FROM telemetry WHERE sortie_id = ?"
-        if obj_id:
-            query += " AND obj_id = ?"
-            params.append(obj_id)
-        if start is not None:
-            query += " AND time_offset >= ?"
-            params.append(start)
-        if end is not None:
-            query += " AND time_offset <= ?"
-            params.append(end)
-        query += " ORDER BY time_offset"
-        if limit:
-            query += " LIMIT ?"
-            params.append(limit)
-        rows = cursor.execute(query, tuple(params)).fetchall()
-        if not rows:
-            raise HTTPException(status_code=404, detail="Sortie data not found")
+    generation = sortie_generation(sortie_id)
 
-        # reuse downsample logic to keep parity with telemetry endpoint
-        result = [dict(row) for row in rows]
-        if downsample:
-            filtered = []
-            last_bucket = None
-            last = None
-            for r in result:
-                is_event = False
-                if last:
-                    if abs((safe_num(r.get("g_force")) or 0) - (safe_num(last.get("g_force")) or 0)) >= 1.5 or (safe_num(r.get("g_force")) or 0) >= 4:
-                        is_event = True
-                    if abs((safe_num(r.get("alt")) or 0) - (safe_num(last.get("alt")) or 0)) >= 200:
-                        is_event = True
-                    if abs((safe_num(r.get("ias")) or 0) - (safe_num(last.get("ias")) or 0)) >= 80:
-                        is_event = True
-                    if abs((safe_num(r.get("yaw")) or 0) - (safe_num(last.get("yaw")) or 0)) >= 45 or abs((safe_num(r.get("pitch")) or 0) - (safe_num(last.get("pitch")) or 0)) >= 30 or abs((safe_num(r.get("roll")) or 0) - (safe_num(last.get("roll")) or 0)) >= 60:
-                        is_event = True
-                bucket = int((safe_num(r.get("time_offset")) or 0) / downsample) if downsample > 0 else r.get("time_offset")
-                if bucket != last_bucket or is_event:
-                    filtered.append(r)
-                    last_bucket = bucket
-                last = r
-            result = filtered
+    def build(materialize: bool):
+        # same window and downsampling as the telemetry endpoint, with raw payloads
+        columns = cached_telemetry(sortie_id, generation, obj_id, start, end, downsample, limit, target_points, mode, True)
+        if not len(columns["time_offset"]):
+            raise HTTPException(status_code=404, detail="Sortie data not found")
+        names = list(columns)
+        result = [dict(zip(names, values)) for values in zip(*(columns[n].tolist() for n in names))]
 
         compare = []
         for r in result:
@@ -263,41 +511,364 @@ def get_telemetry_compare(sortie_id: int, obj_id: str | None = None, start: floa
                 "bad_attitude": bad_attitude
             })
 
-        return compare
+        return Response(orjson.dumps(compare), media_type="application/json")
 
-@app.post("/api/upload", tags=["Ingestion"])
-async def upload_acmi(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
-    if not (file.filename.endswith(".acmi") or file.filename.endswith(".zip") or file.filename.endswith(".gz") or file.filename.endswith(".zip.acmi")):
-        raise HTTPException(status_code=400, detail="Unsupported file format")
+    return cached_response(request, sortie_id, generation, "json", build)
 
-    os.makedirs("data/uploads", exist_ok=True)
-    file_path = os.path.join("data/uploads", file.filename)
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+@app.get("/api/sorties/{sortie_id}/snapshot", response_model=schemas.Snapshot, tags=["Data"])
+def get_snapshot(request: Request, sortie_id: int, t: float | None = None, start: float | None = None,
+                 end: float | None = None, step: float = Query(1.0, gt=0), obj_id: List[str] | None = Query(None)):
+    """Interpolated state of every object at ``t``, or at ``start``..``end`` every ``step`` seconds."""
+    if (t is None) == (start is None or end is None) or (start is not None and end is not None and end < start):
+        raise HTTPException(status_code=400, detail="Pass either t or start and end (start <= end)")
+    try:
+        times = snapshot.frame_times(t, start, end, step)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    with database.get_db() as db:
+        if db.execute("SELECT 1 FROM sorties WHERE id = ?", (sortie_id,)).fetchone() is None:
+            raise HTTPException(status_code=404, detail="Sortie not found")
+
+    def build(materialize: bool):
+        store = columnar.open_store(database.DB_PATH, sortie_id)
+        if store is not None:
+            columns = snapshot.from_store(store, times, obj_id)
+        else:
+            with database.get_db() as db:
+                columns = snapshot.from_sql(db, sortie_id, times, obj_id)
+        return Response(orjson.dumps({"frames": snapshot.to_frames(columns)}), media_type="application/json")
+
+    return cached_response(request, sortie_id, sortie_generation(sortie_id), "json", build)
+
+@app.get("/api/sorties/{sortie_id}/proximity", response_model=schemas.Proximity, tags=["Analysis"])
+def get_proximity(request: Request, sortie_id: int, within_nm: float = Query(proximity.WITHIN_NM, gt=0),
+                  merge_nm: float = Query(proximity.MERGE_NM, gt=0), step: float = Query(proximity.STEP_SECONDS, ge=0.1),
+                  obj_id: List[str] | None = Query(None)):
+    """Intervals during which aircraft pairs stayed within ``within_nm``, and merges (see src/proximity.py)."""
+    require_sortie(sortie_id)
 
-    import uuid
-    job_id = str(uuid.uuid4())
+    def build(materialize: bool):
+        with database.get_db() as db:
+            tracks = proximity.load_tracks(db, database.DB_PATH, sortie_id, proximity.aircraft(db, sortie_id, obj_id))
+        intervals, merges = proximity.analyze(tracks, within_nm, merge_nm, step)
+        return Response(orjson.dumps({"intervals": intervals, "merges": merges}), media_type="application/json")
+
+    return cached_response(request, sortie_id, sortie_generation(sortie_id), "json", build)
+
+@app.get("/api/sorties/{sortie_id}/proximity/{a}/{b}", response_model=schemas.PairSeries, tags=["Analysis"])
+def get_pair_geometry(request: Request, sortie_id: int, a: str, b: str,
+                      step: float = Query(proximity.STEP_SECONDS, ge=0.1)):
+    """Range, closure, ATA of ``a`` and aspect of ``b`` over the time both exist."""
+    require_sortie(sortie_id)
+
+    def build(materialize: bool):
+        with database.get_db() as db:
+            tracks = proximity.load_tracks(db, database.DB_PATH, sortie_id, [a, b])
+        if len(tracks) < 2:
+            raise HTTPException(status_code=404, detail="Object not found")
+        body = {}
+        for name, arr in proximity.pair_series(tracks, a, b, step).items():
+            values = arr.astype(object)
+            values[~np.isfinite(arr)] = None
+            body[name] = values.tolist()
+        return Response(orjson.dumps(body), media_type="application/json")
+
+    return cached_response(request, sortie_id, sortie_generation(sortie_id), "json", build)
+
+def region(min_lon: float | None = None, max_lon: float | None = None, min_lat: float | None = None,
+           max_lat: float | None = None, min_alt: float | None = None, max_alt: float | None = None):
+    """Query box ``(min_lon, max_lon, min_lat, max_lat, min_alt, max_alt)``; omitted bounds are open."""
+    box = (min_lon, max_lon, min_lat, max_lat, min_alt, max_alt)
+    for lo, hi in zip(box[::2], box[1::2]):
+        if lo is not None and hi is not None and lo > hi:
+            raise HTTPException(status_code=400, detail="Box minimum above maximum")
+    return box
+
+def require_sortie(sortie_id: int):
     with database.get_db() as db:
-        cursor = db.cursor()
-        cursor.execute("INSERT INTO parse_jobs (id, file_name, status, progress_pct) VALUES (?, ?, ?, ?)",
-                       (job_id, file.filename, "queued", 0))
+        if db.execute("SELECT 1 FROM sorties WHERE id = ?", (sortie_id,)).fetchone() is None:
+            raise HTTPException(status_code=404, detail="Sortie not found")
+
+@app.get("/api/sorties/{sortie_id}/bbox", response_model=List[schemas.TelemetryBase], tags=["Spatial"])
+def get_bbox(request: Request, sortie_id: int, box: tuple = Depends(region), start: float | None = None,
+             end: float | None = None, obj_id: str | None = None):
+    """Telemetry samples of ``sortie_id`` inside the box (and time window), ordered by time."""
+    require_sortie(sortie_id)
+
+    def build(materialize: bool):
+        store = columnar.open_store(database.DB_PATH, sortie_id)
+        if store is not None:
+            # candidate segments from the R*Tree, then the exact test on their samples
+            with database.get_db() as db:
+                spans = spatial.candidates(db, box, start, end, sortie_id)
+            spans = {o: r for (_, o), r in spans.items() if obj_id is None or o == obj_id}
+            columns = spatial.store_rows(store, spans, columnar.CHANNELS)
+            keep = spatial.inside_mask(columns, box, start, end)
+            order = np.flatnonzero(keep)[np.argsort(columns['time_offset'][keep], kind='stable')]
+            rows = columnar.to_rows({name: arr[order] for name, arr in columns.items()})
+        else:
+            where, params = telemetry_where(sortie_id, obj_id, start, end)
+            box_where, box_params = spatial.box_sql(box)
+            query = f"SELECT {', '.join(TELEMETRY_COLUMNS)} FROM telemetry {where}{box_where} ORDER BY time_offset"
+            with database.get_db() as db:
+                rows = [dict(zip(TELEMETRY_COLUMNS, r)) for r in db.execute(query, tuple(params + box_params))]
+        return json_rows_response(schemas.TelemetryBase, rows)
+
+    return cached_response(request, sortie_id, sortie_generation(sortie_id), "json", build)
+
+@app.get("/api/sorties/{sortie_id}/slab", response_model=List[schemas.SlabObject], tags=["Spatial"])
+def get_slab(request: Request, sortie_id: int, box: tuple = Depends(region), start: float | None = None,
+             end: float | None = None):
+    """Objects of ``sortie_id`` present in the time window (and box), with their extent there.
+
+    Answered from the segment index alone for finished sorties; spans and
+    boxes are then segment-granular.
+    """
+    require_sortie(sortie_id)
+    generation = sortie_generation(sortie_id)
+
+    def build(materialize: bool):
+        with database.get_db() as db:
+            if columnar.open_store(database.DB_PATH, sortie_id) is not None:
+                items = spatial.slab(db, sortie_id, start, end, box)
+            else:
+                where, params = telemetry_where(sortie_id, None, start, end)
+                box_where, box_params = spatial.box_sql(box)
+                rows = db.execute(
+                    "SELECT obj_id, min(time_offset), max(time_offset), min(lon), max(lon), min(lat), max(lat), "
+                    f"min(alt), max(alt) FROM telemetry {where}{box_where} GROUP BY obj_id ORDER BY obj_id",
+                    tuple(params + box_params)).fetchall()
+                names = ("obj_id", "start", "end", "min_lon", "max_lon", "min_lat", "max_lat", "min_alt", "max_alt")
+                items = [dict(zip(names, r)) for r in rows]
+        return json_rows_response(schemas.SlabObject, items)
+
+    return cached_response(request, sortie_id, generation, "json", build)
+
+@app.get("/api/airspace", response_model=List[schemas.AirspaceSortie], tags=["Spatial"])
+def get_airspace(box: tuple = Depends(region), start: float | None = None, end: float | None = None,
+                 limit: int = Query(100, ge=1, le=1000)):
+    """Finished sorties with at least one sample inside the box, newest first."""
+    if None in box[:4]:
+        raise HTTPException(status_code=400, detail="min_lon, max_lon, min_lat and max_lat are required")
+    with database.get_db() as db:
+        spans = spatial.candidates(db, box, start, end)
+        by_sortie = {}
+        for (sid, obj_id), ranges in spans.items():
+            by_sortie.setdefault(sid, {})[obj_id] = ranges
+        results = []
+        for sid in sorted(by_sortie, reverse=True):
+            store = columnar.open_store(database.DB_PATH, sid)
+            if store is None:
+                continue
+            columns = spatial.store_rows(store, by_sortie[sid], ('time_offset', 'lon', 'lat', 'alt'))
+            keep = spatial.inside_mask(columns, box, start, end)
+            if not keep.any():
+                continue
+            sortie = db.execute("SELECT id, mission_name, start_time FROM sorties WHERE id = ?", (sid,)).fetchone()
+            if sortie is None:
+                continue
+            t, owners = columns['time_offset'][keep], columns['obj_id'][keep]
+            objects = []
+            for obj_id in sorted(set(owners.tolist())):
+                mine = t[owners == obj_id]
+                objects.append({"obj_id": obj_id, "first": float(mine.min()), "last": float(mine.max()),
+                                "samples": len(mine)})
+            results.append({"sortie_id": sid, "mission_name": sortie["mission_name"],
+                            "start_time": sortie["start_time"], "objects": objects})
+            if len(results) >= limit:
+                break
+    return Response(orjson.dumps(results), media_type="application/json")
+
+@app.delete("/api/sorties/{sortie_id}", tags=["Data"])
+def delete_sortie(sortie_id: int):
+    with database.get_db() as db:
+        if db.execute("SELECT 1 FROM sorties WHERE id = ?", (sortie_id,)).fetchone() is None:
+            raise HTTPException(status_code=404, detail="Sortie not found")
+        for table in ("telemetry", "events", "objects", "global_props"):
+            db.execute(f"DELETE FROM {table} WHERE sortie_id = ?", (sortie_id,))
+        db.execute("DELETE FROM sorties WHERE id = ?", (sortie_id,))
+        spatial.delete_index(db, sortie_id)
+        stats.delete_stats(db, sortie_id)
+        # the stored recording stays; uploading it again parses it afresh
+        db.execute("UPDATE recordings SET sortie_id = NULL WHERE sortie_id = ?", (sortie_id,))
         db.commit()
+    columnar.delete_store(database.DB_PATH, sortie_id)
+    archive.delete_archive(database.DB_PATH, sortie_id)
+    invalidate_sortie(sortie_id)
+    app_logger.info(f"Deleted sortie {sortie_id}")
+    return {"deleted": sortie_id}
 
-    background_tasks.add_task(process_acmi, file_path, job_id)
-    return {"message": f"Successfully uploaded {file.filename}", "job_id": job_id}
+@app.get("/api/cache", tags=["Health"])
+def cache_stats():
+    return {"results": result_cache.stats(), "bodies": body_cache.stats()}
 
-def process_acmi(file_path: str, job_id: str | None = None):
-    acmi_parser = parser.AcmiParser()
-    acmi_parser.parse_file(file_path, job_id=job_id)
+@app.exception_handler(uploads.UploadError)
+async def upload_error_handler(request: Request, exc: uploads.UploadError):
+    return JSONResponse({"detail": exc.detail}, status_code=exc.status_code)
+
+def upload_status(info: dict):
+    return {"upload_id": info["id"], "file_name": info["file_name"], "size": info["size"], "offset": info["offset"],
+            "status": info["status"], "sha256": info["sha256"], "chunk_size": uploads.CHUNK_SIZE,
+            "max_bytes": uploads.MAX_UPLOAD_BYTES}
+
+def load_upload(upload_id: str):
+    with database.get_db() as db:
+        info = uploads.get(db, upload_id)
+    if info is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return info
+
+def upload_result(upload_id: str, file_name: str, digest: str, job: dict):
+    if job["sortie_id"] is not None:
+        message = f"{file_name} was already ingested as sortie {job['sortie_id']}"
+    else:
+        message = f"Successfully uploaded {file_name}"
+    return {"message": message, "upload_id": upload_id, "sha256": digest, **job}
+
+def new_upload(file_name: str):
+    with database.get_db() as db:
+        upload_id = uploads.create(db, file_name)
+        db.commit()
+    return upload_id
+
+def record_upload(upload_id: str, file_name: str, size: int, digest: str):
+    with database.get_db() as db:
+        return uploads.commit_upload(db, upload_id, file_name, size, digest)
+
+async def finish_upload(upload_id: str, info: dict, sha256=None):
+    """Finalize an upload and queue its parse job, unless the same bytes were already ingested."""
+    # database work runs on worker threads: BEGIN IMMEDIATE may wait out a writer
+    commit = functools.partial(record_upload, upload_id, info["file_name"])
+    digest, job = await uploads.finalize(upload_id, info, commit, sha256)
+    if ingest_worker is not None and not job["deduplicated"]:
+        ingest_worker.wake()
+    return upload_result(upload_id, info["file_name"], digest, job)
+
+@app.post("/api/upload", tags=["Ingestion"])
+async def upload_acmi(file: UploadFile = File(...)):
+    """Single-request upload; large files should use the resumable /api/uploads protocol."""
+    upload_id = await run_in_threadpool(new_upload, file.filename)
+    await uploads.append(upload_id, 0, uploads.read_upload_file(file))
+    return await finish_upload(upload_id, await run_in_threadpool(load_upload, upload_id))
+
+@app.post("/api/uploads", response_model=schemas.UploadStatus, tags=["Ingestion"])
+def create_upload(body: schemas.UploadInit):
+    """Start an upload; with a known ``sha256`` of an ingested recording it is finished on the spot."""
+    with database.get_db() as db:
+        upload_id = uploads.create(db, body.file_name, body.size)
+        job = uploads.reuse(db, upload_id, body.sha256) if body.sha256 else None
+        db.commit()
+    status = upload_status(load_upload(upload_id))
+    return {**status, **job} if job else status
+
+@app.get("/api/uploads/{upload_id}", response_model=schemas.UploadStatus, tags=["Ingestion"])
+def get_upload(upload_id: str):
+    return upload_status(load_upload(upload_id))
+
+@app.put("/api/uploads/{upload_id}", response_model=schemas.UploadStatus, tags=["Ingestion"])
+async def append_upload(request: Request, upload_id: str, offset: int = Query(..., ge=0)):
+    """Append the raw request body at ``offset`` (must equal the bytes received so far)."""
+    info = await run_in_threadpool(load_upload, upload_id)
+    if info["status"] != uploads.STATUS_OPEN:
+        raise HTTPException(status_code=409, detail="Upload already finalized")
+    info["offset"] = await uploads.append(upload_id, offset, request.stream(), info["size"])
+    return upload_status(info)
+
+@app.post("/api/uploads/{upload_id}/finalize", tags=["Ingestion"])
+async def finalize_upload(upload_id: str, body: schemas.UploadFinalize | None = None):
+    info = await run_in_threadpool(load_upload, upload_id)
+    return await finish_upload(upload_id, info, body.sha256 if body else None)
+
+def load_job(job_id: str):
+    with database.get_db() as db:
+        row = db.execute("SELECT * FROM parse_jobs WHERE id = ?", (job_id,)).fetchone()
+    if not row:
+        raise HTTPException(status_code=404, detail="Job not found")
+    job = dict(row)
+    # parse_jobs only records status transitions; the percentage of a running job is on the progress bus
+    state = progress.bus.get(job_id)
+    if state is not None:
+        job.update((k, v) for k, v in state.items() if k != "job_id")
+    return job
+
+def job_event(job: dict):
+    return {"job_id": job["id"], "status": job["status"], "progress_pct": job["progress_pct"],
+            "sortie_id": job["sortie_id"], "error": job["error"]}
 
 @app.get("/api/jobs/{job_id}", response_model=schemas.ParseJob, tags=["Ingestion"])
 def get_job(job_id: str):
-    with database.get_db() as db:
-        cursor = db.cursor()
-        row = cursor.execute("SELECT * FROM parse_jobs WHERE id = ?", (job_id,)).fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Job not found")
-        return dict(row)
+    return load_job(job_id)
+
+@app.get("/api/jobs/{job_id}/events", tags=["Ingestion"])
+async def job_events(job_id: str):
+    """Server-sent events: the job's state on every change (at most 4/s) until it is done or failed."""
+    current = job_event(await run_in_threadpool(load_job, job_id))
+
+    async def refresh():
+        # jobs run by a standalone worker never reach this process's bus; it writes progress to parse_jobs
+        return job_event(await run_in_threadpool(load_job, job_id))
+
+    async def events():
+        nonlocal current
+        async for state in progress.bus.watch(job_id, initial=current, refresh=refresh):
+            if state is None:
+                yield b": keep-alive\n\n"
+                continue
+            current = {**current, **state}
+            yield b"data: " + orjson.dumps(current) + b"\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.post("/api/live", response_model=schemas.LiveSession, tags=["Live"])
+def start_live(body: schemas.LiveStart):
+    """Connect to a Tacview real-time telemetry host and record it as a live sortie."""
+    if not realtime.host_allowed(body.host):
+        raise HTTPException(status_code=403, detail="Live host not allowed (LIVE_HOSTS)")
+    session = realtime.start_session(database.DB_PATH, body.host, body.port, body.password_hash, body.name,
+                                     on_finished=invalidate_sortie)
+    return session.info()
+
+@app.get("/api/live", response_model=List[schemas.LiveSession], tags=["Live"])
+def list_live():
+    return [session.info() for session in realtime.list_sessions()]
+
+def load_live(session_id: str):
+    session = realtime.get_session(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Live session not found")
+    return session
+
+@app.get("/api/live/{session_id}", response_model=schemas.LiveSession, tags=["Live"])
+def get_live(session_id: str):
+    return load_live(session_id).info()
+
+@app.delete("/api/live/{session_id}", response_model=schemas.LiveSession, tags=["Live"])
+def stop_live(session_id: str):
+    """Disconnect; the sortie recorded so far is finalized."""
+    session = load_live(session_id)
+    session.stop(timeout=30)
+    if not session.running:
+        realtime.sessions.pop(session_id, None)
+    return session.info()
+
+@app.websocket("/api/live/{session_id}/ws")
+async def live_feed(websocket: WebSocket, session_id: str):
+    """Binary JSON messages: a snapshot, then one delta per frame, then ``{"type": "end"}``."""
+    session = realtime.get_session(session_id)
+    if session is None:
+        await websocket.close(code=4404)
+        return
+    await websocket.accept()
+    sub = session.hub.subscribe()
+    try:
+        async for payload in session.hub.stream(sub):
+            # awaits the client, so a slow one only backs up (and resyncs) its own queue
+            await websocket.send_bytes(payload)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        session.hub.unsubscribe(sub)
 
 # Mount static files using absolute paths to be environment-agnostic
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
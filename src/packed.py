@@ -0,0 +1,92 @@
+"""Packed little-endian column encoding for telemetry responses.
+
+Layout::
+
+    b'DWTC'                     magic
+    uint32                      header length in bytes
+    header                      UTF-8 JSON, space-padded to a multiple of 8
+    column 0 .. column n-1      raw little-endian arrays, each padded to 8 bytes
+
+The header is ``{"version", "rows", "columns": [{"name", "dtype", "offset"}],
+"dictionaries": {name: [values]}}``. ``offset`` is relative to the start of
+the buffer and always 8-byte aligned, so a browser can wrap every column in
+a typed array without copying. Missing values are NaN. String columns
+(``obj_id``) are dictionary-encoded as uint32 codes.
+"""
+import json
+import struct
+
+import numpy as np
+
+MEDIA_TYPE = 'application/vnd.dcs-webtac.columns'
+MAGIC = b'DWTC'
+VERSION = 1
+_PREFIX = struct.Struct('<4sI')
+
+# float32 is plenty for attitude and air data; position and time need float64
+FLOAT64_COLUMNS = ('time_offset', 'lat', 'lon', 'alt')
+DTYPES = {'f8': np.dtype('<f8'), 'f4': np.dtype('<f4'), 'u4': np.dtype('<u4')}
+
+
+def _pad(n):
+    return -n % 8
+
+
+def encode(columns):
+    """Pack a dict of equal-length arrays into bytes. ``id`` is dropped."""
+    specs, blobs, dictionaries = [], [], {}
+    rows = None
+    for name, arr in columns.items():
+        if name == 'id':
+            continue
+        arr = np.asarray(arr)
+        rows = len(arr) if rows is None else rows
+        if arr.dtype.kind in 'OUS':
+            values, codes = np.unique(arr.astype(str), return_inverse=True)
+            dictionaries[name] = values.tolist()
+            dtype, data = 'u4', codes.astype(DTYPES['u4'])
+        else:
+            dtype = 'f8' if name in FLOAT64_COLUMNS else 'f4'
+            data = arr.astype(DTYPES[dtype], copy=False)
+        specs.append({"name": name, "dtype": dtype})
+        blobs.append(data.tobytes())
+
+    def header_bytes(offset_base):
+        offset = offset_base
+        for spec, blob in zip(specs, blobs):
+            spec["offset"] = offset
+            offset += len(blob) + _pad(len(blob))
+        raw = json.dumps({"version": VERSION, "rows": rows or 0, "columns": specs,
+                          "dictionaries": dictionaries}, separators=(',', ':')).encode('utf-8')
+        return raw + b' ' * _pad(_PREFIX.size + len(raw))
+
+    # offsets depend on the header length and vice versa; iterate until stable
+    header = b''
+    while True:
+        again = header_bytes(_PREFIX.size + len(header))
+        if len(again) == len(header):
+            break
+        header = again
+    header = again
+
+    out = [_PREFIX.pack(MAGIC, len(header)), header]
+    for blob in blobs:
+        out.append(blob)
+        out.append(b'\0' * _pad(len(blob)))
+    return b''.join(out)
+
+
+def decode(buf):
+    """Inverse of ``encode``: dict of numpy arrays (dictionary columns as object arrays)."""
+    magic, header_len = _PREFIX.unpack_from(buf, 0)
+    if magic != MAGIC:
+        raise ValueError("not a packed telemetry buffer")
+    header = json.loads(bytes(buf[_PREFIX.size:_PREFIX.size + header_len]))
+    rows = header["rows"]
+    out = {}
+    for spec in header["columns"]:
+        arr = np.frombuffer(buf, dtype=DTYPES[spec["dtype"]], count=rows, offset=spec["offset"])
+        values = header["dictionaries"].get(spec["name"])
+        out[spec["name"]] = np.array(values, dtype=object)[arr] if values is not None else arr
+    return out
+
@@ -0,0 +1,51 @@
+"""Opaque keyset cursors for paginated endpoints.
+
+A cursor is the sort key of the last row of a page, tagged with the
+endpoint it belongs to and base64url-encoded so clients treat it as an
+opaque token. The next page is everything strictly after that key, which
+SQLite answers with an index seek, so every page costs the same.
+"""
+import base64
+import json
+import math
+
+TELEMETRY = 't'  # key: (obj_id, time_offset, id)
+EVENTS = 'e'     # key: (time_offset, id)
+DEFAULT_PAGE_SIZE = 5000
+MAX_PAGE_SIZE = 20000
+
+# type of each key element; a cursor is decoded only if its key matches, so
+# nothing but these values ever reaches a query's bound parameters
+KEY_TYPES = {
+    TELEMETRY: (str, float, int),
+    EVENTS: (float, int),
+}
+
+
+def encode_cursor(kind, key):
+    raw = json.dumps([kind, *key], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def _key_value(value, typ):
+    # bool is an int subclass; JSON numbers without a fraction come back as int
+    if isinstance(value, bool):
+        raise ValueError("invalid cursor")
+    if typ is float and isinstance(value, (int, float)) and math.isfinite(value):
+        return float(value)
+    if typ is not float and isinstance(value, typ):
+        return value
+    raise ValueError("invalid cursor")
+
+
+def decode_cursor(token, kind):
+    """Key tuple from ``token``; ValueError if it is malformed or for another endpoint."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        value = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("invalid cursor")
+    types = KEY_TYPES[kind]
+    if not isinstance(value, list) or len(value) != len(types) + 1 or value[0] != kind:
+        raise ValueError("invalid cursor")
+    return tuple(_key_value(v, typ) for v, typ in zip(value[1:], types))
@@ -0,0 +1,50 @@
+"""Process-pool decoding of ACMI line streams (experimental, off by default).
+
+The input is cut into chunks that always start at a ``#<time>`` frame
+marker, each chunk is decoded in a worker process, and results are yielded
+back in input order. Only the stateless per-line work (tokenizing, float
+conversion, raw payload serialization) runs in the workers; the stateful
+merge (object metadata, carry-forward of omitted T fields, sortie creation)
+stays with the caller so the output matches a sequential parse exactly.
+"""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_CHUNK_LINES = 20000
+
+
+def iter_frame_chunks(lines, chunk_lines=DEFAULT_CHUNK_LINES):
+    """Group lines into lists of at least ``chunk_lines``, split before a frame marker."""
+    chunk = []
+    for line in lines:
+        if len(chunk) >= chunk_lines and line[0] == '#':
+            yield chunk
+            chunk = []
+        chunk.append(line)
+    if chunk:
+        yield chunk
+
+
+def _decode_chunk(decode, chunk):
+    # keep None results so callers can number lines by position
+    return [decode(line) for line in chunk]
+
+
+def decode_parallel(lines, decode, workers, chunk_lines=DEFAULT_CHUNK_LINES, with_lines=False):
+    """Yield ``decode(line)`` for every line of ``lines`` in order, using ``workers`` processes.
+
+    ``decode`` must be picklable (a module-level function or a partial of one). At most
+    ``2 * workers`` chunks are in flight, which bounds memory on large files. With
+    ``with_lines`` the items are ``(line, decode(line))``; the lines never leave this process.
+    """
+    def results(chunk, future):
+        return zip(chunk, future.result()) if with_lines else future.result()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in iter_frame_chunks(lines, chunk_lines):
+            pending.append((chunk, pool.submit(_decode_chunk, decode, chunk)))
+            if len(pending) >= workers * 2:
+                yield from results(*pending.popleft())
+        while pending:
+            yield from results(*pending.popleft())
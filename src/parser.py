@@ -1,49 +1,248 @@
 import sqlite3
-import re
 import os
-import zipfile
-import gzip
-import io
 import json
+import uuid
+import functools
+from collections import deque
+from .writer import BatchWriter, apply_ingest_pragmas
+from .tokenizer import (tokenize_line, iter_logical_lines, parse_property,
+                        KIND_GLOBAL, KIND_FRAME, KIND_REMOVE, KIND_OBJECT)
+from .parallel import decode_parallel
+from .stream import open_acmi
+from . import columnar, archive, spatial, proximity, enrich, stats
+
+RAW_INLINE = 'inline'    # JSON payload in telemetry.raw
+RAW_ARCHIVE = 'archive'  # compressed line archive + telemetry.raw_line
+
+# Lines read between progress checks; keeps tell() calls off the hot path.
+PROGRESS_CHECK_LINES = 2048
+
+
+def split_event(v):
+    """Split an ``Event=Type|id|id|text`` value into (type, object ids, text)."""
+    parts = v.split('|')
+    event_type = parts[0] if parts else ''
+    obj_ids = [p for p in parts[1:-1] if p]
+    text = parts[-1] if parts else ''
+    return event_type, obj_ids, text
+
+
+def new_header(mission_name):
+    """Recording-wide values a sortie is created with, before any global line sets them."""
+    return {"mission_name": mission_name, "pilot_name": "Unknown Pilot", "aircraft_type": "Unknown",
+            "reference_time": None, "recording_time": None, "reference_lon": 0.0, "reference_lat": 0.0}
+
+
+def apply_header(header, props):
+    """Update ``header`` (see ``new_header``) from the properties of a global line.
+
+    Shared by file ingest and live sessions (``src/realtime.py``).
+    """
+    if 'ReferenceTime' in props: header["reference_time"] = props['ReferenceTime']
+    if 'RecordingTime' in props: header["recording_time"] = props['RecordingTime']
+    ref = parse_property('ReferenceLongitude', props.get('ReferenceLongitude', ''))
+    if ref is not None: header["reference_lon"] = ref
+    ref = parse_property('ReferenceLatitude', props.get('ReferenceLatitude', ''))
+    if ref is not None: header["reference_lat"] = ref
+    if 'MissionTitle' in props: header["mission_name"] = props['MissionTitle']
+    if 'RecordingPlayerName' in props: header["pilot_name"] = props['RecordingPlayerName']
+
+
+def merge_coords(coords, prev=None, reference_lon=0.0, reference_lat=0.0):
+    """Object state ``(lon, lat, alt, roll, pitch, yaw, u, v, heading)`` after a ``T=`` update.
+
+    Fields the line omits keep their value from ``prev`` (the previous state
+    of the object, or None). Transmitted lon/lat are offset by the reference
+    point, so states are always absolute.
+    """
+    n = len(coords)
+    lon = coords[0]
+    lat = coords[1] if n > 1 else None
+    alt = coords[2] if n > 2 else None
+
+    roll = pitch = yaw = None
+    u = v = heading = None
+
+    # Tacview ACMI 2.2 T syntaxes (by field count):
+    # 3: Lon|Lat|Alt
+    # 5: Lon|Lat|Alt|U|V
+    # 6: Lon|Lat|Alt|Roll|Pitch|Yaw
+    # 9: Lon|Lat|Alt|Roll|Pitch|Yaw|U|V|Heading
+    if n >= 9:
+        roll, pitch, yaw, u, v, heading = coords[3:9]
+    elif n == 6:
+        roll, pitch, yaw = coords[3:6]
+    elif n == 5:
+        u, v = coords[3:5]
+    elif n >= 4:
+        # partial/legacy: keep roll if present (others omitted)
+        roll = coords[3]
+
+    if lon is not None:
+        lon += reference_lon
+    if lat is not None:
+        lat += reference_lat
+    if prev is None:
+        return (lon, lat, alt, roll, pitch, yaw, u, v, heading)
+    return (lon if lon is not None else prev[0], lat if lat is not None else prev[1],
+            alt if alt is not None else prev[2], roll if roll is not None else prev[3],
+            pitch if pitch is not None else prev[4], yaw if yaw is not None else prev[5],
+            u if u is not None else prev[6], v if v is not None else prev[7],
+            heading if heading is not None else prev[8])
+
+
+def raw_payload_json(rec):
+    """JSON ``raw`` payload of an object line, as stored per telemetry row."""
+    raw_payload = {
+        "T": rec.t,
+        **rec.props
+    }
+    return json.dumps(raw_payload, ensure_ascii=False)
+
+
+def raw_json_for_line(line):
+    """Rebuild the ``raw`` payload from an archived line (None if not an object line)."""
+    rec = tokenize_line(line)
+    return raw_payload_json(rec) if rec.kind == KIND_OBJECT else None
+
+
+def decode_line(line, with_raw=True):
+    """Stateless per-line stage of the parser.
+
+    Returns a compact tuple keyed by line kind, or None for lines the parser
+    ignores. Runs in worker processes in parallel mode, so it must not touch
+    parser state. ``with_raw=False`` skips the raw payload (archive mode).
+    """
+    rec = tokenize_line(line)
+    kind = rec.kind
+    if kind == KIND_OBJECT:
+        # air data only as recorded; src/enrich.py fills the gaps before insert
+        return (KIND_OBJECT, rec.obj_id, rec.props, rec.coords, rec.get('IAS'), rec.get('G'), rec.get('TAS'),
+                rec.get('Mach'), rec.get('FuelWeight'), raw_payload_json(rec) if with_raw else None)
+    if kind == KIND_FRAME:
+        return (KIND_FRAME, rec.time)
+    if kind == KIND_GLOBAL:
+        return (KIND_GLOBAL, rec.props)
+    if kind == KIND_REMOVE:
+        return (KIND_REMOVE, rec.obj_id)
+    return None
+
+
+def finalize_sortie(conn, db_path, sortie_id, summary):
+    """Store ``summary`` and build read-side structures once all rows of a sortie are in; the caller commits.
+
+    Shared by file ingest and live sessions (``src/realtime.py``).
+    """
+    stats.write_stats(conn, sortie_id, summary)
+    try:
+        columnar.write_store(conn, db_path, sortie_id)
+    except Exception as e:
+        print(f"Columnar store for sortie {sortie_id} not written: {e}")
+    store = columnar.open_store(db_path, sortie_id)
+    if store is not None:
+        spatial.write_index(conn, store, sortie_id)
+    try:
+        proximity.write_events(conn, db_path, sortie_id)
+    except Exception as e:
+        print(f"Proximity events for sortie {sortie_id} not written: {e}")
+
 
 class AcmiParser:
-    def __init__(self, db_path='data/flight_data.db'):
+    def __init__(self, db_path='data/flight_data.db', batch_size=5000, txn_rows=100000, tune_pragmas=True, workers=1,
+                 raw_mode=RAW_ARCHIVE, on_progress=None):
         self.db_path = db_path
+        # on_progress(job_id, pct) at every 5% of input read
+        self.on_progress = on_progress
+        # experimental, off by default: decode in a process pool (src/parallel.py); only
+        # benchmarks/bench_ingest.py --workers sets it until it is shown to scale
+        self.workers = workers
+        self.raw_mode = raw_mode
+        self.batch_size = batch_size
+        self.txn_rows = txn_rows
+        self.tune_pragmas = tune_pragmas
         self.sortie_id = None
         self.primary_obj_id = None
         self.objects = {}
         self.last_state = {}
+        self._obj_written = set()
 
-    def _get_file_handle(self, acmi_path):
-        if acmi_path.endswith('.zip') or acmi_path.endswith('.zip.acmi'):
-            with zipfile.ZipFile(acmi_path, 'r') as z:
-                for name in z.namelist():
-                    if name.endswith('.acmi'):
-                        data = z.read(name)
-                        return io.StringIO(data.decode('utf-8', errors='replace')), len(data)
-        elif acmi_path.endswith('.gz'):
-            fh = io.TextIOWrapper(gzip.open(acmi_path, 'rb'), encoding='utf-8', errors='replace')
-            return fh, os.path.getsize(acmi_path)
+    def _close_archive(self, line_archive):
+        if line_archive is None:
+            return
+        if self.sortie_id is None:
+            line_archive.abort()
         else:
-            return open(acmi_path, 'r', encoding='utf-8', errors='replace'), os.path.getsize(acmi_path)
-
-    def parse_file(self, acmi_path, job_id=None):
+            line_archive.close(archive.archive_path(self.db_path, self.sortie_id))
+
+    def _load_checkpoint(self, cursor, job_id, acmi_path):
+        """The checkpoint ``job_id`` resumes from, or None to parse from the start."""
+        if not job_id:
+            return None
+        row = cursor.execute(
+            "SELECT c.sortie_id, c.line_no, c.byte_offset, c.time_offset, c.state FROM parse_checkpoints c "
+            "JOIN sorties s ON s.id = c.sortie_id WHERE c.job_id = ? AND s.parse_status = 'running'",
+            (job_id,)).fetchone()
+        if row is None:
+            return None
+        sortie_id, line_no, byte_offset, time_offset, state = row
+        state = json.loads(state)
+        saved = state["archive"]
+        # checkpoints from before rows were derived at insert have no "derive" state to carry on from
+        usable = (state["file_size"] == os.path.getsize(acmi_path) and state["raw_mode"] == self.raw_mode
+                  and "derive" in state)
+        if usable and saved is not None and not os.path.exists(saved["path"]):
+            # interrupted after the archive was moved into place; resuming truncates its footer off again
+            final = archive.archive_path(self.db_path, sortie_id)
+            if os.path.exists(final):
+                os.replace(final, saved["path"])
+            else:
+                usable = False
+        if not usable:
+            cursor.execute("UPDATE sorties SET parse_status = 'failed' WHERE id = ?", (sortie_id,))
+            cursor.execute("DELETE FROM parse_checkpoints WHERE job_id = ?", (job_id,))
+            return None
+        return {"sortie_id": sortie_id, "line_no": line_no, "byte_offset": byte_offset,
+                "time_offset": time_offset, "state": state}
+
+    def parse_file(self, acmi_path, job_id=None, source_name=None):
         if not os.path.exists(acmi_path):
             print(f"Error: {acmi_path} not found")
             return
 
         conn = sqlite3.connect(self.db_path)
+        if self.tune_pragmas:
+            apply_ingest_pragmas(conn)
         cursor = conn.cursor()
+        # rows are committed only together with a checkpoint, so a resumed job never sees half a frame
+        writer = BatchWriter(conn, batch_size=self.batch_size, txn_rows=self.txn_rows, autocommit=False)
 
         current_time_offset = 0.0
-        mission_name = os.path.basename(acmi_path)
-        pilot_name = "Unknown Pilot"
-        aircraft_type = "Unknown"
-        reference_time = None
-        recording_time = None
-        reference_lon = 0.0
-        reference_lat = 0.0
+        # uploads are stored under their content hash; name the sortie after the uploaded file
+        header = new_header(source_name or os.path.basename(acmi_path))
         global_props_buffer = []
+        progress_pct = 0
+        first_line = 0
+        start_offset = 0
+        archive_state = None
+        # rows held back for derivation count towards no transaction; keep them fewer than one holds
+        derive_chunk = min(enrich.CHUNK_ROWS, self.txn_rows)
+        deriver = enrich.TrackDeriver(chunk=derive_chunk)
+
+        resume = self._load_checkpoint(cursor, job_id, acmi_path)
+        if resume is not None:
+            state = resume["state"]
+            self.sortie_id = resume["sortie_id"]
+            self.objects = state["objects"]
+            self.last_state = state["last_state"]
+            self._obj_written = set(state["obj_written"])
+            self.primary_obj_id = state["primary_obj_id"]
+            current_time_offset = resume["time_offset"]
+            header = {key: state[key] for key in header}
+            global_props_buffer = [tuple(p) for p in state["global_props_buffer"]]
+            first_line = resume["line_no"]
+            start_offset = resume["byte_offset"]
+            archive_state = state["archive"]
+            deriver = enrich.TrackDeriver(chunk=derive_chunk, state=state["derive"])
 
         def update_job(status=None, progress=None, error=None, sortie_id=None):
             if not job_id:
@@ -67,279 +266,228 @@ class AcmiParser:
             sets.append("updated_at = CURRENT_TIMESTAMP")
             params.append(job_id)
             cursor.execute(f"UPDATE parse_jobs SET {', '.join(sets)} WHERE id = ?", params)
-            conn.commit()
 
+        def save_checkpoint(next_line, byte_offset):
+            """Commit everything up to ``next_line`` together with the state to resume from it."""
+            for row in deriver.ready():
+                writer.add("telemetry", row)
+            writer.flush()
+            if job_id and self.sortie_id is not None:
+                state = {
+                    "objects": self.objects,
+                    "last_state": self.last_state,
+                    "obj_written": list(self._obj_written),
+                    "primary_obj_id": self.primary_obj_id,
+                    **header,
+                    "global_props_buffer": global_props_buffer,
+                    "archive": line_archive.checkpoint() if line_archive is not None else None,
+                    "derive": deriver.state(),
+                    "raw_mode": self.raw_mode,
+                    "file_size": os.path.getsize(acmi_path),
+                }
+                cursor.execute(
+                    "INSERT OR REPLACE INTO parse_checkpoints (job_id, sortie_id, line_no, byte_offset, time_offset, state, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)",
+                    (job_id, self.sortie_id, next_line, byte_offset, current_time_offset, json.dumps(state, ensure_ascii=False)))
+            writer.commit()
+
+        line_archive = None
         try:
-            handle, total_bytes = self._get_file_handle(acmi_path)
-            processed_bytes = 0
-            last_progress = -1
-            update_job(status="running", progress=0)
-            with handle as f:
+            handle = open_acmi(acmi_path, start_offset)
+            update_job(status="running")
+            writer.commit()
+
+            def tracked(f):
+                nonlocal progress_pct
                 for i, line in enumerate(f):
-                    processed_bytes += len(line.encode('latin-1', errors='ignore'))
-                    if total_bytes:
-                        progress = int(processed_bytes * 100 / total_bytes)
-                        if progress != last_progress and progress % 5 == 0:
-                            update_job(progress=progress)
-                            last_progress = progress
+                    if i % PROGRESS_CHECK_LINES == 0:
+                        progress = int(f.fraction() * 100)
+                        progress -= progress % 5
+                        if progress > progress_pct:
+                            progress_pct = progress
+                            # reported straight to the progress bus, never written to parse_jobs
+                            if job_id and self.on_progress is not None:
+                                self.on_progress(job_id, progress)
+                    yield line
+
+            # (line number, stream offset) of frame lines read but not yet consumed: the places a checkpoint can be taken
+            frame_offsets = deque()
+
+            def positions(lines, f):
+                line_no = first_line
+                for line in lines:
+                    if line[:1] == '#':
+                        frame_offsets.append((line_no, f.position))
+                    line_no += 1
+                    yield line
 
-                    line = line.strip()
-                    if not line: continue
+            with handle as f:
+                lines = positions(iter_logical_lines(tracked(f)), f)
+                decode = decode_line
+                if self.raw_mode == RAW_ARCHIVE:
+                    root = archive.archive_root(self.db_path)
+                    if archive_state is None:
+                        line_archive = archive.ArchiveWriter(os.path.join(root, f".ingest-{uuid.uuid4().hex}.tmp"))
+                    else:
+                        line_archive = archive.ArchiveWriter.resume(archive_state)
+                    decode = functools.partial(decode_line, with_raw=False)
+                if self.workers and self.workers > 1:
+                    decoded = decode_parallel(lines, decode, self.workers, with_lines=True)
+                else:
+                    decoded = ((line, decode(line)) for line in lines)
+
+                line_no = first_line - 1
+                for line_no, (line, item) in enumerate(decoded, first_line):
+                    if item is not None and item[0] == KIND_FRAME:
+                        # a frame boundary: all rows of earlier frames are complete
+                        while frame_offsets and frame_offsets[0][0] < line_no:
+                            frame_offsets.popleft()
+                        if writer.txn_full() and frame_offsets and frame_offsets[0][0] == line_no:
+                            save_checkpoint(line_no, frame_offsets[0][1])
+                    if line_archive is not None:
+                        line_archive.append(line)
+                    if item is None:
+                        continue
+                    kind = item[0]
 
-                    if line.startswith('0,'):
+                    if kind == KIND_GLOBAL:
                         # Global properties & events
-                        if 'ReferenceTime=' in line:
-                            match = re.search(r'ReferenceTime=([^,]*)', line)
-                            if match: reference_time = match.group(1)
-                        if 'RecordingTime=' in line:
-                            match = re.search(r'RecordingTime=([^,]*)', line)
-                            if match: recording_time = match.group(1)
-                        if 'ReferenceLongitude=' in line:
-                            match = re.search(r'ReferenceLongitude=([^,]*)', line)
-                            if match: reference_lon = float(match.group(1))
-                        if 'ReferenceLatitude=' in line:
-                            match = re.search(r'ReferenceLatitude=([^,]*)', line)
-                            if match: reference_lat = float(match.group(1))
-                        if 'MissionTitle=' in line:
-                            match = re.search(r'MissionTitle=([^,]*)', line)
-                            if match: mission_name = match.group(1)
-                        if 'RecordingPlayerName=' in line:
-                            match = re.search(r'RecordingPlayerName=([^,]*)', line)
-                            if match: pilot_name = match.group(1)
-
-                        try:
-                            kvs = line.split(',', 1)[1].split(',')
-                            for seg in kvs:
-                                if '=' in seg:
-                                    k, v = seg.split('=', 1)
-                                    # Event handling
-                                    if k == 'Event':
-                                        parts = v.split('|')
-                                        event_type = parts[0] if parts else ''
-                                        obj_ids = [p for p in parts[1:-1] if p]
-                                        text = parts[-1] if parts else ''
-                                        if self.sortie_id:
-                                            cursor.execute(
-                                                "INSERT INTO events (sortie_id, time_offset, event_type, object_ids, text, raw) VALUES (?, ?, ?, ?, ?, ?)",
-                                                (self.sortie_id, current_time_offset, event_type, json.dumps(obj_ids), text, json.dumps({"Event": v}))
-                                            )
-                                        else:
-                                            global_props_buffer.append(("Event", v))
-                                    else:
-                                        if self.sortie_id:
-                                            cursor.execute(
-                                                "INSERT INTO global_props (sortie_id, key, value) VALUES (?, ?, ?)",
-                                                (self.sortie_id, k, v)
-                                            )
-                                        else:
-                                            global_props_buffer.append((k, v))
-                        except Exception:
-                            pass
+                        props = item[1]
+                        apply_header(header, props)
+
+                        for k, v in props.items():
+                            # Event handling
+                            if k == 'Event':
+                                if self.sortie_id:
+                                    event_type, obj_ids, text = split_event(v)
+                                    writer.add("events", (self.sortie_id, current_time_offset, event_type, json.dumps(obj_ids), text, json.dumps({"Event": v})))
+                                else:
+                                    global_props_buffer.append(("Event", v))
+                            else:
+                                if self.sortie_id:
+                                    writer.add("global_props", (self.sortie_id, k, v))
+                                else:
+                                    global_props_buffer.append((k, v))
                         continue
 
-                    if line.startswith('#'):
-                        try:
-                            current_time_offset = float(line[1:])
-                        except ValueError:
-                            continue
+                    if kind == KIND_FRAME:
+                        current_time_offset = item[1]
                         continue
 
-                    if line.startswith('-'):
+                    if kind == KIND_REMOVE:
                         # object removal
                         if self.sortie_id:
-                            cursor.execute(
-                                "INSERT INTO events (sortie_id, time_offset, event_type, object_ids, text, raw) VALUES (?, ?, ?, ?, ?, ?)",
-                                (self.sortie_id, current_time_offset, "Removed", json.dumps([line[1:]]), "", json.dumps({"Removed": line[1:]}))
-                            )
+                            removed_id = item[1]
+                            writer.add("events", (self.sortie_id, current_time_offset, "Removed", json.dumps([removed_id]), "", json.dumps({"Removed": removed_id})))
                         continue
 
-                    if ',T=' in line:
-                        parts = line.split(',', 1)
-                        obj_id = parts[0]
-
-                        # Parse key=value fields on the line
-                        fields = {}
-                        if len(parts) > 1:
-                            for seg in parts[1].split(','):
-                                if '=' in seg:
-                                    k, v = seg.split('=', 1)
-                                    fields[k] = v
-
-                        obj_type = fields.get('Type')
-                        obj_name = fields.get('Name')
-                        obj_pilot = fields.get('Pilot')
-                        obj_coal = fields.get('Coalition')
-                        obj_callsign = fields.get('CallSign')
-                        obj_color = fields.get('Color')
-                        obj_shape = fields.get('Shape')
-
-                        # Capture/refresh object metadata when available
-                        if obj_type or obj_name or obj_pilot or obj_coal:
-                            meta = self.objects.get(obj_id, {})
-                            if obj_type: meta['type'] = obj_type
-                            if obj_name: meta['name'] = obj_name
-                            if obj_pilot: meta['pilot'] = obj_pilot
-                            if obj_coal: meta['coalition'] = obj_coal
-                            if obj_callsign: meta['callsign'] = obj_callsign
-                            if obj_color: meta['color'] = obj_color
-                            if obj_shape: meta['shape'] = obj_shape
-                            self.objects[obj_id] = meta
-
-                        # Create sortie on first Air object
-                        if self.sortie_id is None and (obj_type and obj_type.startswith('Air')):
-                            aircraft_type = obj_name or aircraft_type
-                            pilot_name = obj_pilot or pilot_name
-                            start_time_value = reference_time or recording_time
-                            cursor.execute(
-                                "INSERT INTO sorties (mission_name, pilot_name, aircraft_type, start_time, parse_status, reference_time) VALUES (?, ?, ?, ?, ?, ?)",
-                                (mission_name, pilot_name, aircraft_type, start_time_value, "running", reference_time)
-                            )
-                            self.sortie_id = cursor.lastrowid
-                            update_job(sortie_id=self.sortie_id)
-                            # flush buffered global props/events
-                            for k, v in global_props_buffer:
-                                if k == "Event":
-                                    parts = v.split('|')
-                                    event_type = parts[0] if parts else ''
-                                    obj_ids = [p for p in parts[1:-1] if p]
-                                    text = parts[-1] if parts else ''
-                                    cursor.execute(
-                                        "INSERT INTO events (sortie_id, time_offset, event_type, object_ids, text, raw) VALUES (?, ?, ?, ?, ?, ?)",
-                                        (self.sortie_id, 0.0, event_type, json.dumps(obj_ids), text, json.dumps({"Event": v}))
-                                    )
-                                else:
-                                    cursor.execute(
-                                        "INSERT INTO global_props (sortie_id, key, value) VALUES (?, ?, ?)",
-                                        (self.sortie_id, k, v)
-                                    )
-                            global_props_buffer.clear()
-
-                        # Only store telemetry for Air objects
-                        obj_meta = self.objects.get(obj_id, {})
-                        if not (obj_meta.get('type') or obj_type):
-                            continue
-                        if not (obj_meta.get('type', obj_type).startswith('Air')):
-                            continue
-
-                        # Upsert object into objects table once
-                        if self.sortie_id is not None and obj_id not in getattr(self, '_obj_written', set()):
-                            self._obj_written = getattr(self, '_obj_written', set())
-                            cursor.execute(
-                                'INSERT INTO objects (sortie_id, obj_id, name, type, coalition, pilot, callsign, color, shape, raw) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
-                                (self.sortie_id, obj_id, obj_meta.get('name') or obj_name, obj_meta.get('type') or obj_type,
-                                 obj_meta.get('coalition') or obj_coal, obj_meta.get('pilot') or obj_pilot,
-                                 obj_meta.get('callsign') or obj_callsign, obj_meta.get('color') or obj_color,
-                                 obj_meta.get('shape') or obj_shape,
-                                 json.dumps(obj_meta, ensure_ascii=False))
-                            )
-                            self._obj_written.add(obj_id)
-
-                        t_match = re.search(r'T=([^,]*)', line)
-                        if t_match:
-                            coords = t_match.group(1).split('|')
-                            def to_float_nullable(v):
-                                try:
-                                    return float(v) if v != '' else None
-                                except ValueError:
-                                    return None
-
-                            lon = to_float_nullable(coords[0]) if len(coords) > 0 else None
-                            lat = to_float_nullable(coords[1]) if len(coords) > 1 else None
-                            alt = to_float_nullable(coords[2]) if len(coords) > 2 else None
-
-                            roll = pitch = yaw = None
-                            u = v = heading = None
-
-                            # Tacview ACMI 2.2 T syntaxes (by field count):
-                            # 3: Lon|Lat|Alt
-                            # 5: Lon|Lat|Alt|U|V
-                            # 6: Lon|Lat|Alt|Roll|Pitch|Yaw
-                            # 9: Lon|Lat|Alt|Roll|Pitch|Yaw|U|V|Heading
-                            c3 = to_float_nullable(coords[3]) if len(coords) > 3 else None
-                            c4 = to_float_nullable(coords[4]) if len(coords) > 4 else None
-                            c5 = to_float_nullable(coords[5]) if len(coords) > 5 else None
-                            c6 = to_float_nullable(coords[6]) if len(coords) > 6 else None
-                            c7 = to_float_nullable(coords[7]) if len(coords) > 7 else None
-                            c8 = to_float_nullable(coords[8]) if len(coords) > 8 else None
-
-                            if len(coords) >= 9:
-                                roll = c3
-                                pitch = c4
-                                yaw = c5
-                                u = c6
-                                v = c7
-                                heading = c8
-                            elif len(coords) == 6:
-                                roll = c3
-                                pitch = c4
-                                yaw = c5
-                            elif len(coords) == 5:
-                                u = c3
-                                v = c4
-                            elif len(coords) >= 4:
-                                # partial/legacy: keep roll if present (others omitted)
-                                roll = c3
-
-                            state = self.last_state.get(obj_id, {})
-                            lon = lon if lon is not None else state.get('lon')
-                            lat = lat if lat is not None else state.get('lat')
-                            alt = alt if alt is not None else state.get('alt')
-                            roll = roll if roll is not None else state.get('roll')
-                            pitch = pitch if pitch is not None else state.get('pitch')
-                            yaw = yaw if yaw is not None else state.get('yaw')
-                            u = u if u is not None else state.get('u')
-                            v = v if v is not None else state.get('v')
-                            heading = heading if heading is not None else state.get('heading')
-
-                            if lon is None or lat is None or alt is None:
-                                continue
-
-                            if reference_lon or reference_lat:
-                                lon += reference_lon
-                                lat += reference_lat
-                            
-                            ias = 0
-                            ias_match = re.search(r'IAS=([^,]*)', line)
-                            if ias_match: ias = float(ias_match.group(1))
-                            
-                            g_force = 1.0
-                            g_match = re.search(r'G=([^,]*)', line)
-                            if g_match: g_force = float(g_match.group(1))
-
-                            raw_payload = {
-                                "T": coords,
-                                **fields
-                            }
-
-                            # update last known state for omitted fields
-                            self.last_state[obj_id] = {
-                                'lon': lon, 'lat': lat, 'alt': alt,
-                                'roll': roll, 'pitch': pitch, 'yaw': yaw,
-                                'u': u, 'v': v, 'heading': heading
-                            }
-
-                            cursor.execute('''
-                                INSERT INTO telemetry (sortie_id, obj_id, time_offset, lat, lon, alt, roll, pitch, yaw, u, v, heading, ias, g_force, raw)
-                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                            ''', (self.sortie_id, obj_id, current_time_offset, lat, lon, alt, roll, pitch, yaw, u, v, heading, ias, g_force,
-                                  json.dumps(raw_payload, ensure_ascii=False)))
+                    _, obj_id, fields, coords, ias, g_force, tas, mach, fuel, raw_json = item
+
+                    obj_type = fields.get('Type')
+                    obj_name = fields.get('Name')
+                    obj_pilot = fields.get('Pilot')
+                    obj_coal = fields.get('Coalition')
+                    obj_callsign = fields.get('CallSign')
+                    obj_color = fields.get('Color')
+                    obj_shape = fields.get('Shape')
+
+                    # Capture/refresh object metadata when available
+                    if obj_type or obj_name or obj_pilot or obj_coal:
+                        meta = self.objects.get(obj_id, {})
+                        if obj_type: meta['type'] = obj_type
+                        if obj_name: meta['name'] = obj_name
+                        if obj_pilot: meta['pilot'] = obj_pilot
+                        if obj_coal: meta['coalition'] = obj_coal
+                        if obj_callsign: meta['callsign'] = obj_callsign
+                        if obj_color: meta['color'] = obj_color
+                        if obj_shape: meta['shape'] = obj_shape
+                        self.objects[obj_id] = meta
+
+                    # Create sortie on first Air object
+                    if self.sortie_id is None and (obj_type and obj_type.startswith('Air')):
+                        header["aircraft_type"] = obj_name or header["aircraft_type"]
+                        header["pilot_name"] = obj_pilot or header["pilot_name"]
+                        start_time_value = header["reference_time"] or header["recording_time"]
+                        cursor.execute(
+                            "INSERT INTO sorties (mission_name, pilot_name, aircraft_type, start_time, parse_status, reference_time) VALUES (?, ?, ?, ?, ?, ?)",
+                            (header["mission_name"], header["pilot_name"], header["aircraft_type"], start_time_value, "running",
+                             header["reference_time"])
+                        )
+                        self.sortie_id = cursor.lastrowid
+                        update_job(sortie_id=self.sortie_id)
+                        # flush buffered global props/events
+                        for k, v in global_props_buffer:
+                            if k == "Event":
+                                event_type, obj_ids, text = split_event(v)
+                                writer.add("events", (self.sortie_id, 0.0, event_type, json.dumps(obj_ids), text, json.dumps({"Event": v})))
+                            else:
+                                writer.add("global_props", (self.sortie_id, k, v))
+                        global_props_buffer.clear()
+
+                    # Only store telemetry for Air objects
+                    obj_meta = self.objects.get(obj_id, {})
+                    if not (obj_meta.get('type') or obj_type):
+                        continue
+                    if not (obj_meta.get('type', obj_type).startswith('Air')):
+                        continue
+
+                    # Upsert object into objects table once
+                    if self.sortie_id is not None and obj_id not in self._obj_written:
+                        writer.add("objects", (self.sortie_id, obj_id, obj_meta.get('name') or obj_name, obj_meta.get('type') or obj_type,
+                                               obj_meta.get('coalition') or obj_coal, obj_meta.get('pilot') or obj_pilot,
+                                               obj_meta.get('callsign') or obj_callsign, obj_meta.get('color') or obj_color,
+                                               obj_meta.get('shape') or obj_shape,
+                                               json.dumps(obj_meta, ensure_ascii=False)))
+                        self._obj_written.add(obj_id)
+
+                    state = merge_coords(coords, self.last_state.get(obj_id), header["reference_lon"], header["reference_lat"])
+                    lon, lat, alt, roll, pitch, yaw, u, v, heading = state
+                    if lon is None or lat is None or alt is None:
+                        continue
+                    # last known state fills fields omitted by later lines
+                    self.last_state[obj_id] = state
+
+                    for row in deriver.add((self.sortie_id, obj_id, current_time_offset, lat, lon, alt, roll, pitch, yaw, u, v, heading,
+                                            ias, g_force, tas, mach, fuel, raw_json, None if raw_json is not None else line_no)):
+                        writer.add("telemetry", row)
+
+                for row in deriver.finish():
+                    writer.add("telemetry", row)
+                # all input is in: a crash from here on resumes at the end of the file
+                save_checkpoint(line_no + 1, f.next_position)
 
+            self._close_archive(line_archive)
+            line_archive = None
             if self.sortie_id is not None:
-                cursor.execute("UPDATE sorties SET parse_status = 'done' WHERE id = ?", (self.sortie_id,))
-                conn.commit()
+                finalize_sortie(conn, self.db_path, self.sortie_id, deriver.stats)
+                # a new generation invalidates cached responses for this sortie
+                cursor.execute("UPDATE sorties SET parse_status = 'done', parse_generation = parse_generation + 1 WHERE id = ?",
+                               (self.sortie_id,))
             update_job(status="done", progress=100)
+            if job_id:
+                cursor.execute("DELETE FROM parse_checkpoints WHERE job_id = ?", (job_id,))
+            writer.commit()
             print(f"Successfully processed {acmi_path}")
         except Exception as e:
+            # drop rows written since the last checkpoint; a sortie created after it is gone with them
+            writer.discard()
+            if self.sortie_id is not None and cursor.execute(
+                    "SELECT 1 FROM sorties WHERE id = ?", (self.sortie_id,)).fetchone() is None:
+                self.sortie_id = None
+            self._close_archive(line_archive)
             update_job(status="failed", error=str(e))
+            if job_id:
+                cursor.execute("DELETE FROM parse_checkpoints WHERE job_id = ?", (job_id,))
             if self.sortie_id is not None:
                 cursor.execute("UPDATE sorties SET parse_status = 'failed' WHERE id = ?", (self.sortie_id,))
-                conn.commit()
+            writer.commit()
             print(f"Failed to parse {acmi_path}: {e}")
         finally:
             conn.close()
 
 if __name__ == "__main__":
-    import db_init
+    # Run as a module from the repo root: python -m src.parser
+    from . import db_init
     db_init.init_db()
     parser = AcmiParser()
     # Testing with sample if exists
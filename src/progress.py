@@ -0,0 +1,127 @@
+"""In-process bus for parse job progress.
+
+The ingest worker publishes every job update here: status transitions
+from the supervisor (claimed, finished, requeued) and progress steps that
+parse processes send back over a queue. The embedded worker writes
+``parse_jobs`` only on status transitions, so its percentages live only on
+the bus; a standalone worker has no bus and writes throttled percentages
+to ``parse_jobs`` as well.
+
+``GET /api/jobs/{job_id}/events`` streams a job to the browser as
+server-sent events via ``watch``: the latest state whenever it changes,
+coalesced to at most one update per ``THROTTLE_SECONDS``, ending with
+``done`` or ``failed``. A job the bus has not heard of (standalone
+worker in another process) is re-read from the database every
+``refresh`` seconds instead.
+"""
+import asyncio
+import threading
+import time
+
+THROTTLE_SECONDS = 0.25
+# finished jobs stay readable this long for late subscribers
+RETAIN_SECONDS = 300
+TERMINAL = ('done', 'failed')
+
+
+class _Watch:
+    def __init__(self, loop):
+        self.loop = loop
+        self.latest = None
+        self.changed = asyncio.Event()
+
+    def update(self, state):
+        self.latest = state
+        self.changed.set()
+
+
+class ProgressBus:
+    def __init__(self, throttle=THROTTLE_SECONDS, retain=RETAIN_SECONDS):
+        self.throttle = throttle
+        self.retain = retain
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._finished = {}
+        self._watches = {}
+
+    def publish(self, job_id, **fields):
+        """Merge ``fields`` into the state of ``job_id``; callable from any thread.
+
+        Progress arriving after a job finished (queued behind the final
+        status) is ignored.
+        """
+        with self._lock:
+            state = self._jobs.get(job_id)
+            if state is None:
+                state = self._jobs[job_id] = {"job_id": job_id}
+            elif state.get("status") in TERMINAL and "status" not in fields:
+                return
+            state.update(fields)
+            now = time.monotonic()
+            if state.get("status") in TERMINAL:
+                self._finished[job_id] = now
+            else:
+                self._finished.pop(job_id, None)
+            self._expire(now)
+            snapshot = dict(state)
+            watches = tuple(self._watches.get(job_id, ()))
+        for watch in watches:
+            try:
+                watch.loop.call_soon_threadsafe(watch.update, snapshot)
+            except RuntimeError:
+                pass
+
+    def _expire(self, now):
+        for job_id, finished_at in list(self._finished.items()):
+            if now - finished_at < self.retain:
+                break
+            del self._finished[job_id]
+            self._jobs.pop(job_id, None)
+
+    def get(self, job_id):
+        with self._lock:
+            state = self._jobs.get(job_id)
+            return dict(state) if state is not None else None
+
+    async def watch(self, job_id, initial=None, refresh=None, idle_seconds=15.0):
+        """Async iterator of the state of ``job_id``, ending after a terminal status.
+
+        Starts with the bus state, else ``initial``. When nothing was
+        published for ``idle_seconds`` it awaits ``refresh()`` (if given)
+        for a fresh state and yields None if nothing changed, which the
+        caller can use as a keep-alive.
+        """
+        watch = _Watch(asyncio.get_running_loop())
+        with self._lock:
+            self._watches.setdefault(job_id, set()).add(watch)
+            state = self._jobs.get(job_id)
+            state = dict(state) if state is not None else initial
+        try:
+            last = None
+            while True:
+                if state is not None and state != last:
+                    yield state
+                    last = state
+                    if state.get("status") in TERMINAL:
+                        return
+                    # coalesce: whatever arrives meanwhile is sent as one update
+                    await asyncio.sleep(self.throttle)
+                try:
+                    await asyncio.wait_for(watch.changed.wait(), idle_seconds)
+                    watch.changed.clear()
+                    state = watch.latest
+                except asyncio.TimeoutError:
+                    state = await refresh() if refresh is not None else None
+                    if state is None or state == last:
+                        state = None
+                        yield None
+        finally:
+            with self._lock:
+                watches = self._watches.get(job_id)
+                if watches is not None:
+                    watches.discard(watch)
+                    if not watches:
+                        del self._watches[job_id]
+
+
+bus = ProgressBus()
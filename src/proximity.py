@@ -0,0 +1,229 @@
+"""Pairwise range, closure and aspect between aircraft, and merge detection.
+
+Every aircraft track is resampled onto one time grid (``STEP_SECONDS``)
+and converted to WGS84 ECEF, giving a ``(objects, frames, 3)`` position
+array; pair geometry is then plain vector math on slices of it.
+
+The grid is processed in chunks of ``CHUNK_FRAMES``. Per chunk each
+aircraft's ECEF bounding box is taken, and pairs whose boxes are further
+apart than the search radius are dropped before any per-frame distance is
+computed, so cost follows the number of pairs that actually get close
+rather than objects² x frames.
+
+Results, written to ``events`` at the end of ingest:
+
+- ``Proximity``: an interval during which two aircraft stayed within
+  ``WITHIN_NM`` (``raw`` carries start, end and minimum range);
+- ``Merge``: two aircraft passing each other, a local range minimum
+  within ``MERGE_NM`` reached while closing.
+"""
+import json
+
+import numpy as np
+
+from . import columnar
+
+STEP_SECONDS = 1.0
+CHUNK_FRAMES = 256
+WITHIN_NM = 10.0
+MERGE_NM = 1.5
+METERS_PER_NM = 1852.0
+EVENT_TYPES = ('Proximity', 'Merge')
+
+_WGS84_A = 6378137.0
+_WGS84_E2 = 6.69437999014e-3
+
+
+def ecef(lat, lon, alt):
+    """WGS84 geodetic degrees/meters to ECEF meters; arrays broadcast, result has a trailing axis of 3."""
+    phi, lam = np.radians(lat), np.radians(lon)
+    sin_phi = np.sin(phi)
+    n = _WGS84_A / np.sqrt(1.0 - _WGS84_E2 * sin_phi * sin_phi)
+    return np.stack([(n + alt) * np.cos(phi) * np.cos(lam),
+                     (n + alt) * np.cos(phi) * np.sin(lam),
+                     (n * (1.0 - _WGS84_E2) + alt) * sin_phi], axis=-1)
+
+
+def aircraft(conn, sortie_id, obj_ids=None):
+    """Object ids of the sortie's aircraft (``Air+...`` types), or ``obj_ids`` as given."""
+    if obj_ids is not None:
+        return list(obj_ids)
+    return [r[0] for r in conn.execute(
+        "SELECT obj_id FROM objects WHERE sortie_id = ? AND type LIKE 'Air%' ORDER BY obj_id", (sortie_id,))]
+
+
+def load_tracks(conn, db_path, sortie_id, obj_ids):
+    """{obj_id: (time_offset, lat, lon, alt)} arrays, from the columnar store when there is one."""
+    store = columnar.open_store(db_path, sortie_id)
+    tracks = {}
+    for obj_id in obj_ids:
+        if store is not None:
+            if obj_id not in store.objects:
+                continue
+            lo, hi = store.objects[obj_id]
+            track = tuple(np.asarray(store.column(name)[lo:hi]) for name in ('time_offset', 'lat', 'lon', 'alt'))
+        else:
+            rows = conn.execute("SELECT time_offset, lat, lon, alt FROM telemetry WHERE sortie_id = ? AND obj_id = ? "
+                                "ORDER BY time_offset, id", (sortie_id, obj_id)).fetchall()
+            track = tuple(np.array(rows, dtype=np.float64).reshape(len(rows), 4).T)
+        known = ~np.isnan(np.column_stack(track)).any(axis=1)
+        if known.sum() >= 2:
+            tracks[obj_id] = tuple(a[known] for a in track)
+    return tracks
+
+
+def resample(tracks, step=STEP_SECONDS):
+    """(obj_ids, grid, positions): ECEF positions (objects, frames, 3) on a shared grid, NaN outside each track."""
+    obj_ids = list(tracks)
+    if not obj_ids:
+        return obj_ids, np.empty(0), np.empty((0, 0, 3))
+    first = min(t[0][0] for t in tracks.values())
+    last = max(t[0][-1] for t in tracks.values())
+    grid = first + step * np.arange(int(np.floor((last - first) / step)) + 1)
+    pos = np.full((len(obj_ids), len(grid), 3), np.nan)
+    for k, obj_id in enumerate(obj_ids):
+        t, lat, lon, alt = tracks[obj_id]
+        a, b = np.searchsorted(grid, t[0], side='left'), np.searchsorted(grid, t[-1], side='right')
+        g = grid[a:b]
+        pos[k, a:b] = ecef(np.interp(g, t, lat), np.interp(g, t, lon), np.interp(g, t, alt))
+    return obj_ids, grid, pos
+
+
+def velocities(pos, step=STEP_SECONDS):
+    """ECEF velocity (m/s) per object and frame by central differences (one-sided at track ends)."""
+    vel = np.full_like(pos, np.nan)
+    if pos.shape[1] < 2:
+        return vel
+    fwd = (pos[:, 1:] - pos[:, :-1]) / step
+    vel[:, 1:-1] = (pos[:, 2:] - pos[:, :-2]) / (2 * step)
+    vel[:, 1:-1] = np.where(np.isnan(vel[:, 1:-1]), fwd[:, 1:], vel[:, 1:-1])
+    vel[:, 1:-1] = np.where(np.isnan(vel[:, 1:-1]), fwd[:, :-1], vel[:, 1:-1])
+    vel[:, 0], vel[:, -1] = fwd[:, 0], fwd[:, -1]
+    return vel
+
+
+def close_pairs(pos, radius, chunk=CHUNK_FRAMES):
+    """Yield (frame slice, i, j) per chunk: index arrays of the pairs whose bounding boxes come within ``radius``."""
+    n, frames = pos.shape[:2]
+    if n < 2:
+        return
+    pi, pj = np.triu_indices(n, k=1)
+    for start in range(0, frames, chunk):
+        sl = slice(start, min(start + chunk, frames))
+        block = pos[:, sl]
+        missing = np.isnan(block)
+        present = ~missing[..., 0].all(axis=1)
+        lo = np.where(missing, np.inf, block).min(axis=1)
+        hi = np.where(missing, -np.inf, block).max(axis=1)
+        both = present[pi] & present[pj]
+        gap = np.maximum(0.0, np.maximum(lo[pj] - hi[pi], lo[pi] - hi[pj]))
+        keep = both & (np.einsum('ij,ij->i', gap, gap) <= radius * radius)
+        if keep.any():
+            yield sl, pi[keep], pj[keep]
+
+
+def geometry(pos, vel, i, j, sl):
+    """Range (m), closure (m/s, positive closing), ATA of i and aspect of j from i (degrees) for pairs (i, j)."""
+    los = pos[j, sl] - pos[i, sl]
+    rel_vel = vel[j, sl] - vel[i, sl]
+    rng = np.linalg.norm(los, axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        closure = -np.einsum('...k,...k->...', los, rel_vel) / rng
+        ata = _angle(vel[i, sl], los)
+        aspect = 180.0 - _angle(vel[j, sl], -los)
+    return rng, closure, ata, aspect
+
+
+def _angle(a, b):
+    cos = np.einsum('...k,...k->...', a, b) / (np.linalg.norm(a, axis=-1) * np.linalg.norm(b, axis=-1))
+    return np.degrees(np.arccos(np.clip(cos, -1.0, 1.0)))
+
+
+def _runs(codes, frames):
+    """Maximal runs of consecutive frames per code: (code, first frame, last frame) arrays."""
+    order = np.lexsort((frames, codes))
+    codes, frames = codes[order], frames[order]
+    brk = np.flatnonzero((np.diff(codes) != 0) | (np.diff(frames) != 1)) + 1
+    starts = np.concatenate([[0], brk])
+    ends = np.concatenate([brk, [len(codes)]]) - 1
+    return codes[starts], frames[starts], frames[ends]
+
+
+def analyze(tracks, within_nm=WITHIN_NM, merge_nm=MERGE_NM, step=STEP_SECONDS):
+    """Proximity intervals and merges between the given tracks.
+
+    Returns (intervals, merges), lists of dicts ordered by time.
+    """
+    obj_ids, grid, pos = resample(tracks, step)
+    radius, merge_m = within_nm * METERS_PER_NM, merge_nm * METERS_PER_NM
+    codes, frames = [], []
+    n = len(obj_ids)
+    for sl, i, j in close_pairs(pos, radius):
+        rng = np.linalg.norm(pos[j, sl] - pos[i, sl], axis=-1)
+        with np.errstate(invalid='ignore'):
+            k, f = np.nonzero(rng <= radius)
+        codes.append(i[k] * n + j[k])
+        frames.append(f + sl.start)
+    if not codes or not sum(len(c) for c in codes):
+        return [], []
+    vel = velocities(pos, step)
+    intervals, merges = [], []
+    for code, f0, f1 in zip(*_runs(np.concatenate(codes), np.concatenate(frames))):
+        i, j = divmod(int(code), n)
+        # one frame either side, to tell a minimum at the interval edge
+        sl = slice(max(f0 - 1, 0), min(f1 + 2, len(grid)))
+        rng, closure, ata, aspect = geometry(pos, vel, np.array([i]), np.array([j]), sl)
+        rng, closure, aspect = rng[0], closure[0], aspect[0]
+        core = slice(f0 - sl.start, f1 - sl.start + 1)
+        m = int(np.nanargmin(rng[core])) + core.start
+        intervals.append({"a": obj_ids[i], "b": obj_ids[j], "start": float(grid[f0]), "end": float(grid[f1]),
+                          "min_range_m": float(rng[m]), "min_range_at": float(grid[sl.start + m])})
+        # local range minima reached while closing, within the merge distance
+        with np.errstate(invalid='ignore'):
+            prev, nxt = np.r_[np.inf, rng[:-1]], np.r_[rng[1:], np.inf]
+            hit = (rng <= prev) & (rng < nxt) & (rng <= merge_m) & (np.r_[np.nan, closure[:-1]] > 0)
+        for k in np.flatnonzero(hit[core]) + core.start:
+            f = sl.start + k
+            # aspect as they came within merge range; the speed at which they passed each other
+            outside = np.flatnonzero(rng[:k] > merge_m)
+            entry = outside[-1] if len(outside) else k - 1
+            merges.append({"a": obj_ids[i], "b": obj_ids[j], "time_offset": float(grid[f]), "range_m": float(rng[k]),
+                           "relative_speed_mps": float(np.linalg.norm(vel[j, f] - vel[i, f])),
+                           "aspect_deg": None if np.isnan(aspect[entry]) else float(aspect[entry])})
+    intervals.sort(key=lambda e: (e["start"], e["a"], e["b"]))
+    merges.sort(key=lambda e: (e["time_offset"], e["a"], e["b"]))
+    return intervals, merges
+
+
+def pair_series(tracks, a, b, step=STEP_SECONDS):
+    """Range, closure, ATA (of ``a``) and aspect (of ``b`` from ``a``) on the grid, where both exist."""
+    obj_ids, grid, pos = resample({k: tracks[k] for k in (a, b)}, step)
+    vel = velocities(pos, step)
+    rng, closure, ata, aspect = geometry(pos, vel, np.array([0]), np.array([1]), slice(None))
+    both = ~np.isnan(rng[0])
+    return {"time_offset": grid[both], "range_m": rng[0][both], "closure_mps": closure[0][both],
+            "ata_deg": ata[0][both], "aspect_deg": aspect[0][both]}
+
+
+def event_rows(sortie_id, intervals, merges):
+    """``events`` rows for the results of ``analyze``."""
+    rows = []
+    for e in intervals:
+        text = (f"{e['a']} and {e['b']} within {WITHIN_NM:g} nm for {e['end'] - e['start']:.0f} s, "
+                f"closest {e['min_range_m'] / METERS_PER_NM:.1f} nm")
+        rows.append((sortie_id, e["start"], 'Proximity', json.dumps([e["a"], e["b"]]), text, json.dumps(e)))
+    for e in merges:
+        text = f"Merge {e['a']} / {e['b']} at {e['range_m'] / METERS_PER_NM:.2f} nm"
+        rows.append((sortie_id, e["time_offset"], 'Merge', json.dumps([e["a"], e["b"]]), text, json.dumps(e)))
+    return rows
+
+
+def write_events(conn, db_path, sortie_id):
+    """Replace the sortie's Proximity/Merge events with fresh ones; the caller commits."""
+    tracks = load_tracks(conn, db_path, sortie_id, aircraft(conn, sortie_id))
+    intervals, merges = analyze(tracks)
+    conn.execute(f"DELETE FROM events WHERE sortie_id = ? AND event_type IN ({', '.join('?' * len(EVENT_TYPES))})",
+                 (sortie_id, *EVENT_TYPES))
+    conn.executemany("INSERT INTO events (sortie_id, time_offset, event_type, object_ids, text, raw) "
+                     "VALUES (?, ?, ?, ?, ?, ?)", event_rows(sortie_id, intervals, merges))
+    return len(intervals), len(merges)
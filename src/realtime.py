@@ -0,0 +1,500 @@
+"""Live ingest of Tacview real-time telemetry.
+
+A DCS server running Tacview exports its flight as a live ACMI stream on
+TCP port 42674. ``LiveSession`` connects to it the way the Tacview client
+does, decodes every line with the parser's ``decode_line`` and appends
+rows to a sortie with ``parse_status = 'live'`` as they arrive, committing
+at frame boundaries at most every ``COMMIT_SECONDS``. Telemetry rows go
+through ``enrich.TrackDeriver`` in chunks of ``DERIVE_CHUNK_ROWS``, so the
+stored rows of an object trail its live state by a few dozen samples. When the stream ends
+(or the session is stopped) the sortie is finalized like a parsed file
+(``parser.finalize_sortie``), then marked ``parse_status = 'done'`` with a
+new ``parse_generation``.
+
+Each frame's changes -- object states, new metadata, removals, events --
+are collected into one delta, encoded once with orjson and handed to the
+session's ``FrameHub``, which passes the same bytes to every WebSocket
+subscriber. Subscribers have bounded queues: one that falls
+``MAX_PENDING_FRAMES`` behind has its queue dropped and is sent a fresh
+snapshot instead, so a slow browser neither holds back the others nor
+grows memory. Messages carry the frame number ``n``; a client ignores
+deltas not newer than the snapshot it last applied.
+
+Handshake (each side sends one NUL-terminated block, host first)::
+
+    host:   XtraLib.Stream.0\\nTacview.RealTimeTelemetry.0\\n<host name>\\n\\0
+    client: XtraLib.Stream.0\\nTacview.RealTimeTelemetry.0\\n<client name>\\n<password hash>\\n\\0
+
+``src/replay.py`` plays the host side from a recording on disk.
+"""
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+
+import orjson
+
+from . import enrich
+from .parser import apply_header, decode_line, finalize_sortie, merge_coords, new_header, split_event
+from .tokenizer import iter_logical_lines, KIND_GLOBAL, KIND_FRAME, KIND_REMOVE
+from .writer import BatchWriter, apply_ingest_pragmas
+
+DEFAULT_PORT = 42674
+STREAM_VERSION = "XtraLib.Stream.0"
+PROTOCOL = "Tacview.RealTimeTelemetry.0"
+CLIENT_NAME = "DCS Web-Tac"
+CONNECT_TIMEOUT = 10.0
+HANDSHAKE_MAX_BYTES = 4096
+COMMIT_SECONDS = 1.0
+DERIVE_CHUNK_ROWS = 16
+MAX_PENDING_FRAMES = int(os.environ.get("LIVE_MAX_PENDING_FRAMES", 64))
+# hosts a session may connect to (comma-separated names or addresses, compared as given); none when unset
+LIVE_HOSTS = frozenset(h.strip().lower() for h in os.environ.get("LIVE_HOSTS", "").split(",") if h.strip())
+# finished sessions stay listed (status, sortie_id) this long, then are dropped
+FINISHED_SESSION_SECONDS = 600.0
+
+STATUS_CONNECTING = 'connecting'
+STATUS_LIVE = 'live'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+# object metadata kept per object: ACMI property -> objects.meta key
+META_FIELDS = (('Type', 'type'), ('Name', 'name'), ('Pilot', 'pilot'), ('Coalition', 'coalition'),
+               ('CallSign', 'callsign'), ('Color', 'color'), ('Shape', 'shape'))
+
+
+class HandshakeError(Exception):
+    pass
+
+
+def handshake_block(name, password_hash=None):
+    lines = [STREAM_VERSION, PROTOCOL, name]
+    if password_hash is not None:
+        lines.append(password_hash)
+    return ("\n".join(lines) + "\n\0").encode('utf-8')
+
+
+def read_handshake(f):
+    """Lines of the peer's handshake block from the binary file ``f``."""
+    data = bytearray()
+    while True:
+        b = f.read(1)
+        if not b:
+            raise HandshakeError("connection closed during handshake")
+        if b == b'\0':
+            break
+        data += b
+        if len(data) > HANDSHAKE_MAX_BYTES:
+            raise HandshakeError("handshake too long")
+    lines = data.decode('utf-8', errors='replace').split('\n')
+    if lines[:2] != [STREAM_VERSION, PROTOCOL]:
+        raise HandshakeError(f"not a Tacview real-time telemetry stream: {lines[:2]}")
+    return lines
+
+
+class Subscriber:
+    """Pending messages of one WebSocket client; only touched on its event loop."""
+
+    def __init__(self, max_pending):
+        self.max_pending = max_pending
+        self.frames = deque()
+        self.resync = True
+        self.closed = False
+        self.last = None
+        self.dropped = 0
+        self.ready = asyncio.Event()
+
+    def push(self, payload):
+        if len(self.frames) >= self.max_pending:
+            # too far behind: the next message is a snapshot instead
+            self.frames.clear()
+            self.resync = True
+            self.dropped += 1
+        else:
+            self.frames.append(payload)
+        self.ready.set()
+
+    def finish(self, last=None):
+        self.closed = True
+        self.last = last
+        self.ready.set()
+
+
+def _deliver(subscribers, payload):
+    for sub in subscribers:
+        sub.push(payload)
+
+
+def _finish(subscribers, last):
+    for sub in subscribers:
+        sub.finish(last)
+
+
+class FrameHub:
+    """Fan-out of encoded frame deltas to subscribers on any number of event loops.
+
+    ``publish`` is called from the ingest thread; each event loop with
+    subscribers gets one callback per frame, whatever the number of clients.
+    """
+
+    def __init__(self, snapshot, max_pending=MAX_PENDING_FRAMES):
+        self._snapshot = snapshot
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._loops = {}
+        self.closed = False
+        self.last = None
+
+    def subscribe(self):
+        """Register a subscriber on the running event loop."""
+        sub = Subscriber(self.max_pending)
+        with self._lock:
+            if self.closed:
+                sub.finish(self.last)
+            else:
+                self._loops.setdefault(asyncio.get_running_loop(), set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            for loop, subs in list(self._loops.items()):
+                subs.discard(sub)
+                if not subs:
+                    del self._loops[loop]
+
+    @property
+    def subscribers(self):
+        with self._lock:
+            return sum(len(subs) for subs in self._loops.values())
+
+    def _call(self, fn, payload):
+        with self._lock:
+            targets = [(loop, tuple(subs)) for loop, subs in self._loops.items()]
+        for loop, subs in targets:
+            try:
+                loop.call_soon_threadsafe(fn, subs, payload)
+            except RuntimeError:
+                # that loop is gone (server shutting down)
+                pass
+
+    def publish(self, payload):
+        self._call(_deliver, payload)
+
+    def close(self, last=None):
+        """End every subscription; ``last`` is sent after the pending frames (never dropped)."""
+        with self._lock:
+            self.closed = True
+            self.last = last
+        self._call(_finish, last)
+
+    async def stream(self, sub):
+        """Messages for ``sub``: a snapshot first (and after falling behind), frame deltas, then ``last``."""
+        while True:
+            if sub.resync:
+                sub.resync = False
+                sub.frames.clear()
+                yield self._snapshot()
+            elif sub.frames:
+                yield sub.frames.popleft()
+            elif sub.closed:
+                if sub.last is not None:
+                    yield sub.last
+                return
+            else:
+                sub.ready.clear()
+                await sub.ready.wait()
+
+
+class LiveSession:
+    """One real-time telemetry connection and the sortie it records."""
+
+    def __init__(self, db_path, host, port=DEFAULT_PORT, password_hash="0", name=None, on_finished=None,
+                 max_pending=MAX_PENDING_FRAMES):
+        self.session_id = uuid.uuid4().hex[:12]
+        self.db_path = db_path
+        self.host = host
+        self.port = port
+        self.password_hash = password_hash
+        self.name = name or f"Live {host}:{port}"
+        self.on_finished = on_finished
+        self.status = STATUS_CONNECTING
+        self.error = None
+        self.host_name = None
+        self.sortie_id = None
+        self.frames = 0
+        self.finished_at = None
+        self.hub = FrameHub(self.snapshot, max_pending)
+
+        # ingest state (ingest thread only)
+        self.time_offset = 0.0
+        self.objects = {}
+        self.last_state = {}
+        self._obj_written = set()
+        self._deriver = enrich.TrackDeriver(chunk=DERIVE_CHUNK_ROWS)
+        self.header = new_header(self.name)
+        self._global_buffer = []
+        self._changed = {}
+        self._new_meta = {}
+        self._removed = []
+        self._events = []
+
+        # state as of the last published frame, read by snapshot() on the event loop
+        self._view_lock = threading.Lock()
+        self._view = {}
+        self._view_meta = {}
+        self._view_frame = 0
+        self._view_time = 0.0
+        self._snapshot = None
+
+        self._conn = None
+        self._writer = None
+        self._sock = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    # -- lifecycle
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name=f"live-{self.session_id}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Disconnect and finalize the sortie; returns once the ingest thread is done (or ``timeout``)."""
+        self._stop.set()
+        sock = self._sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def run(self):
+        self._conn = sqlite3.connect(self.db_path)
+        apply_ingest_pragmas(self._conn)
+        self._writer = BatchWriter(self._conn, batch_size=500, autocommit=False)
+        try:
+            with socket.create_connection((self.host, self.port), timeout=CONNECT_TIMEOUT) as sock:
+                self._sock = sock
+                sock.settimeout(None)
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+                with sock.makefile('rb') as f:
+                    self.host_name = read_handshake(f)[2]
+                    sock.sendall(handshake_block(CLIENT_NAME, self.password_hash))
+                    self.status = STATUS_LIVE
+                    self.ingest(raw.decode('utf-8', errors='replace') for raw in f)
+            self.status = STATUS_DONE
+        except Exception as e:
+            if self._stop.is_set() and self.status == STATUS_LIVE:
+                # our own shutdown() broke the read
+                self.status = STATUS_DONE
+            else:
+                self.status = STATUS_FAILED
+                self.error = str(e)
+        finally:
+            self._sock = None
+            try:
+                self._finish()
+            finally:
+                self._conn.close()
+            self.hub.close(orjson.dumps({"type": "end", "status": self.status, "sortie_id": self.sortie_id,
+                                         "error": self.error}))
+            if self.on_finished is not None and self.sortie_id is not None:
+                self.on_finished(self.sortie_id)
+            self.finished_at = time.monotonic()
+
+    def ingest(self, lines):
+        """Consume text lines (stops early once ``stop`` was called)."""
+        last_commit = time.monotonic()
+        for line in iter_logical_lines(lines):
+            if self._stop.is_set():
+                break
+            item = decode_line(line)
+            if item is None:
+                continue
+            if item[0] == KIND_FRAME:
+                self._end_frame()
+                self.time_offset = item[1]
+                now = time.monotonic()
+                if now - last_commit >= COMMIT_SECONDS:
+                    self._writer.commit()
+                    last_commit = now
+            else:
+                self._apply(item)
+        self._end_frame()
+
+    def _finish(self):
+        writer = self._writer
+        for row in self._deriver.finish():
+            writer.add("telemetry", row)
+        writer.commit()
+        if self.sortie_id is None:
+            return
+        finalize_sortie(self._conn, self.db_path, self.sortie_id, self._deriver.stats)
+        self._conn.execute("UPDATE sorties SET parse_status = ?, parse_generation = parse_generation + 1 WHERE id = ?",
+                           ('done' if self.status == STATUS_DONE else 'failed', self.sortie_id))
+        self._conn.commit()
+
+    # -- ingest
+
+    def _add_event(self, value, time_offset):
+        event_type, obj_ids, text = split_event(value)
+        self._writer.add("events", (self.sortie_id, time_offset, event_type, json.dumps(obj_ids), text,
+                                    json.dumps({"Event": value})))
+        return {"type": event_type, "objects": obj_ids, "text": text}
+
+    def _apply(self, item):
+        kind = item[0]
+        header = self.header
+        if kind == KIND_GLOBAL:
+            props = item[1]
+            apply_header(header, props)
+            for k, v in props.items():
+                if self.sortie_id is None:
+                    self._global_buffer.append((k, v))
+                elif k == 'Event':
+                    self._events.append(self._add_event(v, self.time_offset))
+                else:
+                    self._writer.add("global_props", (self.sortie_id, k, v))
+            return
+
+        if kind == KIND_REMOVE:
+            obj_id = item[1]
+            self._changed.pop(obj_id, None)
+            self._removed.append(obj_id)
+            if self.sortie_id is not None:
+                self._writer.add("events", (self.sortie_id, self.time_offset, "Removed", json.dumps([obj_id]), "",
+                                            json.dumps({"Removed": obj_id})))
+            return
+
+        _, obj_id, fields, coords, ias, g_force, tas, mach, fuel, raw_json = item
+        meta = self.objects.get(obj_id)
+        if meta is None:
+            meta = self.objects[obj_id] = {}
+        updates = {key: fields[prop] for prop, key in META_FIELDS if fields.get(prop)}
+        if updates:
+            meta.update(updates)
+            self._new_meta[obj_id] = dict(meta)
+
+        obj_type = meta.get('type') or ''
+        if self.sortie_id is None and obj_type.startswith('Air'):
+            self._create_sortie(meta)
+
+        state = merge_coords(coords, self.last_state.get(obj_id), header["reference_lon"], header["reference_lat"])
+        if state[0] is None or state[1] is None or state[2] is None:
+            return
+        self.last_state[obj_id] = state
+        self._changed[obj_id] = state
+
+        # telemetry is stored for aircraft only, as in AcmiParser
+        if not obj_type.startswith('Air'):
+            return
+        if obj_id not in self._obj_written:
+            self._writer.add("objects", (self.sortie_id, obj_id, meta.get('name'), meta.get('type'),
+                                         meta.get('coalition'), meta.get('pilot'), meta.get('callsign'),
+                                         meta.get('color'), meta.get('shape'), json.dumps(meta, ensure_ascii=False)))
+            self._obj_written.add(obj_id)
+        lon, lat, alt, roll, pitch, yaw, u, v, heading = state
+        for row in self._deriver.add((self.sortie_id, obj_id, self.time_offset, lat, lon, alt, roll, pitch, yaw,
+                                      u, v, heading, ias, g_force, tas, mach, fuel, raw_json, None)):
+            self._writer.add("telemetry", row)
+
+    def _create_sortie(self, meta):
+        header = self.header
+        cursor = self._conn.execute(
+            "INSERT INTO sorties (mission_name, pilot_name, aircraft_type, start_time, parse_status, reference_time) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (header["mission_name"], meta.get('pilot') or header["pilot_name"], meta.get('name') or header["aircraft_type"],
+             header["reference_time"] or header["recording_time"], STATUS_LIVE, header["reference_time"]))
+        self.sortie_id = cursor.lastrowid
+        for k, v in self._global_buffer:
+            if k == 'Event':
+                self._events.append(self._add_event(v, 0.0))
+            else:
+                self._writer.add("global_props", (self.sortie_id, k, v))
+        self._global_buffer.clear()
+
+    def _end_frame(self):
+        if not (self._changed or self._removed or self._events):
+            return
+        self.frames += 1
+        delta = {"type": "frame", "n": self.frames, "t": self.time_offset, "sortie_id": self.sortie_id,
+                 "objects": self._changed, "meta": self._new_meta, "removed": self._removed, "events": self._events}
+        with self._view_lock:
+            self._view.update(self._changed)
+            self._view_meta.update(self._new_meta)
+            for obj_id in self._removed:
+                self._view.pop(obj_id, None)
+                self._view_meta.pop(obj_id, None)
+            self._view_frame = self.frames
+            self._view_time = self.time_offset
+            self._snapshot = None
+        self._changed = {}
+        self._new_meta = {}
+        self._removed = []
+        self._events = []
+        self.hub.publish(orjson.dumps(delta))
+
+    def snapshot(self):
+        """Encoded full state as of the last published frame (cached until the next one)."""
+        with self._view_lock:
+            if self._snapshot is None:
+                self._snapshot = orjson.dumps({
+                    "type": "snapshot", "n": self._view_frame, "t": self._view_time,
+                    "sortie_id": self.sortie_id, "objects": self._view,
+                    "meta": {obj_id: meta for obj_id, meta in self._view_meta.items() if obj_id in self._view}})
+            return self._snapshot
+
+    def info(self):
+        return {"session_id": self.session_id, "host": self.host, "port": self.port, "name": self.name,
+                "host_name": self.host_name, "status": self.status, "error": self.error,
+                "sortie_id": self.sortie_id, "frames": self.frames, "subscribers": self.hub.subscribers}
+
+
+# running and recently finished sessions of this process, by session_id
+sessions = {}
+
+
+def host_allowed(host):
+    return host.strip().lower() in LIVE_HOSTS
+
+
+def prune_sessions(now=None):
+    """Drop sessions that finished more than ``FINISHED_SESSION_SECONDS`` ago."""
+    now = time.monotonic() if now is None else now
+    for session_id, session in list(sessions.items()):
+        if session.finished_at is not None and now - session.finished_at > FINISHED_SESSION_SECONDS:
+            sessions.pop(session_id, None)
+
+
+def get_session(session_id):
+    prune_sessions()
+    return sessions.get(session_id)
+
+
+def list_sessions():
+    prune_sessions()
+    return list(sessions.values())
+
+
+def start_session(db_path, host, port=DEFAULT_PORT, password_hash="0", name=None, on_finished=None):
+    prune_sessions()
+    session = LiveSession(db_path, host, port, password_hash, name, on_finished)
+    sessions[session.session_id] = session
+    return session.start()
+
+
+def stop_all(timeout=5.0):
+    for session in list(sessions.values()):
+        session.stop(timeout)
@@ -0,0 +1,103 @@
+"""Stand-in for a Tacview real-time telemetry host.
+
+Serves a recording from disk over the real-time protocol (see
+``src/realtime.py``), pacing frames by their ``#`` time offsets so the
+stream arrives at wall-clock rate (or ``speed`` times faster). Every client
+gets the whole recording from the start::
+
+    python -m src.replay data/samples/full_flight_sim.acmi --port 42674 --speed 1
+
+then point a live session at it (``POST /api/live {"host": "127.0.0.1"}``).
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+from .realtime import DEFAULT_PORT, HandshakeError, handshake_block, read_handshake
+from .stream import open_acmi
+
+HOST_NAME = "DCS Web-Tac replay"
+
+
+def frame_time(line):
+    try:
+        return float(line[1:])
+    except ValueError:
+        return None
+
+
+class _ReplayHandler(socketserver.StreamRequestHandler):
+    # buffered; flushed before every pause between frames
+    wbufsize = 64 * 1024
+
+    def handle(self):
+        server = self.server
+        self.wfile.write(handshake_block(HOST_NAME))
+        self.wfile.flush()
+        try:
+            read_handshake(self.rfile)
+        except HandshakeError:
+            return
+        start = time.monotonic()
+        first = None
+        try:
+            with open_acmi(server.path) as f:
+                for line in f:
+                    if line[:1] == '#':
+                        t = frame_time(line)
+                        if t is not None:
+                            if first is None:
+                                first = t
+                            delay = start + (t - first) / server.speed - time.monotonic()
+                            if delay > 0:
+                                self.wfile.flush()
+                                if server.stopping.wait(delay):
+                                    return
+                    self.wfile.write(line.encode('utf-8'))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class ReplayServer(socketserver.ThreadingTCPServer):
+    """Replays ``path`` to each client; ``port=0`` picks a free port (see ``server_address``)."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, path, host="127.0.0.1", port=DEFAULT_PORT, speed=1.0):
+        self.path = path
+        self.speed = max(speed, 1e-6)
+        self.stopping = threading.Event()
+        super().__init__((host, port), _ReplayHandler)
+
+    def start(self):
+        """Serve on a background thread."""
+        threading.Thread(target=self.serve_forever, name="acmi-replay", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.stopping.set()
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Replay an ACMI recording as Tacview real-time telemetry")
+    ap.add_argument("path")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT)
+    ap.add_argument("--speed", type=float, default=1.0, help="playback rate (2 = twice real time)")
+    args = ap.parse_args()
+    server = ReplayServer(args.path, args.host, args.port, args.speed)
+    print(f"Replaying {args.path} on {args.host}:{server.server_address[1]} at {args.speed}x")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -18,8 +18,90 @@ class TelemetryBase(BaseModel):
     mach: Optional[float] = 0.0
     g_force: Optional[float] = None
     fuel_remaining: Optional[float] = 0.0
+    tas: Optional[float] = None
+    ground_speed: Optional[float] = None
+    vertical_speed: Optional[float] = None
+    turn_rate: Optional[float] = None
+    specific_energy: Optional[float] = None
     raw: Optional[str] = None
 
+class TelemetryPage(BaseModel):
+    items: List[TelemetryBase]
+    next_cursor: Optional[str] = None
+
+class SnapshotObject(BaseModel):
+    obj_id: str
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+    alt: Optional[float] = None
+    roll: Optional[float] = None
+    pitch: Optional[float] = None
+    yaw: Optional[float] = None
+    u: Optional[float] = None
+    v: Optional[float] = None
+    heading: Optional[float] = None
+    ias: Optional[float] = None
+    mach: Optional[float] = None
+    g_force: Optional[float] = None
+
+class SnapshotFrame(BaseModel):
+    time_offset: float
+    objects: List[SnapshotObject]
+
+class Snapshot(BaseModel):
+    frames: List[SnapshotFrame]
+
+class SlabObject(BaseModel):
+    obj_id: str
+    start: float
+    end: float
+    min_lon: Optional[float] = None
+    max_lon: Optional[float] = None
+    min_lat: Optional[float] = None
+    max_lat: Optional[float] = None
+    min_alt: Optional[float] = None
+    max_alt: Optional[float] = None
+    segments: Optional[int] = None
+
+class AirspaceObject(BaseModel):
+    obj_id: str
+    first: float
+    last: float
+    samples: int
+
+class AirspaceSortie(BaseModel):
+    sortie_id: int
+    mission_name: Optional[str] = None
+    start_time: Optional[datetime] = None
+    objects: List[AirspaceObject]
+
+class ProximityInterval(BaseModel):
+    a: str
+    b: str
+    start: float
+    end: float
+    min_range_m: float
+    min_range_at: float
+
+class Merge(BaseModel):
+    a: str
+    b: str
+    time_offset: float
+    range_m: float
+    relative_speed_mps: float
+    aspect_deg: Optional[float] = None
+
+class Proximity(BaseModel):
+    intervals: List[ProximityInterval]
+    merges: List[Merge]
+
+class PairSeries(BaseModel):
+    time_offset: List[float]
+    range_m: List[Optional[float]]
+    closure_mps: List[Optional[float]]
+    ata_deg: List[Optional[float]]
+    aspect_deg: List[Optional[float]]
+
 class SortieBase(BaseModel):
     mission_name: str
     pilot_name: str
@@ -28,9 +110,18 @@ class SortieBase(BaseModel):
     map_name: Optional[str] = None
     parse_status: Optional[str] = None
     reference_time: Optional[str] = None
+    parse_generation: Optional[int] = 0
 
 class Sortie(SortieBase):
     id: int
+    # summary from ingest (see src/stats.py); None until the sortie is done
+    duration: Optional[float] = None
+    object_count: Optional[int] = None
+    sample_count: Optional[int] = None
+    max_g: Optional[float] = None
+    max_alt: Optional[float] = None
+    max_ias: Optional[float] = None
+    distance_m: Optional[float] = None
     model_config = {"from_attributes": True}
 
 class ObjectBase(BaseModel):
@@ -59,6 +150,10 @@ class Event(BaseModel):
     raw: Optional[str] = None
     model_config = {"from_attributes": True}
 
+class EventPage(BaseModel):
+    items: List[Event]
+    next_cursor: Optional[str] = None
+
 class ParseJob(BaseModel):
     id: str
     sortie_id: Optional[int] = None
@@ -69,3 +164,42 @@ class ParseJob(BaseModel):
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
     model_config = {"from_attributes": True}
+
+class UploadInit(BaseModel):
+    file_name: str
+    size: Optional[int] = None
+    sha256: Optional[str] = None
+
+class UploadFinalize(BaseModel):
+    sha256: Optional[str] = None
+
+class UploadStatus(BaseModel):
+    upload_id: str
+    file_name: str
+    size: Optional[int] = None
+    offset: int
+    status: str
+    sha256: Optional[str] = None
+    chunk_size: int
+    max_bytes: int
+    job_id: Optional[str] = None
+    sortie_id: Optional[int] = None
+    deduplicated: bool = False
+
+class LiveStart(BaseModel):
+    host: str
+    port: int = 42674
+    password_hash: str = "0"
+    name: Optional[str] = None
+
+class LiveSession(BaseModel):
+    session_id: str
+    host: str
+    port: int
+    name: str
+    host_name: Optional[str] = None
+    status: str
+    error: Optional[str] = None
+    sortie_id: Optional[int] = None
+    frames: int
+    subscribers: int
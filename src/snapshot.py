@@ -0,0 +1,135 @@
+"""Interpolated state of every object of a sortie at given times.
+
+Backs timeline scrubbing and the "who was where at t" view. Each object's
+samples are sorted by time (the columnar store keeps them that way), so
+finding the two samples around each requested time is a binary search on
+the object's ``time_offset`` array: a snapshot costs
+O(objects x log samples) and never scans the telemetry table.
+
+Values are interpolated linearly between the bracketing samples; angles
+take the shortest way round, so 359 -> 1 passes through 0 rather than 180.
+An object appears only at times within its first and last sample. When
+one of the two samples lacks a value the other one is used as is.
+"""
+import numpy as np
+
+from . import columnar
+
+CHANNELS = ('lat', 'lon', 'alt', 'roll', 'pitch', 'yaw', 'u', 'v', 'heading', 'ias', 'mach', 'g_force')
+# wrapped channels -> lower bound of their 360 degree range
+ANGLES = {'roll': -180.0, 'yaw': 0.0, 'heading': 0.0}
+MAX_FRAMES = 600
+
+
+def frame_times(t=None, start=None, end=None, step=None):
+    """Requested times: ``t`` alone, or ``start``..``end`` every ``step`` seconds (at most ``MAX_FRAMES``)."""
+    if t is not None:
+        return np.array([t], dtype=np.float64)
+    count = int(np.floor((end - start) / step + 1e-9)) + 1
+    if count > MAX_FRAMES:
+        raise ValueError(f"window has {count} frames; at most {MAX_FRAMES} (increase step)")
+    return start + step * np.arange(count, dtype=np.float64)
+
+
+def bracket(track_t, times):
+    """For sorted sample times ``track_t``: (alive mask, i0, i1, fraction) per requested time."""
+    n = len(track_t)
+    if n == 0:
+        return np.zeros(len(times), dtype=bool), None, None, None
+    j = np.searchsorted(track_t, times, side='right')
+    alive = (times >= track_t[0]) & (times <= track_t[-1])
+    i0 = np.maximum(j - 1, 0)
+    i1 = np.minimum(j, n - 1)
+    dt = track_t[i1] - track_t[i0]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        frac = np.where(dt > 0, (times - track_t[i0]) / dt, 0.0)
+    return alive, i0[alive], i1[alive], frac[alive]
+
+
+def blend(name, a, b, frac):
+    if name in ANGLES:
+        lo = ANGLES[name]
+        d = (b - a + 180.0) % 360.0 - 180.0
+        v = (a + d * frac - lo) % 360.0 + lo
+    else:
+        v = a + (b - a) * frac
+    return np.where(np.isnan(a), b, np.where(np.isnan(b), a, v))
+
+
+def _interpolate(picks, column, channels):
+    """Columns for ``picks`` = [(obj_id, times, rows0, rows1, frac)] with ``column(name)`` giving row arrays."""
+    if not picks:
+        out = {name: np.empty(0) for name in ('time_offset', *channels)}
+        out['obj_id'] = np.empty(0, dtype=object)
+        return out
+    rows0 = np.concatenate([p[2] for p in picks])
+    rows1 = np.concatenate([p[3] for p in picks])
+    frac = np.concatenate([p[4] for p in picks])
+    times = np.concatenate([p[1] for p in picks])
+    out = {'obj_id': np.concatenate([np.full(len(p[1]), p[0], dtype=object) for p in picks]),
+           'time_offset': times}
+    for name in channels:
+        col = column(name)
+        out[name] = blend(name, col[rows0], col[rows1], frac)
+    # frame by frame, objects in a stable order within each frame
+    order = np.lexsort((out['obj_id'].astype(str), times))
+    return {name: arr[order] for name, arr in out.items()}
+
+
+def from_store(store, times, obj_ids=None, channels=CHANNELS):
+    """Interpolated states from a ``columnar.ColumnStore``."""
+    t = store.column('time_offset')
+    picks = []
+    for obj_id in (obj_ids if obj_ids is not None else store.objects):
+        r = store.objects.get(obj_id)
+        if r is None:
+            continue
+        lo, hi = r
+        alive, i0, i1, frac = bracket(t[lo:hi], times)
+        if alive.any():
+            picks.append((obj_id, times[alive], lo + i0, lo + i1, frac))
+    return _interpolate(picks, store.column, channels)
+
+
+def from_sql(conn, sortie_id, times, obj_ids=None, channels=CHANNELS):
+    """Interpolated states read from ``telemetry`` (sorties without a columnar store, live sorties).
+
+    Per object, only the samples between the last one at or before the
+    first requested time and the first one at or after the last requested
+    time are read, through ``idx_telemetry_sortie_obj_time``.
+    """
+    if obj_ids is None:
+        obj_ids = [r[0] for r in conn.execute("SELECT obj_id FROM objects WHERE sortie_id = ? ORDER BY obj_id",
+                                              (sortie_id,))]
+    first, last = float(times.min()), float(times.max())
+    select = (
+        f"SELECT time_offset, {', '.join(channels)} FROM telemetry "
+        "WHERE sortie_id = :s AND obj_id = :o AND time_offset BETWEEN "
+        "COALESCE((SELECT max(time_offset) FROM telemetry WHERE sortie_id = :s AND obj_id = :o AND time_offset <= :a), :a) "
+        "AND COALESCE((SELECT min(time_offset) FROM telemetry WHERE sortie_id = :s AND obj_id = :o AND time_offset >= :b), :b) "
+        "ORDER BY time_offset, id")
+    blocks, picks, base = [], [], 0
+    for obj_id in obj_ids:
+        rows = conn.execute(select, {"s": sortie_id, "o": obj_id, "a": first, "b": last}).fetchall()
+        if not rows:
+            continue
+        block = np.array(rows, dtype=np.float64).reshape(len(rows), len(channels) + 1)
+        alive, i0, i1, frac = bracket(block[:, 0], times)
+        if alive.any():
+            picks.append((obj_id, times[alive], base + i0, base + i1, frac))
+            blocks.append(block)
+            base += len(block)
+    data = np.concatenate(blocks) if blocks else np.empty((0, len(channels) + 1))
+    index = {name: i for i, name in enumerate(channels, start=1)}
+    return _interpolate(picks, lambda name: data[:, index[name]], channels)
+
+
+def to_frames(columns):
+    """``[{"time_offset": t, "objects": [{obj_id, channels...}]}]``, one entry per time with live objects."""
+    frames = []
+    for row in columnar.to_rows(columns):
+        t = row.pop('time_offset')
+        if not frames or frames[-1]["time_offset"] != t:
+            frames.append({"time_offset": t, "objects": []})
+        frames[-1]["objects"].append(row)
+    return frames
@@ -0,0 +1,178 @@
+"""R*Tree index over trajectory segments for geographic telemetry queries.
+
+At the end of ingest each object's track is cut into segments of
+``SEGMENT_SAMPLES`` consecutive samples (each also covering the first
+sample of the next, so the path between segments is inside a box). Every
+segment's bounding box goes into the ``telemetry_rtree`` virtual table::
+
+    sortie_id x time_offset x lon x lat x alt  (+ obj_id)
+
+The sortie id is a dimension of its own, so per-sortie queries stay
+selective when many sorties cover the same map. Queries find candidate
+segments through the index, then check the samples of just those segments
+(in the columnar store, or SQL for sorties without one) against the box.
+
+A box is ``(min_lon, max_lon, min_lat, max_lat, min_alt, max_alt)``;
+``None`` bounds are open.
+"""
+import numpy as np
+
+from . import columnar
+
+SEGMENT_SAMPLES = 64
+# open altitude/time bounds; the R*Tree stores 32-bit floats
+UNBOUNDED = 1e30
+
+_INSERT = ("INSERT INTO telemetry_rtree (min_sortie, max_sortie, min_t, max_t, min_lon, max_lon, min_lat, max_lat, "
+           "min_alt, max_alt, obj_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+
+
+def segment_boxes(t, lon, lat, alt, lo, hi, size=SEGMENT_SAMPLES):
+    """Bounding boxes of the segments of one object's rows [lo, hi).
+
+    Returns (min_t, max_t, min_lon, max_lon, min_lat, max_lat, min_alt,
+    max_alt) arrays, one entry per segment with a known position.
+    """
+    starts = np.arange(lo, hi, size)
+    if not len(starts):
+        return None
+    # each segment runs up to and including the next segment's first sample
+    last = np.minimum(starts + size, hi - 1)
+    out = []
+    for x in (t, lon, lat, alt):
+        x = x[lo:hi]
+        rel, tail = starts - lo, last - lo
+        mins = np.fmin(np.fmin.reduceat(x, rel), x[tail])
+        maxs = np.fmax(np.fmax.reduceat(x, rel), x[tail])
+        out += [mins, maxs]
+    known = ~(np.isnan(out[2]) | np.isnan(out[4]))
+    # a segment without any altitude matches every altitude
+    out[6] = np.where(np.isnan(out[6]), -UNBOUNDED, out[6])
+    out[7] = np.where(np.isnan(out[7]), UNBOUNDED, out[7])
+    return [a[known] for a in out]
+
+
+def write_index(conn, store, sortie_id):
+    """Replace the segments of ``sortie_id`` with those of ``store``; the caller commits."""
+    delete_index(conn, sortie_id)
+    t, lon, lat, alt = (store.column(name) for name in ('time_offset', 'lon', 'lat', 'alt'))
+    for obj_id, (lo, hi) in store.objects.items():
+        boxes = segment_boxes(t, lon, lat, alt, lo, hi)
+        if boxes is None:
+            continue
+        sid = float(sortie_id)
+        conn.executemany(_INSERT, ((sid, sid, *b, obj_id) for b in zip(*(a.tolist() for a in boxes))))
+
+
+def delete_index(conn, sortie_id):
+    conn.execute("DELETE FROM telemetry_rtree WHERE min_sortie >= ? AND max_sortie <= ?", (sortie_id, sortie_id))
+
+
+def _where(box, start=None, end=None, sortie_id=None):
+    min_lon, max_lon, min_lat, max_lat, min_alt, max_alt = box
+    conds, params = [], []
+    for column, op, value in (("max_lon", ">=", min_lon), ("min_lon", "<=", max_lon),
+                              ("max_lat", ">=", min_lat), ("min_lat", "<=", max_lat),
+                              ("max_alt", ">=", min_alt), ("min_alt", "<=", max_alt),
+                              ("max_t", ">=", start), ("min_t", "<=", end),
+                              ("max_sortie", ">=", sortie_id), ("min_sortie", "<=", sortie_id)):
+        if value is not None:
+            conds.append(f"{column} {op} ?")
+            params.append(value)
+    return (" WHERE " + " AND ".join(conds)) if conds else "", params
+
+
+def candidates(conn, box, start=None, end=None, sortie_id=None):
+    """{(sortie_id, obj_id): [(t0, t1), ...]} of segments whose boxes meet ``box`` and the time window.
+
+    Overlapping and touching segment spans of an object are merged.
+    """
+    where, params = _where(box, start, end, sortie_id)
+    rows = conn.execute(f"SELECT CAST(min_sortie AS INTEGER), obj_id, min_t, max_t FROM telemetry_rtree{where} "
+                        "ORDER BY 1, 2, 3", params).fetchall()
+    spans = {}
+    for sid, obj_id, t0, t1 in rows:
+        merged = spans.setdefault((sid, obj_id), [])
+        if merged and t0 <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], t1))
+        else:
+            merged.append((t0, t1))
+    return spans
+
+
+def slab(conn, sortie_id, start=None, end=None, box=(None,) * 6):
+    """Per object of ``sortie_id``: time span and bounding box of its segments meeting the window.
+
+    Answered from the index alone, so spans and boxes are segment-granular.
+    """
+    where, params = _where(box, start, end, sortie_id)
+    rows = conn.execute(
+        "SELECT obj_id, min(min_t), max(max_t), min(min_lon), max(max_lon), min(min_lat), max(max_lat), "
+        f"min(min_alt), max(max_alt), count(*) FROM telemetry_rtree{where} GROUP BY obj_id ORDER BY obj_id",
+        params).fetchall()
+    names = ("obj_id", "start", "end", "min_lon", "max_lon", "min_lat", "max_lat", "min_alt", "max_alt", "segments")
+    out = []
+    for row in rows:
+        item = dict(zip(names, row))
+        for k in ("min_alt", "max_alt"):
+            if abs(item[k]) >= UNBOUNDED / 2:
+                item[k] = None
+        out.append(item)
+    return out
+
+
+def inside_mask(columns, box, start=None, end=None):
+    """Samples of ``columns`` (lon/lat/alt/time_offset arrays) inside ``box`` and the time window."""
+    mask = np.ones(len(columns['time_offset']), dtype=bool)
+    for name, lo, hi in (('lon', box[0], box[1]), ('lat', box[2], box[3]), ('alt', box[4], box[5]),
+                         ('time_offset', start, end)):
+        if lo is not None:
+            mask &= columns[name] >= lo
+        if hi is not None:
+            mask &= columns[name] <= hi
+    return mask
+
+
+def box_sql(box):
+    """`` AND ...`` conditions on telemetry columns for ``box`` (sorties without a store)."""
+    sql, params = "", []
+    for column, lo, hi in (("lon", box[0], box[1]), ("lat", box[2], box[3]), ("alt", box[4], box[5])):
+        if lo is not None:
+            sql += f" AND {column} >= ?"
+            params.append(lo)
+        if hi is not None:
+            sql += f" AND {column} <= ?"
+            params.append(hi)
+    return sql, params
+
+
+def store_rows(store, spans, channels):
+    """Store rows of ``spans`` ({obj_id: [(t0, t1)]}) as columns plus ``obj_id``, ordered by object and time."""
+    parts = []
+    for obj_id, ranges in spans.items():
+        if obj_id in store.objects:
+            parts += [np.arange(*store.object_range(obj_id, t0, t1)) for t0, t1 in ranges]
+    rows = np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+    out = {name: store.column(name)[rows] for name in channels}
+    # objects own disjoint row ranges: the owner of a row is the last object starting at or before it
+    owners = sorted(store.objects.items(), key=lambda item: item[1][0])
+    starts = np.array([lo for _, (lo, _) in owners], dtype=np.int64)
+    names = np.array([obj_id for obj_id, _ in owners], dtype=object)
+    out['obj_id'] = names[np.searchsorted(starts, rows, side='right') - 1] if len(rows) else np.empty(0, dtype=object)
+    return out
+
+
+def index_missing(conn, db_path):
+    """Index finished sorties that have a columnar store but no segments (built before the index existed)."""
+    done = [r[0] for r in conn.execute("SELECT id FROM sorties WHERE parse_status = 'done' ORDER BY id")]
+    indexed = 0
+    for sortie_id in done:
+        if conn.execute("SELECT 1 FROM telemetry_rtree WHERE min_sortie >= ? AND max_sortie <= ? LIMIT 1",
+                        (sortie_id, sortie_id)).fetchone():
+            continue
+        store = columnar.open_store(db_path, sortie_id)
+        if store is not None:
+            write_index(conn, store, sortie_id)
+            conn.commit()
+            indexed += 1
+    return indexed
@@ -0,0 +1,115 @@
+"""Per-sortie summary statistics, kept in ``sortie_stats``.
+
+The numbers the sortie browser sorts and filters on are aggregated as
+ingest derives each chunk of rows (``enrich.TrackDeriver``), so they cost
+no extra read of ``telemetry`` and listing sorties never touches it:
+
+- ``duration``: first to last sample of any object (s);
+- ``object_count``, ``sample_count``: objects with telemetry (ingest keeps
+  ``Air+...`` objects only) and their samples;
+- ``max_g``, ``max_alt``, ``max_ias`` over all of them, and ``distance_m``,
+  the summed 3D path length of every track.
+"""
+import numpy as np
+
+from .proximity import ecef
+
+STAT_COLUMNS = ('duration', 'object_count', 'sample_count', 'max_g', 'max_alt', 'max_ias', 'distance_m')
+
+
+def path_length(lat, lon, alt):
+    """3D length (m) of a track, over the samples with a full position."""
+    known = np.isfinite(lat) & np.isfinite(lon) & np.isfinite(alt)
+    if known.sum() < 2:
+        return 0.0
+    pos = ecef(lat[known], lon[known], alt[known])
+    return float(np.linalg.norm(np.diff(pos, axis=0), axis=1).sum())
+
+
+def _nanmax(current, x):
+    x = x[np.isfinite(x)]
+    if not len(x):
+        return current
+    top = float(x.max())
+    return top if current is None else max(current, top)
+
+
+class SortieStats:
+    """Running aggregate of one sortie, fed time-ordered pieces of object tracks."""
+
+    def __init__(self):
+        self.start = self.end = None
+        self.objects = set()
+        self.sample_count = 0
+        self.max_g = self.max_alt = self.max_ias = None
+        self.distance_m = 0.0
+
+    @property
+    def object_count(self):
+        return len(self.objects)
+
+    def add(self, obj_id, t, lat, lon, alt, ias, g_force, counted=0):
+        """Fold in samples of ``obj_id`` (float arrays; NaN for unknown values).
+
+        The first ``counted`` samples were folded in before and only continue
+        the path into the new ones.
+        """
+        if len(t) <= counted:
+            return
+        self.objects.add(obj_id)
+        self.sample_count += len(t) - counted
+        self.start = float(t[0]) if self.start is None else min(self.start, float(t[0]))
+        self.end = float(t[-1]) if self.end is None else max(self.end, float(t[-1]))
+        self.max_g = _nanmax(self.max_g, g_force)
+        self.max_alt = _nanmax(self.max_alt, alt)
+        self.max_ias = _nanmax(self.max_ias, ias)
+        self.distance_m += path_length(lat, lon, alt)
+
+    def state(self):
+        return {"start": self.start, "end": self.end, "objects": sorted(self.objects),
+                "sample_count": self.sample_count, "max_g": self.max_g, "max_alt": self.max_alt,
+                "max_ias": self.max_ias, "distance_m": self.distance_m}
+
+    @classmethod
+    def from_state(cls, state):
+        stats = cls()
+        for key, value in state.items():
+            setattr(stats, key, set(value) if key == "objects" else value)
+        return stats
+
+    def values(self):
+        duration = self.end - self.start if self.start is not None else 0.0
+        return (duration, self.object_count, self.sample_count, self.max_g, self.max_alt, self.max_ias, self.distance_m)
+
+
+def write_stats(conn, sortie_id, stats):
+    """Store ``stats`` for ``sortie_id``, replacing an earlier row; the caller commits."""
+    conn.execute(f"INSERT OR REPLACE INTO sortie_stats (sortie_id, {', '.join(STAT_COLUMNS)}) "
+                 f"VALUES (?{', ?' * len(STAT_COLUMNS)})", (sortie_id, *stats.values()))
+
+
+def delete_stats(conn, sortie_id):
+    conn.execute("DELETE FROM sortie_stats WHERE sortie_id = ?", (sortie_id,))
+
+
+def compute(conn, sortie_id):
+    """``SortieStats`` of a sortie read back from ``telemetry`` (sorties ingested before the table existed)."""
+    stats = SortieStats()
+    obj_ids = [r[0] for r in conn.execute("SELECT DISTINCT obj_id FROM telemetry WHERE sortie_id = ?", (sortie_id,))]
+    for obj_id in obj_ids:
+        rows = conn.execute("SELECT time_offset, lat, lon, alt, ias, g_force FROM telemetry "
+                            "WHERE sortie_id = ? AND obj_id = ? ORDER BY time_offset", (sortie_id, obj_id)).fetchall()
+        block = np.array(rows, dtype=np.float64).reshape(len(rows), 6)
+        stats.add(obj_id, *block.T)
+    return stats
+
+
+def stats_missing(conn):
+    """Compute stats of finished sorties that have none; returns how many were written."""
+    missing = [r[0] for r in conn.execute(
+        "SELECT id FROM sorties WHERE parse_status = 'done' "
+        "AND id NOT IN (SELECT sortie_id FROM sortie_stats) ORDER BY id")]
+    for sortie_id in missing:
+        write_stats(conn, sortie_id, compute(conn, sortie_id))
+        conn.commit()
+    return len(missing)
@@ -0,0 +1,121 @@
+"""Streaming input layer for .acmi / .zip / .gz recordings.
+
+Recordings are read as binary streams and decoded one line at a time, so
+memory stays flat regardless of file size. Progress is measured against
+the position in the file on disk (compressed bytes for zip/gz), which is
+what ``total_bytes`` is expressed in.
+
+``position`` is the offset of the line last yielded within the decompressed
+stream and ``next_position`` the offset just past it; passing either back
+as ``start`` resumes reading there (a seek for plain files, a skip through
+the decompressor for zip/gz).
+"""
+import gzip
+import io
+import os
+import zipfile
+
+ENCODING = 'utf-8'
+
+
+class _CountingFile(io.RawIOBase):
+    """Raw file wrapper that counts bytes read from disk."""
+
+    def __init__(self, path):
+        self._f = io.FileIO(path, 'rb')
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        n = self._f.readinto(b)
+        if n:
+            self.bytes_read += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        return self._f.seek(offset, whence)
+
+    def tell(self):
+        return self._f.tell()
+
+    def close(self):
+        self._f.close()
+        super().close()
+
+
+class AcmiStream:
+    """Iterable of decoded text lines from an ACMI recording on disk."""
+
+    def __init__(self, path, start=0):
+        self.path = path
+        self.position = start
+        self.next_position = start
+        self.total_bytes = os.path.getsize(path)
+        self._counter = _CountingFile(path)
+        self._raw = io.BufferedReader(self._counter)
+        self._zip = None
+        self._span = self.total_bytes
+        try:
+            if path.endswith('.zip') or path.endswith('.zip.acmi'):
+                # unbuffered so that member reads are counted exactly
+                self._zip = zipfile.ZipFile(self._counter, 'r')
+                info = next((i for i in self._zip.infolist() if i.filename.endswith('.acmi')), None)
+                if info is None:
+                    raise ValueError(f"No .acmi member found in {os.path.basename(path)}")
+                self._binary = self._zip.open(info, 'r')
+                # progress is measured over the member's compressed bytes only
+                self._span = info.compress_size
+                self._counter.bytes_read = 0
+            elif path.endswith('.gz'):
+                self._binary = gzip.GzipFile(fileobj=self._raw, mode='rb')
+            else:
+                self._binary = self._raw
+            if start:
+                self._skip(start)
+        except Exception:
+            self.close()
+            raise
+
+    def _skip(self, n):
+        if self._binary is self._raw:
+            self._raw.seek(n)
+            self._counter.bytes_read = n
+            return
+        while n:
+            block = self._binary.read(min(n, 1 << 20))
+            if not block:
+                raise ValueError(f"{os.path.basename(self.path)} is shorter than the resume offset")
+            n -= len(block)
+
+    def __iter__(self):
+        for raw_line in self._binary:
+            self.position = self.next_position
+            self.next_position += len(raw_line)
+            yield raw_line.decode(ENCODING, errors='replace')
+
+    def fraction(self):
+        """Share of the input consumed so far, from 0.0 to 1.0."""
+        return min(1.0, self._counter.bytes_read / self._span) if self._span else 1.0
+
+    def close(self):
+        binary = getattr(self, '_binary', None)
+        if binary is not None and binary is not self._raw:
+            binary.close()
+        if self._zip is not None:
+            self._zip.close()
+        self._raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_acmi(path, start=0):
+    return AcmiStream(path, start)
@@ -0,0 +1,175 @@
+"""Single-pass tokenizer for Tacview ACMI 2.x text lines.
+
+Each logical line is split exactly once into an ``AcmiRecord``:
+
+- ``0,Key=Value,...``      -> KIND_GLOBAL, props
+- ``#12.34``               -> KIND_FRAME, time
+- ``-id``                  -> KIND_REMOVE, obj_id
+- ``id,T=...,Key=Value``   -> KIND_OBJECT, obj_id, coords, props
+
+Values may contain escaped commas (``\\,``) and a trailing backslash
+continues the value on the next physical line (ACMI 2.2).
+"""
+
+KIND_GLOBAL = "global"
+KIND_FRAME = "frame"
+KIND_REMOVE = "remove"
+KIND_OBJECT = "object"
+KIND_OTHER = "other"
+
+
+def to_float_nullable(v):
+    try:
+        return float(v) if v != '' else None
+    except ValueError:
+        return None
+
+
+# Table-driven typed parsing for property values. Keys not listed here stay
+# as strings; a value that fails to parse is treated as absent (None).
+PROPERTY_PARSERS = {
+    # global properties
+    "ReferenceLongitude": to_float_nullable,
+    "ReferenceLatitude": to_float_nullable,
+    # object telemetry
+    "IAS": to_float_nullable,
+    "CAS": to_float_nullable,
+    "TAS": to_float_nullable,
+    "Mach": to_float_nullable,
+    "G": to_float_nullable,
+    "AOA": to_float_nullable,
+    "AOS": to_float_nullable,
+    "AGL": to_float_nullable,
+    "HDG": to_float_nullable,
+    "HDM": to_float_nullable,
+    "Throttle": to_float_nullable,
+    "FuelWeight": to_float_nullable,
+    "FuelVolume": to_float_nullable,
+}
+
+
+def parse_property(key, value):
+    fn = PROPERTY_PARSERS.get(key)
+    return fn(value) if fn is not None else value
+
+
+class AcmiRecord:
+    __slots__ = ("kind", "obj_id", "time", "t", "coords", "props")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.kind = KIND_OTHER
+        self.obj_id = None
+        self.time = None
+        self.t = None          # raw T= string, kept for the raw payload
+        self.coords = None     # T vector as floats (None for omitted fields)
+        self.props = {}
+        return self
+
+    def get(self, key, default=None):
+        """Typed value of a property, parsed through PROPERTY_PARSERS."""
+        v = self.props.get(key)
+        if v is None:
+            return default
+        v = parse_property(key, v)
+        return default if v is None else v
+
+
+def split_fields(text):
+    """Split ``text`` on unescaped commas, unescaping ``\\,`` and ``\\\\``."""
+    if '\\' not in text:
+        return text.split(',')
+    out = []
+    buf = []
+    i = 0
+    n = len(text)
+    while i < n:
+        c = text[i]
+        if c == '\\' and i + 1 < n:
+            buf.append(text[i + 1])
+            i += 2
+            continue
+        if c == ',':
+            out.append(''.join(buf))
+            buf = []
+        else:
+            buf.append(c)
+        i += 1
+    out.append(''.join(buf))
+    return out
+
+
+def parse_props(text):
+    props = {}
+    for seg in split_fields(text):
+        if '=' in seg:
+            k, v = seg.split('=', 1)
+            props[k] = v
+    return props
+
+
+def tokenize_line(line, record=None):
+    """Tokenize one stripped, non-empty logical line.
+
+    Pass ``record`` to reuse an existing AcmiRecord instead of allocating.
+    """
+    rec = record.reset() if record is not None else AcmiRecord()
+    c0 = line[0]
+
+    if c0 == '#':
+        try:
+            rec.time = float(line[1:])
+            rec.kind = KIND_FRAME
+        except ValueError:
+            pass
+        return rec
+
+    if c0 == '-':
+        rec.kind = KIND_REMOVE
+        rec.obj_id = line[1:]
+        return rec
+
+    if line.startswith('0,'):
+        rec.kind = KIND_GLOBAL
+        rec.obj_id = '0'
+        rec.props = parse_props(line[2:])
+        return rec
+
+    sep = line.find(',')
+    if sep <= 0:
+        return rec
+    props = parse_props(line[sep + 1:])
+    t = props.get('T')
+    if t is None:
+        return rec
+    rec.kind = KIND_OBJECT
+    rec.obj_id = line[:sep]
+    rec.props = props
+    rec.t = t
+    parts = t.split('|')
+    try:
+        rec.coords = list(map(float, parts))
+    except ValueError:
+        # omitted ("") or malformed components
+        rec.coords = [to_float_nullable(c) for c in parts]
+    return rec
+
+
+def iter_logical_lines(f):
+    """Yield stripped, non-empty logical lines, joining ``\\``-continued lines."""
+    pending = None
+    for line in f:
+        line = line.strip()
+        if pending is not None:
+            line = pending + '\n' + line
+            pending = None
+        if not line:
+            continue
+        if line.endswith('\\') and not line.endswith('\\\\'):
+            pending = line[:-1]
+            continue
+        yield line
+    if pending:
+        yield pending
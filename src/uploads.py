@@ -0,0 +1,334 @@
+"""Resumable ACMI uploads.
+
+Protocol::
+
+    POST /api/uploads                     {"file_name", "size"?}  -> {"upload_id", "offset": 0, ...}
+    PUT  /api/uploads/{id}?offset=N       raw bytes appended at N  -> {"offset": N + len}
+    GET  /api/uploads/{id}                current offset, to resume after a dropped connection
+    POST /api/uploads/{id}/finalize       {"sha256"?}              -> {"job_id", "sha256"}
+
+Parts go to ``data/uploads/partial/<id>.part``; the file on disk is the
+source of truth for the offset, so an upload survives a restart. Request
+bodies are read off the event loop as they arrive and written, together
+with the running sha256, on a worker thread in ``WRITE_BUFFER`` slices, so
+a large upload never stalls other requests. The parse job is enqueued only
+on finalize.
+
+Finished files are content-addressed: they are stored once under
+``data/uploads/<sha[:2]>/<sha256><suffix>`` and the ``recordings`` table
+maps the hash to the job and sortie that parsed it. Uploading a file that
+was already ingested returns the existing sortie with a completed job and
+parses nothing; one whose parse is still queued or running joins that job.
+A client that knows the hash up front can pass ``sha256`` to init and skip
+the transfer altogether.
+"""
+import asyncio
+import hashlib
+import os
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+from starlette.concurrency import run_in_threadpool
+
+from . import worker
+
+UPLOAD_DIR = os.path.join("data", "uploads")
+PARTIAL_DIR = os.path.join(UPLOAD_DIR, "partial")
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_MB", 1024)) * 1024 * 1024
+# part size suggested to clients
+CHUNK_SIZE = 8 * 1024 * 1024
+WRITE_BUFFER = 1024 * 1024
+# running hashes kept between parts; an evicted one is re-read from the part file
+MAX_HASHERS = 256
+ACCEPTED_SUFFIXES = (".acmi", ".zip", ".gz", ".zip.acmi")
+
+STATUS_OPEN = 'open'
+STATUS_DONE = 'done'
+
+
+class UploadError(Exception):
+    def __init__(self, status_code, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+# running sha256 of recently written uploads, least recently used first: upload_id -> (hasher, bytes hashed)
+_hashers = OrderedDict()
+# upload_id -> [lock, requests holding or waiting for it]; dropped when the last one leaves
+_locks = {}
+
+
+def check_file_name(file_name):
+    """The base name of ``file_name`` if it is an accepted ACMI container."""
+    name = os.path.basename(file_name or "")
+    if not name.endswith(ACCEPTED_SUFFIXES):
+        raise UploadError(400, "Unsupported file format")
+    return name
+
+
+def part_path(upload_id):
+    return os.path.join(PARTIAL_DIR, f"{upload_id}.part")
+
+
+def received(upload_id):
+    try:
+        return os.path.getsize(part_path(upload_id))
+    except FileNotFoundError:
+        return 0
+
+
+def create(db, file_name, size=None):
+    """Register a new upload and return its id; the caller commits."""
+    name = check_file_name(file_name)
+    if size is not None and (size < 0 or size > MAX_UPLOAD_BYTES):
+        raise UploadError(413, f"File exceeds the {MAX_UPLOAD_BYTES} byte upload limit")
+    upload_id = uuid.uuid4().hex
+    os.makedirs(PARTIAL_DIR, exist_ok=True)
+    open(part_path(upload_id), "wb").close()
+    db.execute("INSERT INTO uploads (id, file_name, size, status) VALUES (?, ?, ?, ?)",
+               (upload_id, name, size, STATUS_OPEN))
+    return upload_id
+
+
+def get(db, upload_id):
+    row = db.execute("SELECT * FROM uploads WHERE id = ?", (upload_id,)).fetchone()
+    if row is None:
+        return None
+    info = dict(row)
+    info["offset"] = info["size"] if info["status"] == STATUS_DONE else received(upload_id)
+    return info
+
+
+def _keep_hasher(upload_id, h, offset):
+    _hashers[upload_id] = (h, offset)
+    _hashers.move_to_end(upload_id)
+    while len(_hashers) > MAX_HASHERS:
+        _hashers.popitem(last=False)
+
+
+@asynccontextmanager
+async def _locked(upload_id):
+    """Serialize requests on one upload; the lock lives only while a request holds or waits for it."""
+    entry = _locks.get(upload_id)
+    if entry is None:
+        entry = _locks[upload_id] = [asyncio.Lock(), 0]
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if not entry[1]:
+            del _locks[upload_id]
+
+
+def _hasher(upload_id, offset):
+    """Running hash of the first ``offset`` bytes, re-read from disk if it was lost (restart, eviction, rollback)."""
+    state = _hashers.get(upload_id)
+    if state is not None and state[1] == offset:
+        return state[0]
+    h = hashlib.sha256()
+    with open(part_path(upload_id), "rb") as f:
+        remaining = offset
+        while remaining:
+            block = f.read(min(WRITE_BUFFER, remaining))
+            if not block:
+                break
+            h.update(block)
+            remaining -= len(block)
+    _keep_hasher(upload_id, h, offset)
+    return h
+
+
+def _write(f, h, data):
+    # hashlib releases the GIL on large buffers, so this overlaps with request handling
+    f.write(data)
+    h.update(data)
+
+
+async def append(upload_id, offset, chunks, size=None):
+    """Write the async iterable ``chunks`` at ``offset``; returns the new offset.
+
+    ``offset`` must equal the bytes already received (409 otherwise, so a
+    client that lost a response can resume from ``get``). Bytes written
+    before a dropped connection are kept.
+    """
+    async with _locked(upload_id):
+        current = received(upload_id)
+        if offset != current:
+            raise UploadError(409, f"Expected offset {current}")
+        limit = MAX_UPLOAD_BYTES if size is None else min(size, MAX_UPLOAD_BYTES)
+        h = await run_in_threadpool(_hasher, upload_id, current)
+        f = await run_in_threadpool(open, part_path(upload_id), "r+b")
+        written = current
+        try:
+            f.seek(current)
+            buffer = bytearray()
+            async for chunk in chunks:
+                if written + len(buffer) + len(chunk) > limit:
+                    await run_in_threadpool(f.truncate, current)
+                    h, written = None, current
+                    raise UploadError(413, f"Upload exceeds {limit} bytes")
+                buffer += chunk
+                if len(buffer) >= WRITE_BUFFER:
+                    await run_in_threadpool(_write, f, h, bytes(buffer))
+                    written += len(buffer)
+                    buffer.clear()
+            if buffer:
+                await run_in_threadpool(_write, f, h, bytes(buffer))
+                written += len(buffer)
+        finally:
+            if h is None:
+                _hashers.pop(upload_id, None)
+            else:
+                _keep_hasher(upload_id, h, written)
+            await run_in_threadpool(f.close)
+        return written
+
+
+def recording_path(digest, file_name):
+    # keep the container suffix; the reader picks zip/gz/plain decoding from it
+    suffix = max((x for x in ACCEPTED_SUFFIXES if file_name.endswith(x)), key=len)
+    return os.path.join(UPLOAD_DIR, digest[:2], digest + suffix)
+
+
+async def finalize(upload_id, info, commit, sha256=None):
+    """Verify size and checksum, then record the upload with ``commit(size, digest)``.
+
+    ``info`` is the row from ``get``. ``commit`` runs on a worker thread
+    while the upload is still locked, so no part can be appended in between;
+    it should call ``commit_upload``. Returns (sha256 hex, ``commit``'s result).
+    """
+    if info["status"] != STATUS_OPEN:
+        raise UploadError(409, "Upload already finalized")
+    async with _locked(upload_id):
+        if not os.path.exists(part_path(upload_id)):
+            raise UploadError(409, "Upload already finalized")
+        total = received(upload_id)
+        if total == 0:
+            raise UploadError(400, "Upload is empty")
+        if info["size"] is not None and total != info["size"]:
+            raise UploadError(409, f"Received {total} of {info['size']} bytes")
+        digest = (await run_in_threadpool(_hasher, upload_id, total)).hexdigest()
+        if sha256 and sha256.lower() != digest:
+            raise UploadError(422, "Checksum mismatch")
+        result = await run_in_threadpool(commit, total, digest)
+    _hashers.pop(upload_id, None)
+    return digest, result
+
+
+def commit_upload(db, upload_id, file_name, size, digest):
+    """Mark a verified upload done, schedule its parse and move the part into place, all or nothing.
+
+    The part is moved inside the write transaction, so a job is never
+    visible before its file, and moved back if the transaction fails, so
+    the upload stays open and can be finalized again. Returns the
+    ``schedule_parse`` dict.
+    """
+    part = part_path(upload_id)
+    path = recording_path(digest, file_name)
+    moved = False
+    # serializes concurrent finalizes of the same upload or recording
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        row = db.execute("SELECT status FROM uploads WHERE id = ?", (upload_id,)).fetchone()
+        if row is None or row[0] != STATUS_OPEN:
+            raise UploadError(409, "Upload already finalized")
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(part, path)
+            moved = True
+        mark_done(db, upload_id, size, digest)
+        # parsed by the ingest worker (see src/worker.py), not in the API process
+        job = schedule_parse(db, digest, file_name, path, size)
+        db.commit()
+    except BaseException:
+        db.rollback()
+        if moved:
+            os.replace(path, part)
+        raise
+    if not moved:
+        # same bytes are already stored
+        os.remove(part)
+    return job
+
+
+def mark_done(db, upload_id, size, digest):
+    """Record a finalized upload; the caller commits."""
+    db.execute("UPDATE uploads SET status = ?, size = ?, sha256 = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+               (STATUS_DONE, size, digest, upload_id))
+
+
+def find_recording(db, digest):
+    """The recording stored under ``digest`` with the state of its parse, or None."""
+    row = db.execute(
+        "SELECT r.sha256, r.path, r.size, r.job_id, j.status AS job_status, "
+        "COALESCE(r.sortie_id, j.sortie_id) AS sortie_id, s.parse_status "
+        "FROM recordings r LEFT JOIN parse_jobs j ON j.id = r.job_id "
+        "LEFT JOIN sorties s ON s.id = COALESCE(r.sortie_id, j.sortie_id) "
+        "WHERE r.sha256 = ?", (digest,)).fetchone()
+    return dict(row) if row else None
+
+
+def ingested(recording):
+    return recording is not None and recording["parse_status"] == 'done'
+
+
+def completed_job(db, recording, file_name):
+    """A finished job pointing at the existing sortie of ``recording``; returns its id."""
+    job_id = str(uuid.uuid4())
+    db.execute("INSERT INTO parse_jobs (id, sortie_id, file_name, file_path, status, progress_pct) "
+               "VALUES (?, ?, ?, ?, 'done', 100)",
+               (job_id, recording["sortie_id"], file_name, recording["path"]))
+    return job_id
+
+
+def reuse(db, upload_id, digest):
+    """Finish ``upload_id`` without a transfer if ``digest`` was already ingested.
+
+    Returns the same dict as ``schedule_parse`` or None; the caller commits.
+    """
+    recording = find_recording(db, digest.lower())
+    if not ingested(recording):
+        return None
+    file_name = db.execute("SELECT file_name FROM uploads WHERE id = ?", (upload_id,)).fetchone()[0]
+    mark_done(db, upload_id, recording["size"], recording["sha256"])
+    try:
+        os.remove(part_path(upload_id))
+    except FileNotFoundError:
+        pass
+    return {"job_id": completed_job(db, recording, file_name), "sortie_id": recording["sortie_id"],
+            "deduplicated": True}
+
+
+def schedule_parse(db, digest, file_name, path, size):
+    """Job for a finalized upload: reuse an ingested or in-flight parse of the same bytes, else enqueue one.
+
+    Returns ``{"job_id", "sortie_id", "deduplicated"}``. Call inside a write
+    transaction (``BEGIN IMMEDIATE``) so concurrent uploads of one file agree.
+    """
+    recording = find_recording(db, digest)
+    if ingested(recording):
+        return {"job_id": completed_job(db, recording, file_name), "sortie_id": recording["sortie_id"],
+                "deduplicated": True}
+    if recording is not None and recording["job_status"] in ('queued', 'running'):
+        return {"job_id": recording["job_id"], "sortie_id": None, "deduplicated": True}
+    # new content, or the earlier parse failed / its sortie was deleted
+    job_id = str(uuid.uuid4())
+    path = os.path.abspath(path)
+    worker.enqueue(db, job_id, file_name, path)
+    db.execute("INSERT INTO recordings (sha256, file_name, path, size, job_id) VALUES (?, ?, ?, ?, ?) "
+               "ON CONFLICT(sha256) DO UPDATE SET path = excluded.path, job_id = excluded.job_id, sortie_id = NULL",
+               (digest, file_name, path, size, job_id))
+    return {"job_id": job_id, "sortie_id": None, "deduplicated": False}
+
+
+async def read_upload_file(file):
+    """Async chunks of a multipart ``UploadFile``."""
+    while True:
+        chunk = await file.read(WRITE_BUFFER)
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,311 @@
+"""Out-of-process ingest worker driven by the ``parse_jobs`` table.
+
+``POST /api/upload`` only saves the file and inserts a ``queued`` job with
+its ``file_path``. A supervisor loop claims queued jobs atomically
+(``UPDATE ... RETURNING`` on the oldest queued row, so two supervisors
+never take the same job) and parses each one in its own spawned process,
+at most ``concurrency`` at a time. Parsing therefore never competes with
+request handling for the GIL, and a crashing parse cannot take the API
+down with it.
+
+While a child runs, the supervisor refreshes the job's ``heartbeat_at``.
+A ``running`` job whose heartbeat is older than ``stale_after`` seconds
+belongs to a supervisor that died; it is put back in the queue, or failed
+once it has been attempted ``MAX_ATTEMPTS`` times. A child that dies
+mid-parse (killed, out of memory) is requeued the same way. Jobs still
+queued when the process stops are simply picked up on the next start.
+
+A requeued job keeps its sortie: the parser commits rows only together
+with a checkpoint in ``parse_checkpoints`` and the next attempt continues
+from there instead of parsing the file again.
+
+The supervisor runs embedded in the API process (``INGEST_WORKER=embedded``,
+the default) or standalone::
+
+    python -m src.worker --concurrency 2
+
+with ``INGEST_WORKER=off`` on the API side.
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from . import database, parser
+
+CONCURRENCY = int(os.environ.get("INGEST_CONCURRENCY", 1))
+POLL_SECONDS = 1.0
+HEARTBEAT_SECONDS = 5.0
+STALE_SECONDS = 60.0
+MAX_ATTEMPTS = 3
+# standalone supervisor: least time between progress_pct writes of one job
+PROGRESS_WRITE_SECONDS = 2.0
+
+CLAIM_SQL = """
+    UPDATE parse_jobs
+    SET status = 'running', worker = ?, attempts = attempts + 1,
+        heartbeat_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+    WHERE id = (SELECT id FROM parse_jobs
+                WHERE status = 'queued' AND file_path IS NOT NULL
+                ORDER BY created_at, rowid LIMIT 1)
+    RETURNING id, file_path, file_name
+"""
+
+
+def enqueue(db, job_id, file_name, file_path):
+    """Insert a queued job; the caller commits."""
+    db.execute("INSERT INTO parse_jobs (id, file_name, file_path, status, progress_pct) VALUES (?, ?, ?, 'queued', 0)",
+               (job_id, file_name, file_path))
+
+
+def claim_job(conn, worker_id):
+    """(job_id, file_path, file_name) of the oldest queued job, now marked running, or None."""
+    row = conn.execute(CLAIM_SQL, (worker_id,)).fetchone()
+    conn.commit()
+    return tuple(row) if row else None
+
+
+def _abandon_sortie(conn, job_id, sortie_id):
+    # the half-written sortie of a job that will not be resumed
+    conn.execute("DELETE FROM parse_checkpoints WHERE job_id = ?", (job_id,))
+    if sortie_id is not None:
+        conn.execute("UPDATE sorties SET parse_status = 'failed' WHERE id = ? AND parse_status != 'done'",
+                     (sortie_id,))
+
+
+def requeue_job(conn, job_id, count_attempt=True):
+    """Put a running job back in the queue; its checkpoint (if any) is kept so the next attempt resumes."""
+    conn.execute("UPDATE parse_jobs SET status = 'queued', worker = NULL, "
+                 "attempts = attempts - ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                 (0 if count_attempt else 1, job_id))
+
+
+def fail_job(conn, job_id, sortie_id, error):
+    conn.execute("UPDATE parse_jobs SET status = 'failed', error = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                 (error, job_id))
+    _abandon_sortie(conn, job_id, sortie_id)
+
+
+def recover_stale(conn, stale_after=STALE_SECONDS, max_attempts=MAX_ATTEMPTS):
+    """Requeue (or fail) running jobs whose heartbeat stopped; returns their ids."""
+    cutoff = f"-{int(stale_after)} seconds"
+    rows = conn.execute(
+        "SELECT id, sortie_id, attempts FROM parse_jobs WHERE status = 'running' "
+        "AND (heartbeat_at IS NULL OR heartbeat_at < datetime('now', ?))", (cutoff,)).fetchall()
+    for job_id, sortie_id, attempts in rows:
+        if (attempts or 0) >= max_attempts:
+            fail_job(conn, job_id, sortie_id, f"worker lost after {attempts} attempts")
+        else:
+            requeue_job(conn, job_id)
+    conn.commit()
+    return [r[0] for r in rows]
+
+
+def run_job(db_path, job_id, file_path, file_name=None, progress=None):
+    """Child process entry point; progress steps go to the ``progress`` queue as (job_id, pct)."""
+    on_progress = (lambda job, pct: progress.put((job, pct))) if progress is not None else None
+    acmi_parser = parser.AcmiParser(db_path=db_path, on_progress=on_progress)
+    acmi_parser.parse_file(file_path, job_id=job_id, source_name=file_name)
+
+
+class Worker:
+    """Claims queued jobs and runs each in a child process.
+
+    ``on_finished(job_id, sortie_id)`` is called in the supervisor after a
+    child exits, e.g. to drop cached responses for the sortie.
+    ``on_progress(job_id, **fields)`` receives status changes of the jobs
+    this supervisor runs and the percentages their children report over a
+    queue (see ``src/progress.py``). Without it (standalone worker, no bus
+    to publish to) the percentages are written to ``parse_jobs`` instead,
+    at most every ``PROGRESS_WRITE_SECONDS`` per job, by the supervisor
+    and outside the parse's own transaction.
+    """
+
+    def __init__(self, db_path=None, concurrency=CONCURRENCY, poll_interval=POLL_SECONDS,
+                 heartbeat_interval=HEARTBEAT_SECONDS, stale_after=STALE_SECONDS, on_finished=None,
+                 on_progress=None):
+        self.db_path = db_path or database.DB_PATH
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self.on_finished = on_finished
+        self.on_progress = on_progress
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.running = {}  # job_id -> Process
+        self._ctx = multiprocessing.get_context("spawn")
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_beat = 0.0
+        self._progress = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA busy_timeout = 5000")
+        return conn
+
+    def wake(self):
+        """Skip the rest of the poll interval, e.g. right after an upload."""
+        self._wake.set()
+
+    def _report(self, job_id, **fields):
+        if self.on_progress is not None:
+            self.on_progress(job_id, **fields)
+
+    def _progress_queue(self):
+        """Queue children report progress on, drained by a relay thread."""
+        if self._progress is None:
+            self._progress = self._ctx.Queue()
+            threading.Thread(target=self._relay, args=(self._progress,), name="ingest-progress", daemon=True).start()
+        return self._progress
+
+    def _relay(self, queue):
+        conn = self._connect() if self.on_progress is None else None
+        written = {}  # job_id -> monotonic time of its last progress_pct write
+        try:
+            while True:
+                item = queue.get()
+                if item is None:
+                    return
+                job_id, pct = item
+                if conn is None:
+                    self._report(job_id, progress_pct=pct)
+                    continue
+                now = time.monotonic()
+                if now - written.get(job_id, float('-inf')) < PROGRESS_WRITE_SECONDS:
+                    continue
+                written = {j: t for j, t in written.items() if now - t < PROGRESS_WRITE_SECONDS}
+                written[job_id] = now
+                try:
+                    conn.execute("UPDATE parse_jobs SET progress_pct = ?, updated_at = CURRENT_TIMESTAMP "
+                                 "WHERE id = ? AND status = 'running'", (pct, job_id))
+                    conn.commit()
+                except sqlite3.Error as e:
+                    print(f"Progress of job {job_id} not written: {e}")
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def _reap(self, conn):
+        for job_id, proc in list(self.running.items()):
+            if proc.is_alive():
+                continue
+            proc.join()
+            del self.running[job_id]
+            row = conn.execute("SELECT status, sortie_id, attempts, error FROM parse_jobs WHERE id = ?",
+                               (job_id,)).fetchone()
+            if row is None:
+                continue
+            status, sortie_id, attempts, error = row
+            if status == 'running':
+                # the parser reports its own errors; getting here means it died or bailed out early
+                if proc.exitcode != 0 and (attempts or 0) < MAX_ATTEMPTS:
+                    requeue_job(conn, job_id)
+                    conn.commit()
+                    self._report(job_id, status='queued')
+                    continue
+                status, error = 'failed', f"parse did not finish (exit code {proc.exitcode})"
+                fail_job(conn, job_id, sortie_id, error)
+                conn.commit()
+            elif status == 'done':
+                conn.execute("UPDATE recordings SET sortie_id = ? WHERE job_id = ?", (sortie_id, job_id))
+                conn.commit()
+            if status == 'done':
+                self._report(job_id, status=status, progress_pct=100, sortie_id=sortie_id)
+            else:
+                self._report(job_id, status=status, sortie_id=sortie_id, error=error)
+            if self.on_finished is not None:
+                self.on_finished(job_id, sortie_id)
+
+    def _heartbeat(self, conn):
+        now = time.monotonic()
+        if not self.running or now - self._last_beat < self.heartbeat_interval:
+            return
+        self._last_beat = now
+        ids = list(self.running)
+        conn.execute(f"UPDATE parse_jobs SET heartbeat_at = CURRENT_TIMESTAMP "
+                     f"WHERE id IN ({', '.join('?' * len(ids))})", ids)
+        conn.commit()
+
+    def run_once(self, conn):
+        """One supervisor pass; returns the number of jobs started."""
+        self._reap(conn)
+        self._heartbeat(conn)
+        recover_stale(conn, self.stale_after)
+        started = 0
+        while len(self.running) < self.concurrency:
+            job = claim_job(conn, self.worker_id)
+            if job is None:
+                break
+            job_id = job[0]
+            proc = self._ctx.Process(target=run_job, args=(self.db_path, *job, self._progress_queue()),
+                                     name=f"parse-{job_id}")
+            proc.start()
+            self.running[job_id] = proc
+            self._report(job_id, status='running', progress_pct=0)
+            started += 1
+        return started
+
+    def run(self):
+        conn = self._connect()
+        try:
+            while not self._stop.is_set():
+                try:
+                    self.run_once(conn)
+                except sqlite3.Error as e:
+                    print(f"Ingest worker pass failed: {e}")
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+        finally:
+            self._shutdown(conn)
+            conn.close()
+
+    def _shutdown(self, conn):
+        """Stop children and put their jobs back in the queue."""
+        for job_id, proc in self.running.items():
+            proc.terminate()
+            proc.join()
+            row = conn.execute("SELECT status FROM parse_jobs WHERE id = ?", (job_id,)).fetchone()
+            if row and row[0] == 'running':
+                requeue_job(conn, job_id, count_attempt=False)
+                self._report(job_id, status='queued')
+        conn.commit()
+        self.running.clear()
+        if self._progress is not None:
+            self._progress.put(None)
+            self._progress = None
+
+    def start(self):
+        """Run the supervisor on a daemon thread (embedded mode)."""
+        self._thread = threading.Thread(target=self.run, name="ingest-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=30):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Run the ACMI ingest worker.")
+    ap.add_argument("--db", default=database.DB_PATH)
+    ap.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    ap.add_argument("--poll", type=float, default=POLL_SECONDS)
+    args = ap.parse_args(argv)
+
+    from . import db_init
+    db_init.init_db(args.db)
+    worker = Worker(db_path=args.db, concurrency=args.concurrency, poll_interval=args.poll)
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import sqlite3
+
+# Statements used by the ingest pipeline, keyed by target table.
+INSERT_SQL = {
+    "telemetry": (
+        "INSERT INTO telemetry (sortie_id, obj_id, time_offset, lat, lon, alt, roll, pitch, yaw, u, v, heading, ias, g_force, "
+        "tas, mach, fuel_remaining, ground_speed, vertical_speed, turn_rate, specific_energy, raw, raw_line) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    ),
+    "events": "INSERT INTO events (sortie_id, time_offset, event_type, object_ids, text, raw) VALUES (?, ?, ?, ?, ?, ?)",
+    "global_props": "INSERT INTO global_props (sortie_id, key, value) VALUES (?, ?, ?)",
+    "objects": (
+        "INSERT INTO objects (sortie_id, obj_id, name, type, coalition, pilot, callsign, color, shape, raw) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    ),
+}
+
+# PRAGMAs applied to the ingest connection. WAL lets readers keep serving
+# while a parse is running; NORMAL sync is durable at transaction boundaries
+# in WAL mode and avoids an fsync per commit. The busy timeout waits out
+# the short writes the API makes (uploads, deletes) instead of failing.
+INGEST_PRAGMAS = (
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+def apply_ingest_pragmas(conn: sqlite3.Connection):
+    for pragma in INGEST_PRAGMAS:
+        conn.execute(pragma)
+
+
+class BatchWriter:
+    """Buffers INSERT rows per table and writes them with executemany.
+
+    Rows are flushed once a table buffer reaches ``batch_size`` and the open
+    transaction is committed every ``txn_rows`` written rows, so a long parse
+    holds the write lock for bounded stretches instead of one huge transaction.
+    With ``autocommit=False`` the caller decides when to commit (checkpointed
+    parsing commits only at frame boundaries) and polls ``txn_full``.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, batch_size: int = 5000, txn_rows: int = 100000,
+                 autocommit: bool = True):
+        self.conn = conn
+        self.batch_size = max(1, batch_size)
+        self.txn_rows = max(self.batch_size, txn_rows)
+        self.autocommit = autocommit
+        self.buffers = {table: [] for table in INSERT_SQL}
+        self.rows_in_txn = 0
+        self.rows_written = 0
+
+    def add(self, table: str, row: tuple):
+        buf = self.buffers[table]
+        buf.append(row)
+        if len(buf) >= self.batch_size:
+            self._flush_table(table)
+            if self.autocommit and self.rows_in_txn >= self.txn_rows:
+                self.commit()
+
+    def txn_full(self):
+        return self.rows_in_txn >= self.txn_rows
+
+    def _flush_table(self, table: str):
+        buf = self.buffers[table]
+        if not buf:
+            return
+        self.conn.executemany(INSERT_SQL[table], buf)
+        self.rows_in_txn += len(buf)
+        self.rows_written += len(buf)
+        buf.clear()
+
+    def flush(self):
+        for table in self.buffers:
+            self._flush_table(table)
+
+    def commit(self):
+        self.flush()
+        self.conn.commit()
+        self.rows_in_txn = 0
+
+    def discard(self):
+        for buf in self.buffers.values():
+            buf.clear()
+        self.conn.rollback()
+        self.rows_in_txn = 0
@@ -1,9 +1,22 @@
+import json
+import os
 import pytest
 from fastapi.testclient import TestClient
 from src.main import app
+from src import schemas, database, db_init
 
 client = TestClient(app)
 
+@pytest.fixture(autouse=True)
+def api_db(tmp_path, monkeypatch):
+    """Point the app (and ``_ingest``) at a fresh database under ``tmp_path``."""
+    path = str(tmp_path / "db" / "flight_data.db")
+    db_init.init_db(path)
+    database.close_pools()
+    monkeypatch.setattr(database, "DB_PATH", path)
+    yield path
+    database.close_pools()
+
 def test_read_main():
     response = client.get("/api/")
     assert response.status_code == 200
@@ -17,3 +30,440 @@ def test_list_sorties():
 def test_invalid_sortie():
     response = client.get("/api/sorties/999999/telemetry")
     assert response.status_code == 404
+
+def _ingest(tmp_path, frames=50):
+    from src import database
+    from src.parser import AcmiParser
+    acmi = tmp_path / "api.acmi"
+    lines = ["0,ReferenceTime=2026-02-01T10:00:00Z"]
+    for t in range(frames):
+        lines.append(f"#{t * 0.5:.1f}")
+        lines.append(f"a1,T=41.{t:02d}|42.5|{1000 + t}|1|2|3" + (",Name=F-16C,Type=Air+FixedWing" if t == 0 else ",IAS=250"))
+    acmi.write_text("\n".join(lines) + "\n")
+    parser = AcmiParser(db_path=database.DB_PATH)
+    parser.parse_file(str(acmi))
+    return parser.sortie_id
+
+def test_binary_telemetry_matches_json(tmp_path):
+    import math
+    from src import packed
+    sortie_id = _ingest(tmp_path)
+
+    url = f"/api/sorties/{sortie_id}/telemetry"
+    rows = client.get(url).json()
+    by_param = client.get(url, params={"format": "binary"})
+    by_accept = client.get(url, headers={"Accept": packed.MEDIA_TYPE})
+    assert by_param.headers["content-type"] == packed.MEDIA_TYPE
+    assert by_param.content == by_accept.content
+    cols = packed.decode(by_param.content)
+    assert len(cols["time_offset"]) == len(rows) == 50
+    for i in (0, 17, 49):
+        for name in ("time_offset", "lat", "lon", "alt", "ias"):
+            want = rows[i][name]
+            got = float(cols[name][i])
+            assert (want is None and math.isnan(got)) or math.isclose(got, want, rel_tol=1e-6)
+        assert cols["obj_id"][i] == rows[i]["obj_id"]
+    assert client.get(url, params={"format": "xml"}).status_code == 400
+
+def test_ndjson_stream_matches_json(tmp_path):
+    import json
+    from src import columnar, database
+    sortie_id = _ingest(tmp_path, frames=30)
+    url = f"/api/sorties/{sortie_id}/telemetry"
+    rows = client.get(url).json()
+    assert set(rows[0]) == set(schemas.TelemetryBase.model_fields)
+    assert rows[0]["raw"] is None
+    nd = client.get(url, headers={"Accept": "application/x-ndjson"})
+    assert nd.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in nd.text.splitlines()] == rows
+    # the SQL fallback streams the same rows
+    columnar.delete_store(database.DB_PATH, sortie_id)
+    assert client.get(url).json() == rows
+    raw = client.get(url, params={"include_raw": True, "format": "ndjson"}).text.splitlines()
+    assert len(raw) == 30 and json.loads(json.loads(raw[0])["raw"])["T"]
+
+def test_keyset_pages_cover_telemetry_and_events(tmp_path):
+    from src import columnar, database, paging
+    from src.parser import AcmiParser
+    acmi = tmp_path / "pages.acmi"
+    lines = ["0,ReferenceTime=2026-02-01T10:00:00Z"]
+    for t in range(40):
+        lines.append(f"#{t:.1f}")
+        lines.append(f"b2,T=41.{t:02d}|42.5|{2000 + t}" + (",Name=Su-27,Type=Air+FixedWing" if t == 0 else ""))
+        lines.append(f"a1,T=41.{t:02d}|42.6|{1000 + t}" + (",Name=F-16C,Type=Air+FixedWing" if t == 0 else ""))
+        if t % 3 == 0:
+            lines.append(f"0,Event=Message|a1|mark {t}")
+    acmi.write_text("\n".join(lines) + "\n")
+    parser = AcmiParser(db_path=database.DB_PATH)
+    parser.parse_file(str(acmi))
+    url = f"/api/sorties/{parser.sortie_id}"
+
+    def walk(path, **params):
+        items, cursor = [], None
+        while True:
+            page = client.get(path, params={**params, **({"cursor": cursor} if cursor else {})}).json()
+            items += page["items"]
+            cursor = page["next_cursor"]
+            if not cursor:
+                return items
+
+    full = walk(f"{url}/telemetry", page_size=7)
+    assert [(r["obj_id"], r["time_offset"]) for r in full] == [(o, float(t)) for o in ("a1", "b2") for t in range(40)]
+    assert walk(f"{url}/telemetry", page_size=7, obj_id="b2", start=10) == [r for r in full if r["obj_id"] == "b2" and r["time_offset"] >= 10]
+    # well-formed tokens with mistyped keys are rejected, from the store and from SQL alike
+    forged = [paging.encode_cursor(paging.TELEMETRY, key) for key in (("x", "y", 1), ("a1", "y", 1), ("a1", 1.0, 1.5),
+                                                                      ("a1", True, 1), (["a1"], 1.0, 1))]
+    assert [client.get(f"{url}/telemetry", params={"cursor": c}).status_code for c in forged] == [400] * 5
+    columnar.delete_store(database.DB_PATH, parser.sortie_id)
+    assert walk(f"{url}/telemetry", page_size=7) == full
+    assert [client.get(f"{url}/telemetry", params={"cursor": c}).status_code for c in forged] == [400] * 5
+    assert client.get(f"{url}/events", params={"cursor": paging.encode_cursor(paging.EVENTS, ("x", 1))}).status_code == 400
+
+    events = client.get(f"{url}/events").json()
+    assert walk(f"{url}/events", page_size=4) == events and len(events) == 15
+    # 14 messages, plus the two aircraft flying within 10 nm of each other
+    assert [e["event_type"] for e in events].count("Proximity") == 1
+    assert client.get(f"{url}/telemetry", params={"cursor": "bogus"}).status_code == 400
+    assert client.get(f"{url}/telemetry", params={"page_size": 5, "downsample": 2}).status_code == 400
+
+def test_done_sortie_etag_304_and_precompressed_body(tmp_path):
+    import gzip
+    from src import main
+    sortie_id = _ingest(tmp_path, frames=200)
+    url = f"/api/sorties/{sortie_id}/telemetry"
+    params = {"target_points": 50}
+
+    first = client.get(url, params=params, headers={"Accept-Encoding": "gzip"})
+    assert first.status_code == 200
+    assert first.headers["content-encoding"] == "gzip"
+    assert first.headers["cache-control"].startswith("public")
+    etag = first.headers["etag"]
+    assert etag.startswith(f'"s{sortie_id}-g1-') and etag.endswith('-gzip"')
+    # the cached variant is served as-is; httpx has already decoded the body
+    again = client.get(url, params=params, headers={"Accept-Encoding": "gzip"})
+    assert again.content == first.content and again.headers["etag"] == etag
+    cached = main.body_cache.get((sortie_id, etag.replace("-gzip", ""), "gzip"))
+    assert gzip.decompress(cached[0]) == first.content
+
+    not_modified = client.get(url, params=params, headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304 and not not_modified.content
+    assert client.get(url, params={"target_points": 60}, headers={"If-None-Match": etag}).status_code == 200
+
+    # a new parse generation changes every ETag
+    from src import database
+    with database.get_db() as db:
+        db.execute("UPDATE sorties SET parse_generation = parse_generation + 1 WHERE id = ?", (sortie_id,))
+        db.commit()
+    assert client.get(url, params=params, headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_unfinished_sortie_is_not_cached(tmp_path):
+    from src import database
+    sortie_id = _ingest(tmp_path, frames=10)
+    with database.get_db() as db:
+        db.execute("UPDATE sorties SET parse_status = 'running' WHERE id = ?", (sortie_id,))
+        db.commit()
+    r = client.get(f"/api/sorties/{sortie_id}/objects")
+    assert r.status_code == 200 and r.json()[0]["obj_id"] == "a1"
+    assert r.headers["cache-control"] == "no-cache" and "etag" not in r.headers
+
+def test_streamed_telemetry_uses_its_own_connection(tmp_path, monkeypatch):
+    import asyncio
+    import sqlite3
+    from fastapi import HTTPException
+    from src import columnar, main
+    sortie_id = _ingest(tmp_path, frames=30)
+    # an unfinished sortie without a store is streamed straight off SQLite
+    columnar.delete_store(database.DB_PATH, sortie_id)
+    with database.get_db() as db:
+        db.execute("UPDATE sorties SET parse_status = 'running' WHERE id = ?", (sortie_id,))
+        db.commit()
+    database.close_pools()
+    opened = []
+    connect = database.connect
+    monkeypatch.setattr(database, "connect", lambda path: opened.append(connect(path)) or opened[-1])
+
+    response = main.stream_telemetry_rows(sortie_id, None, None, None, False, "json")
+    assert len(opened) == 1 and database.get_pool().created == 0
+    async def body():
+        return b"".join([chunk async for chunk in response.body_iterator])
+    assert len(json.loads(asyncio.run(body()))) == 30
+    with pytest.raises(HTTPException) as err:
+        main.stream_telemetry_rows(sortie_id, "missing", None, None, False, "json")
+    assert err.value.status_code == 404
+    for conn in opened:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+
+def test_result_cache_is_shared_and_dropped_on_delete(tmp_path):
+    from src import main
+    sortie_id = _ingest(tmp_path, frames=40)
+    url = f"/api/sorties/{sortie_id}"
+    params = {"obj_id": "a1", "start": 2, "end": 12, "downsample": 2}
+    before = client.get("/api/cache").json()["results"]
+    json_rows = client.get(f"{url}/telemetry", params=params).json()
+    client.get(f"{url}/telemetry", params={**params, "format": "binary"})
+    client.get(f"{url}/telemetry", params={**params, "start": "2.0", "include_raw": False})
+    after = client.get("/api/cache").json()["results"]
+    # json, binary and an equivalent spelling share one decoded result
+    assert after["misses"] - before["misses"] == 1
+    assert after["hits"] - before["hits"] == 2
+    assert len(json_rows) == 6
+
+    assert client.delete(url).json() == {"deleted": sortie_id}
+    assert not [k for k in main.result_cache._entries if k[0] == sortie_id]
+    assert client.get(f"{url}/telemetry", params=params).status_code == 404
+    assert client.delete(url).status_code == 404
+
+def _upload_dirs(tmp_path, monkeypatch):
+    from src import uploads
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(uploads, "PARTIAL_DIR", str(tmp_path / "partial"))
+    return uploads
+
+def test_resumable_upload(tmp_path, monkeypatch):
+    import hashlib
+    from src import database
+    _upload_dirs(tmp_path, monkeypatch)
+    # unique bytes, so an earlier run's recording is not reused
+    data = b"FileType=text/acmi/tacview\n" + os.urandom(8).hex().encode() + b"\n" + b"#0\n" * 5000
+    r = client.post("/api/uploads", json={"file_name": "../big.acmi", "size": len(data)})
+    assert r.status_code == 200
+    upload_id = r.json()["upload_id"]
+    assert r.json()["file_name"] == "big.acmi" and r.json()["offset"] == 0
+
+    url = f"/api/uploads/{upload_id}"
+    assert client.put(url, params={"offset": 0}, content=data[:6000]).json()["offset"] == 6000
+    # a retried or out-of-order part is rejected; the client resumes from GET
+    assert client.put(url, params={"offset": 0}, content=data[:6000]).status_code == 409
+    assert client.get(url).json()["offset"] == 6000
+    assert client.post(f"{url}/finalize").status_code == 409
+    assert client.put(url, params={"offset": 6000}, content=data[6000:]).json()["offset"] == len(data)
+
+    assert client.post(f"{url}/finalize", json={"sha256": "0" * 64}).status_code == 422
+    digest = hashlib.sha256(data).hexdigest()
+    r = client.post(f"{url}/finalize", json={"sha256": digest})
+    assert r.status_code == 200 and r.json()["sha256"] == digest
+    with database.get_db() as db:
+        job = db.execute("SELECT status, file_path FROM parse_jobs WHERE id = ?", (r.json()["job_id"],)).fetchone()
+    assert job["status"] == "queued"
+    assert open(job["file_path"], "rb").read() == data
+    assert client.get(url).json()["status"] == "done"
+    assert client.put(url, params={"offset": len(data)}, content=b"x").status_code == 409
+
+def test_upload_limits(tmp_path, monkeypatch):
+    uploads = _upload_dirs(tmp_path, monkeypatch)
+    monkeypatch.setattr(uploads, "MAX_UPLOAD_BYTES", 1000)
+    assert client.post("/api/uploads", json={"file_name": "a.txt"}).status_code == 400
+    assert client.post("/api/uploads", json={"file_name": "a.acmi", "size": 5000}).status_code == 413
+    upload_id = client.post("/api/uploads", json={"file_name": "a.acmi"}).json()["upload_id"]
+    url = f"/api/uploads/{upload_id}"
+    assert client.put(url, params={"offset": 0}, content=b"x" * 600).status_code == 200
+    assert client.put(url, params={"offset": 600}, content=b"x" * 600).status_code == 413
+    # the rejected part is not kept
+    assert client.get(url).json()["offset"] == 600
+
+def test_abandoned_uploads_do_not_accumulate_state(tmp_path, monkeypatch):
+    import hashlib
+    uploads = _upload_dirs(tmp_path, monkeypatch)
+    monkeypatch.setattr(uploads, "MAX_HASHERS", 2)
+    monkeypatch.setattr(uploads, "_hashers", type(uploads._hashers)())
+    data = {}
+    for k in range(3):
+        upload_id = client.post("/api/uploads", json={"file_name": f"u{k}.acmi"}).json()["upload_id"]
+        data[upload_id] = os.urandom(8).hex().encode() * 100
+        client.put(f"/api/uploads/{upload_id}", params={"offset": 0}, content=data[upload_id])
+    assert not uploads._locks and list(uploads._hashers) == list(data)[1:]
+    # the evicted hash is rebuilt from the part file
+    first = list(data)[0]
+    r = client.post(f"/api/uploads/{first}/finalize", json={"sha256": hashlib.sha256(data[first]).hexdigest()})
+    assert r.status_code == 200 and first not in uploads._hashers and not uploads._locks
+
+def test_failed_finalize_can_be_retried(tmp_path, monkeypatch):
+    import sqlite3
+    uploads = _upload_dirs(tmp_path, monkeypatch)
+    data = os.urandom(8).hex().encode() * 50
+    upload_id = client.post("/api/uploads", json={"file_name": "retry.acmi"}).json()["upload_id"]
+    url = f"/api/uploads/{upload_id}"
+    client.put(url, params={"offset": 0}, content=data)
+    schedule_parse = uploads.schedule_parse
+
+    def locked(*args):
+        raise sqlite3.OperationalError("database is locked")
+    monkeypatch.setattr(uploads, "schedule_parse", locked)
+    with pytest.raises(sqlite3.OperationalError):
+        client.post(f"{url}/finalize")
+    # the part was moved back and the upload is still open
+    assert client.get(url).json()["status"] == "open" and os.path.exists(uploads.part_path(upload_id))
+    monkeypatch.setattr(uploads, "schedule_parse", schedule_parse)
+    r = client.post(f"{url}/finalize")
+    assert r.status_code == 200 and not r.json()["deduplicated"]
+    assert client.post(f"{url}/finalize").status_code == 409
+
+def test_multipart_upload_queues_job(tmp_path, monkeypatch):
+    _upload_dirs(tmp_path, monkeypatch)
+    r = client.post("/api/upload", files={"file": ("m.acmi", os.urandom(8).hex().encode(), "application/octet-stream")})
+    assert r.status_code == 200 and r.json()["job_id"]
+    assert client.get(f"/api/jobs/{r.json()['job_id']}").json()["status"] == "queued"
+    assert client.post("/api/upload", files={"file": ("m.exe", b"x")}).status_code == 400
+
+def test_identical_upload_reuses_sortie(tmp_path, monkeypatch):
+    import hashlib
+    from src import database, worker
+    _upload_dirs(tmp_path, monkeypatch)
+    marker = os.urandom(8).hex()
+    data = (f"0,ReferenceTime=2026-02-01T10:00:00Z,Comments={marker}\n#0\n"
+            "a1,T=41|42|1000,Name=F-16C,Type=Air+FixedWing\n#1\na1,T=41.1|42|1010\n").encode()
+    files = {"file": ("dup.acmi", data)}
+    first = client.post("/api/upload", files=files).json()
+    assert first["deduplicated"] is False and first["sortie_id"] is None
+    # same bytes while the first parse is still queued: join that job
+    second = client.post("/api/upload", files={"file": ("copy.acmi", data)}).json()
+    assert second["job_id"] == first["job_id"] and second["deduplicated"] is True
+    assert len(list((tmp_path / first["sha256"][:2]).iterdir())) == 1
+
+    with database.get_db() as db:
+        job = db.execute("SELECT file_path, file_name FROM parse_jobs WHERE id = ?", (first["job_id"],)).fetchone()
+    worker.run_job(database.DB_PATH, first["job_id"], job["file_path"], job["file_name"])
+    sortie_id = client.get(f"/api/jobs/{first['job_id']}").json()["sortie_id"]
+    assert [s["mission_name"] for s in client.get("/api/sorties").json() if s["id"] == sortie_id] == ["dup.acmi"]
+
+    third = client.post("/api/upload", files=files).json()
+    assert third["deduplicated"] is True and third["sortie_id"] == sortie_id
+    assert client.get(f"/api/jobs/{third['job_id']}").json()["status"] == "done"
+    # a client that sends the hash up front skips the transfer
+    r = client.post("/api/uploads", json={"file_name": "dup.acmi", "sha256": hashlib.sha256(data).hexdigest()}).json()
+    assert r["deduplicated"] is True and r["sortie_id"] == sortie_id
+    assert r["status"] == "done" and r["offset"] == len(data)
+
+    client.delete(f"/api/sorties/{sortie_id}")
+    again = client.post("/api/upload", files=files).json()
+    assert again["deduplicated"] is False and again["job_id"] != first["job_id"]
+
+def test_live_session_websocket_feed(tmp_path, monkeypatch):
+    import orjson
+    from src import realtime
+    from src.replay import ReplayServer
+    monkeypatch.setattr(realtime, "LIVE_HOSTS", frozenset({"127.0.0.1"}))
+    assert client.post("/api/live", json={"host": "10.0.0.1"}).status_code == 403
+    acmi = tmp_path / "live.acmi"
+    lines = ["0,ReferenceTime=2026-02-01T10:00:00Z"]
+    for t in range(40):
+        lines += [f"#{t * 0.5}", f"a1,T=41.{t:02d}|42.5|{1000 + t}" + (",Name=F-16C,Type=Air+FixedWing" if t == 0 else "")]
+    acmi.write_text("\n".join(lines) + "\n")
+    server = ReplayServer(str(acmi), port=0, speed=20).start()
+    try:
+        live = client.post("/api/live", json={"host": "127.0.0.1", "port": server.server_address[1]}).json()
+        messages = []
+        with client.websocket_connect(f"/api/live/{live['session_id']}/ws") as ws:
+            while not messages or messages[-1]["type"] != "end":
+                messages.append(orjson.loads(ws.receive_bytes()))
+    finally:
+        server.stop()
+    assert messages[0]["type"] == "snapshot"
+    assert messages[-1]["status"] == "done"
+    frames = [m for m in messages if m["type"] == "frame" and m["n"] > messages[0]["n"]]
+    assert frames and frames[-1]["objects"]["a1"][2] == 1039
+    info = client.get(f"/api/live/{live['session_id']}").json()
+    assert info["status"] == "done" and info["frames"] == 40
+    telemetry = client.get(f"/api/sorties/{info['sortie_id']}/telemetry").json()
+    assert len(telemetry) == 40
+    client.delete(f"/api/sorties/{info['sortie_id']}")
+
+def test_job_events_stream_until_done():
+    import threading
+    import time
+    import uuid
+    import orjson
+    from src import database, progress
+    job_id = str(uuid.uuid4())
+    with database.get_db() as db:
+        db.execute("INSERT INTO parse_jobs (id, file_name, status, progress_pct) VALUES (?, 'x.acmi', 'running', 0)",
+                   (job_id,))
+        db.commit()
+
+    def run_job():
+        time.sleep(0.3)
+        progress.bus.publish(job_id, progress_pct=50)
+        time.sleep(0.3)
+        progress.bus.publish(job_id, status="done", progress_pct=100, sortie_id=7)
+
+    threading.Thread(target=run_job).start()
+    res = client.get(f"/api/jobs/{job_id}/events")
+    assert res.headers["content-type"].startswith("text/event-stream")
+    events = [orjson.loads(line[6:]) for line in res.text.splitlines() if line.startswith("data: ")]
+    assert [(e["status"], e["progress_pct"]) for e in events] == [("running", 0), ("running", 50), ("done", 100)]
+    assert events[-1]["sortie_id"] == 7
+    # the percentage is never written to parse_jobs; the job endpoint reads it from the bus
+    assert client.get(f"/api/jobs/{job_id}").json()["progress_pct"] == 100
+    with database.get_db() as db:
+        assert db.execute("SELECT progress_pct FROM parse_jobs WHERE id = ?", (job_id,)).fetchone()[0] == 0
+
+def test_snapshot_interpolates_every_object(tmp_path):
+    sortie_id = _ingest(tmp_path, frames=20)
+    url = f"/api/sorties/{sortie_id}/snapshot"
+    frames = client.get(url, params={"t": 1.25}).json()["frames"]
+    assert len(frames) == 1 and frames[0]["time_offset"] == 1.25
+    [state] = frames[0]["objects"]
+    assert state["obj_id"] == "a1" and state["alt"] == pytest.approx(1002.5)
+    window = client.get(url, params={"start": 0, "end": 20, "step": 2.5}).json()["frames"]
+    # the track ends at t=9.5
+    assert [f["time_offset"] for f in window] == [0, 2.5, 5, 7.5]
+    r = client.get(url, params={"t": 1.25})
+    assert client.get(url, params={"t": 1.25}, headers={"If-None-Match": r.headers["etag"]}).status_code == 304
+    assert client.get(url).status_code == 400
+    assert client.get(url, params={"start": 0, "end": 1000, "step": 0.1}).status_code == 400
+    assert client.get("/api/sorties/999999/snapshot", params={"t": 0}).status_code == 404
+
+def test_spatial_queries(tmp_path):
+    sortie_id = _ingest(tmp_path, frames=40)
+    url = f"/api/sorties/{sortie_id}"
+    box = {"min_lon": 41.1, "max_lon": 41.2, "min_lat": 42, "max_lat": 43}
+    rows = client.get(f"{url}/bbox", params=box).json()
+    assert [r["lon"] for r in rows] == pytest.approx([41.1 + i * 0.01 for i in range(11)])
+    assert client.get(f"{url}/bbox", params={**box, "start": 6, "min_alt": 1013}).json()[0]["time_offset"] == 6.5
+    [slab] = client.get(f"{url}/slab", params={"start": 5, "end": 6}).json()
+    assert slab["obj_id"] == "a1" and slab["start"] <= 5 and slab["end"] >= 6
+    hits = client.get("/api/airspace", params=box).json()
+    assert hits[0]["sortie_id"] == sortie_id
+    assert hits[0]["objects"] == [{"obj_id": "a1", "first": 5.0, "last": 10.0, "samples": 11}]
+    assert client.get("/api/airspace", params={"min_lon": 41}).status_code == 400
+    assert client.get(f"{url}/bbox", params={"min_lon": 42, "max_lon": 41}).status_code == 400
+    assert client.get("/api/sorties/999999/bbox", params=box).status_code == 404
+
+def test_merge_events_written_at_ingest(tmp_path):
+    from src import database
+    from src.parser import AcmiParser
+    acmi = tmp_path / "merge.acmi"
+    lines = ["0,ReferenceTime=2026-02-01T10:00:00Z"]
+    for t in range(120):
+        lines.append(f"#{t}")
+        # head-on at ~500 m/s closure, passing at t=60
+        lines.append(f"b1,T={40 + t * 0.003:.4f}|42|5000" + (",Name=F-16C,Type=Air+FixedWing" if t == 0 else ""))
+        lines.append(f"r1,T={40.36 - t * 0.003:.4f}|42|5000" + (",Name=MiG-29S,Type=Air+FixedWing" if t == 0 else ""))
+    acmi.write_text("\n".join(lines) + "\n")
+    parser = AcmiParser(db_path=database.DB_PATH)
+    parser.parse_file(str(acmi))
+    url = f"/api/sorties/{parser.sortie_id}"
+    events = client.get(f"{url}/events").json()
+    assert [(e["event_type"], e["time_offset"]) for e in events] == [("Proximity", 23.0), ("Merge", 60.0)]
+    assert json.loads(events[1]["object_ids"]) == ["b1", "r1"]
+    result = client.get(f"{url}/proximity", params={"within_nm": 5}).json()
+    assert result["merges"][0]["time_offset"] == 60 and result["intervals"][0]["start"] == 42
+    series = client.get(f"{url}/proximity/b1/r1").json()
+    assert len(series["range_m"]) == 120 and series["range_m"][60] < 100
+    assert client.get(f"{url}/proximity/b1/nope").status_code == 404
+
+def test_sorties_list_ingest_stats_and_sorts_by_them(tmp_path):
+    short, long = _ingest(tmp_path, frames=30), _ingest(tmp_path, frames=80)
+    listed = client.get("/api/sorties", params={"sort": "sample_count", "order": "desc"}).json()
+    ids = [s["id"] for s in listed]
+    assert ids.index(long) < ids.index(short)
+    by_id = {s["id"]: s for s in listed}
+    assert by_id[long]["duration"] == 39.5 and by_id[long]["sample_count"] == 80
+    assert by_id[long]["max_alt"] == 1079 and by_id[long]["max_ias"] == 250 and by_id[long]["max_g"] is None
+    # 0.01 deg of longitude at 42.5N per frame
+    assert by_id[short]["distance_m"] == pytest.approx(29 * 822.3, rel=1e-3)
+    ascending = [s["id"] for s in client.get("/api/sorties", params={"sort": "sample_count", "order": "asc"}).json()]
+    assert ascending.index(short) < ascending.index(long)
+    assert client.get("/api/sorties", params={"sort": "raw"}).status_code == 400
@@ -0,0 +1,45 @@
+import sqlite3
+import pytest
+from src.database import ConnectionPool
+
+
+def test_pool_reuses_configured_connections(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=2)
+    conn = pool.acquire()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+    assert isinstance(conn.execute("SELECT 1 AS one").fetchone(), sqlite3.Row)
+    pool.release(conn)
+    assert pool.acquire() is conn
+    assert pool.created == 1
+    pool.release(conn)
+    pool.close()
+
+
+def test_pool_rolls_back_and_bounds_connections(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=2, timeout=0.05)
+    a = pool.acquire()
+    a.execute("CREATE TABLE t (x INTEGER)")
+    a.commit()
+    a.execute("INSERT INTO t VALUES (1)")
+    b = pool.acquire()
+    with pytest.raises(sqlite3.OperationalError):
+        pool.acquire()
+    # an uncommitted write is rolled back when the connection is returned
+    pool.release(a)
+    assert pool.acquire() is a
+    assert a.execute("SELECT count(*) FROM t").fetchone()[0] == 0
+    pool.release(a)
+    pool.release(b)
+    pool.close()
+    assert pool.created == 0
+
+
+def test_connection_released_after_close_is_closed(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=2)
+    conn = pool.acquire()
+    pool.close()
+    pool.release(conn)
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+    assert pool.created == 0
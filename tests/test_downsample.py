@@ -0,0 +1,83 @@
+import math
+import numpy as np
+from src import downsample as sampling
+
+
+def _legacy(rows, downsample):
+    # the per-row loop the telemetry endpoints used before src/downsample.py
+    def num(v):
+        return v if isinstance(v, (int, float)) and math.isfinite(v) else 0.0
+    kept, last_bucket, last = [], None, None
+    for i, r in enumerate(rows):
+        is_event = False
+        if last:
+            if abs(num(r["g_force"]) - num(last["g_force"])) >= 1.5 or num(r["g_force"]) >= 4:
+                is_event = True
+            if abs(num(r["alt"]) - num(last["alt"])) >= 200:
+                is_event = True
+            if abs(num(r["ias"]) - num(last["ias"])) >= 80:
+                is_event = True
+            if abs(num(r["yaw"]) - num(last["yaw"])) >= 45 or abs(num(r["pitch"]) - num(last["pitch"])) >= 30 \
+                    or abs(num(r["roll"]) - num(last["roll"])) >= 60:
+                is_event = True
+        bucket = int(num(r["time_offset"]) / downsample)
+        if bucket != last_bucket or is_event:
+            kept.append(i)
+            last_bucket = bucket
+        last = r
+    return kept
+
+
+def _rows(n=2000, seed=3):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(n):
+        rows.append({"obj_id": "1", "time_offset": i * 0.2, "alt": float(rng.normal(3000, 120)),
+                     "ias": float(rng.normal(300, 30)), "g_force": float(rng.normal(1.5, 0.8)) if i % 50 else None,
+                     "roll": float(rng.normal(0, 25)), "pitch": float(rng.normal(0, 10)), "yaw": float(rng.uniform(0, 60))})
+    return rows
+
+
+def test_bucket_mode_matches_legacy_loop():
+    rows = _rows()
+    keep = sampling.select(sampling.columns_from_rows(rows), downsample=2.0)
+    assert keep.tolist() == _legacy(rows, 2.0)
+
+
+def test_lttb_and_minmax_respect_budget_and_keep_events():
+    t = np.arange(10000) * 0.1
+    cols = {"time_offset": t, "alt": 3000 + 500 * np.sin(t / 20), "g_force": np.ones_like(t)}
+    cols["g_force"][5000] = 6.0
+    for mode in (sampling.MODE_LTTB, sampling.MODE_MINMAX):
+        keep = sampling.select(cols, target_points=200, mode=mode)
+        assert 100 <= len(keep) <= 205
+        assert keep[0] == 0 and keep[-1] == len(t) - 1
+        assert 5000 in keep
+        assert (np.diff(keep) > 0).all()
+
+
+def test_multi_object_input_is_downsampled_per_object():
+    t = np.repeat(np.arange(100, dtype=float), 2)
+    cols = {"time_offset": t, "alt": np.zeros_like(t), "obj_id": np.array(["a", "b"] * 100, dtype=object)}
+    keep = sampling.select(cols, downsample=10.0)
+    assert sorted(set(cols["obj_id"][keep])) == ["a", "b"]
+    assert len(keep) == 20
+
+
+def test_lttb_matches_sequential_reference():
+    rng = np.random.default_rng(7)
+    x = np.cumsum(rng.uniform(0.1, 1.0, 3000))
+    y = np.cumsum(rng.normal(0, 1, 3000))
+    n_out = 150
+    # textbook sequential LTTB
+    every = (len(x) - 2) / (n_out - 2)
+    ref, a = [0], 0
+    for i in range(n_out - 2):
+        s, e = int(i * every) + 1, int((i + 1) * every) + 1
+        ns, ne = e, min(int((i + 2) * every) + 1, len(x) - 1)
+        nx, ny = (x[ns:ne].mean(), y[ns:ne].mean()) if ne > ns else (x[-1], y[-1])
+        area = np.abs((x[a] - nx) * (y[s:e] - y[a]) - (x[a] - x[s:e]) * (ny - y[a]))
+        a = s + int(np.argmax(area))
+        ref.append(a)
+    ref.append(len(x) - 1)
+    assert sampling.lttb_indices(x, y, n_out).tolist() == ref
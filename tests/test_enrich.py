@@ -0,0 +1,98 @@
+import json
+import sqlite3
+import numpy as np
+import pytest
+from src.db_init import init_db
+from src.parser import AcmiParser
+from src import enrich, stats
+
+
+def test_standard_atmosphere():
+    assert enrich.speed_of_sound(np.array([0.0, 11000.0, 15000.0])).tolist() == pytest.approx([340.29, 295.07, 295.07], abs=0.01)
+    assert enrich.isa_density_ratio(np.array([0.0, 5000.0, 11000.0, 15000.0])).tolist() == pytest.approx(
+        [1.0, 0.6009, 0.2971, 0.1590], abs=1e-3)
+
+
+def test_rates_from_a_climbing_turn():
+    t = np.arange(0, 120, 0.5)
+    # 200 m/s, 3 deg/s right turn, 10 m/s climb, around 42N 41E
+    course = np.radians(350 + 3 * t)
+    north = np.cumsum(200 * np.cos(course)) * 0.5
+    east = np.cumsum(200 * np.sin(course)) * 0.5
+    lat = 42 + north / 111040.0
+    lon = 41 + east / (111040.0 * np.cos(np.radians(lat)))
+    nan = np.full(len(t), np.nan)
+    ias = nan.copy()
+    ias[::20] = 150.0
+    track = {"time_offset": t, "lat": lat, "lon": lon, "alt": 3000 + 10 * t, "yaw": nan, "heading": nan,
+             "ias": ias, "g_force": nan, "tas": nan, "mach": nan, "fuel_remaining": nan}
+    out = enrich.derive(track)
+    inner = slice(5, -5)
+    assert out["ground_speed"][inner] == pytest.approx(200, rel=0.01)
+    assert out["vertical_speed"][inner] == pytest.approx(10, rel=1e-6)
+    # course wraps through north without a jump
+    assert out["turn_rate"][inner] == pytest.approx(3, abs=0.05)
+    assert (out["ias"] == 150).all() and np.isnan(out["g_force"]).all()
+    assert out["tas"] == pytest.approx(150 / np.sqrt(enrich.isa_density_ratio(track["alt"])))
+    assert out["mach"] == pytest.approx(out["tas"] / enrich.speed_of_sound(track["alt"]))
+    assert out["specific_energy"][0] == pytest.approx(3000 + out["tas"][0] ** 2 / (2 * enrich.G0))
+
+
+def test_ingest_stores_recorded_air_data_without_defaults(tmp_path):
+    acmi = tmp_path / "air.acmi"
+    lines = ["0,ReferenceTime=2026-02-01T10:00:00Z"]
+    for t in range(30):
+        lines.append(f"#{t}")
+        props = ",Name=F-16C,Type=Air+FixedWing" if t == 0 else ""
+        if t == 10:
+            props += ",IAS=180,TAS=230,G=4.5,FuelWeight=2500"
+        lines.append(f"a,T={41 + t * 0.002}|42|{5000 + 5 * t}|0|0|90{props}")
+    acmi.write_text("\n".join(lines) + "\n")
+    db = str(tmp_path / "flight.db")
+    init_db(db)
+    parser = AcmiParser(db_path=db)
+    parser.parse_file(str(acmi))
+    conn = sqlite3.connect(db)
+    rows = conn.execute("SELECT ias, g_force, tas, fuel_remaining, mach, ground_speed, vertical_speed, turn_rate "
+                        "FROM telemetry ORDER BY time_offset").fetchall()
+    conn.close()
+    # nothing recorded yet: no made-up IAS or G; TAS from ground speed
+    assert rows[0][:2] == (None, None) and rows[0][2] == pytest.approx(rows[0][5])
+    assert rows[29][:4] == (180, 4.5, 230, 2500)
+    assert rows[29][4] == pytest.approx(230 / enrich.speed_of_sound(np.array(5145.0))[()], rel=1e-6)
+    assert rows[15][5] == pytest.approx(0.002 * 82862, rel=0.01) and rows[15][6] == pytest.approx(5) and rows[15][7] == 0
+
+
+def test_chunked_rows_match_whole_track_derivation():
+    rng = np.random.default_rng(7)
+    n = 700
+    t = np.cumsum(rng.uniform(0.1, 0.6, n))
+    lat = 42 + np.cumsum(rng.normal(0, 1e-4, n))
+    lon = 41 + np.cumsum(rng.normal(0, 1e-4, n))
+    alt = 3000 + np.cumsum(rng.normal(0, 5, n))
+    heading = np.where(rng.random(n) < 0.2, np.nan, rng.uniform(0, 360, n))
+    ias = np.where(rng.random(n) < 0.95, np.nan, rng.uniform(100, 300, n))
+    rows = [(1, "a", t[i], lat[i], lon[i], alt[i], None, None, None, None, None,
+             None if np.isnan(heading[i]) else heading[i], None if np.isnan(ias[i]) else ias[i],
+             None, None, None, None, None, i) for i in range(n)]
+
+    deriver = enrich.TrackDeriver(chunk=50)
+    out = []
+    for i, row in enumerate(rows):
+        out += deriver.add(row)
+        if i in (120, 400):
+            # as a parse checkpoint does: write what is ready, carry the rest through JSON
+            out += deriver.ready()
+            deriver = enrich.TrackDeriver(chunk=50, state=json.loads(json.dumps(deriver.state())))
+    out += deriver.finish()
+
+    assert [r[-1] for r in out] == list(range(n)) and all(len(r) == 23 for r in out)
+    nan = np.full(n, np.nan)
+    whole = enrich.derive({"time_offset": t, "lat": lat, "lon": lon, "alt": alt, "roll": nan, "pitch": nan, "yaw": nan,
+                           "u": nan, "v": nan, "heading": heading, "ias": ias, "g_force": nan, "tas": nan, "mach": nan,
+                           "fuel_remaining": nan})
+    got = np.array([r[12:21] for r in out], dtype=np.float64)
+    for i, name in enumerate(enrich.DERIVED):
+        np.testing.assert_allclose(got[:, i], whole[name], rtol=1e-9, err_msg=name)
+    assert deriver.stats.sample_count == n and deriver.stats.object_count == 1
+    assert deriver.stats.distance_m == pytest.approx(stats.path_length(lat, lon, alt))
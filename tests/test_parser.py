@@ -41,5 +41,112 @@ def test_acmi_parser_integrity():
     if os.path.exists(test_db): os.remove(test_db)
     if os.path.exists(test_acmi): os.remove(test_acmi)
 
+def _dump(db_path):
+    conn = sqlite3.connect(db_path)
+    out = {}
+    for table in ["objects", "events", "global_props"]:
+        out[table] = conn.execute(f"SELECT * FROM {table} ORDER BY id").fetchall()
+    # telemetry ids follow when rows leave the deriver (src/enrich.py), which checkpoints move
+    out["telemetry"] = [row[1:] for row in conn.execute("SELECT * FROM telemetry ORDER BY obj_id, time_offset")]
+    conn.close()
+    return out
+
+
+def _multi_acmi(tmp_path):
+    acmi = tmp_path / "multi.acmi"
+    lines = ["0,ReferenceTime=2026-02-01T10:00:00Z,ReferenceLongitude=40,ReferenceLatitude=41",
+             "0,Event=Message|1|hello"]
+    for t in range(200):
+        lines.append(f"#{t:.2f}")
+        lines.append(f"1,T={t * 0.001}|{'0.5' if t == 0 else ''}|{1000 + t}|{t % 30}|2|90" + (",Name=F-16C,Type=Air+FixedWing,IAS=300" if t == 0 else f",G={1 + t % 5}"))
+        lines.append(f"2,T={'0.7' if t == 0 else ''}|{t * 0.002}|2000" + (",Name=Su-27,Type=Air+FixedWing" if t == 0 else ""))
+    lines.append("-2")
+    acmi.write_text("\n".join(lines) + "\n")
+    return acmi
+
+
+def test_parallel_parse_matches_sequential(tmp_path):
+    acmi = _multi_acmi(tmp_path)
+    dumps = []
+    for workers in (1, 2):
+        db = str(tmp_path / f"w{workers}.db")
+        init_db(db)
+        AcmiParser(db_path=db, workers=workers).parse_file(str(acmi))
+        dumps.append(_dump(db))
+    assert dumps[0]["telemetry"]
+    assert dumps[0] == dumps[1]
+
+
+def test_omitted_coordinates_are_not_offset_twice(tmp_path):
+    from src.parser import merge_coords
+    # lon/lat left out of T= keep the previous absolute value; only transmitted ones get the reference added
+    first = merge_coords([0.5, 0.25, 1000.0], None, 40.0, 41.0)
+    assert first[:3] == (40.5, 41.25, 1000.0)
+    assert merge_coords([None, None, 1001.0], first, 40.0, 41.0)[:3] == (40.5, 41.25, 1001.0)
+    assert merge_coords([0.75, None, None], first, 40.0, 41.0)[:3] == (40.75, 41.25, 1000.0)
+
+    acmi = tmp_path / "reference.acmi"
+    acmi.write_text("0,ReferenceTime=2026-02-01T10:00:00Z,ReferenceLongitude=40,ReferenceLatitude=41\n"
+                    "#0\na,T=0.5|0.25|1000,Name=F-16C,Type=Air+FixedWing\n#1\na,T=||1001\n#2\na,T=0.75||\n#3\na,T=|0.5|1003|5\n")
+    db = str(tmp_path / "reference.db")
+    init_db(db)
+    AcmiParser(db_path=db).parse_file(str(acmi))
+    conn = sqlite3.connect(db)
+    rows = conn.execute("SELECT lon, lat, alt FROM telemetry ORDER BY time_offset").fetchall()
+    conn.close()
+    assert rows == [(40.5, 41.25, 1000), (40.5, 41.25, 1001), (40.75, 41.25, 1001), (40.75, 41.5, 1003)]
+
+
+def test_decode_parallel_preserves_order_across_chunks():
+    from src.parallel import decode_parallel
+    from src.parser import decode_line
+    lines = []
+    for t in range(50):
+        lines += [f"#{t}", f"1,T={t}|{t}|{t}", f"2,T=||{t}|1|2|3"]
+    expected = [decode_line(l) for l in lines]
+    assert list(decode_parallel(iter(lines), decode_line, workers=2, chunk_lines=7)) == expected
+
+
+class _Crash(BaseException):
+    """Stands in for the process dying: the parser's error handling does not see it."""
+
+
+def test_interrupted_parse_resumes_from_checkpoint(tmp_path, monkeypatch):
+    from src import archive, parser
+    acmi = _multi_acmi(tmp_path)
+    clean = str(tmp_path / "clean.db")
+    init_db(clean)
+    AcmiParser(db_path=clean).parse_file(str(acmi))
+
+    db = str(tmp_path / "resumed.db")
+    init_db(db)
+    conn = sqlite3.connect(db)
+    conn.execute("INSERT INTO parse_jobs (id, file_name, status) VALUES ('j', 'multi.acmi', 'queued')")
+    conn.commit()
+    decode_line = parser.decode_line
+    decoded = []
+
+    def crash_midway(line, with_raw=True):
+        decoded.append(line)
+        if len(decoded) == 400:
+            raise _Crash()
+        return decode_line(line, with_raw)
+
+    monkeypatch.setattr(parser, "decode_line", crash_midway)
+    with pytest.raises(_Crash):
+        AcmiParser(db_path=db, batch_size=10, txn_rows=50).parse_file(str(acmi), job_id="j")
+    monkeypatch.undo()
+    assert 0 < conn.execute("SELECT line_no FROM parse_checkpoints WHERE job_id = 'j'").fetchone()[0] < 400
+
+    AcmiParser(db_path=db, batch_size=10, txn_rows=50).parse_file(str(acmi), job_id="j")
+    assert conn.execute("SELECT status FROM parse_jobs WHERE id = 'j'").fetchone()[0] == "done"
+    assert conn.execute("SELECT count(*) FROM parse_checkpoints").fetchone()[0] == 0
+    assert _dump(db) == _dump(clean)
+    line_nos = [r[0] for r in conn.execute("SELECT raw_line FROM telemetry ORDER BY id")]
+    assert (archive.ArchiveReader(archive.archive_path(db, 1)).lines(line_nos)
+            == archive.ArchiveReader(archive.archive_path(clean, 1)).lines(line_nos))
+    conn.close()
+
+
 if __name__ == "__main__":
     pytest.main([__file__])
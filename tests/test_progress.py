@@ -0,0 +1,43 @@
+import asyncio
+from src import progress
+
+
+def test_watch_coalesces_updates_and_ends_on_terminal_status():
+    async def run():
+        bus = progress.ProgressBus(throttle=0.05)
+        bus.publish("j", status="running", progress_pct=0)
+        seen = []
+
+        async def consume():
+            async for state in bus.watch("j"):
+                seen.append(state)
+
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.01)
+        # published while the first update is being throttled: sent as one
+        for pct in (5, 10, 15):
+            bus.publish("j", progress_pct=pct)
+        await asyncio.sleep(0.1)
+        bus.publish("j", status="done", progress_pct=100)
+        # progress still in flight after the job finished is dropped
+        bus.publish("j", progress_pct=95)
+        await asyncio.wait_for(task, 1)
+        assert [s["progress_pct"] for s in seen] == [0, 15, 100]
+        assert bus.get("j") == {"job_id": "j", "status": "done", "progress_pct": 100}
+
+    asyncio.run(run())
+
+
+def test_watch_refreshes_jobs_the_bus_does_not_know():
+    async def run():
+        bus = progress.ProgressBus(throttle=0)
+        states = iter([{"status": "running"}, {"status": "running"}, {"status": "done"}])
+
+        async def refresh():
+            return next(states)
+
+        seen = [s async for s in bus.watch("x", initial={"status": "queued"}, refresh=refresh, idle_seconds=0.01)]
+        # an unchanged refresh comes through as None (keep-alive)
+        assert seen == [{"status": "queued"}, {"status": "running"}, None, {"status": "done"}]
+
+    asyncio.run(run())
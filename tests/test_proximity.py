@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from src import proximity
+
+# meters per degree of longitude at 42N on WGS84
+DEG_LON_AT_42 = np.radians(1) * 6378137.0 * np.cos(np.radians(42)) / np.sqrt(1 - 6.69437999014e-3 * np.sin(np.radians(42)) ** 2)
+
+
+def _track(t, lat, lon, alt):
+    return tuple(np.asarray(x, dtype=np.float64) * np.ones_like(t) for x in (t, lat, lon, alt))
+
+
+def test_head_on_pass_is_a_merge():
+    t = np.arange(0, 200, 0.5)
+    speed = 250.0 / DEG_LON_AT_42
+    # 40 km apart, closing at 500 m/s: pass after 80 s, 300 m vertical separation
+    tracks = {"blue": _track(t, 42.0, 40.0 + speed * t, 5000),
+              "red": _track(t, 42.0, 40.0 + 40000 / DEG_LON_AT_42 - speed * t, 5300)}
+    intervals, merges = proximity.analyze(tracks)
+    [interval] = intervals
+    # within 10 nm from 80 s - 18.52 km / 500 m/s on
+    assert interval["start"] == pytest.approx(80 - 18520 / 500, abs=1.5) and interval["end"] == pytest.approx(80 + 37, abs=1.5)
+    assert interval["min_range_m"] == pytest.approx(300, abs=20) and interval["min_range_at"] == pytest.approx(80, abs=1)
+    [merge] = merges
+    assert (merge["a"], merge["b"]) == ("blue", "red")
+    assert merge["time_offset"] == pytest.approx(80, abs=1)
+    # head-on; 300 m below at 1.5 nm is 6 degrees off the nose
+    assert merge["relative_speed_mps"] == pytest.approx(500, rel=0.01) and merge["aspect_deg"] == pytest.approx(174, abs=1)
+
+    series = proximity.pair_series(tracks, "blue", "red")
+    assert series["range_m"][0] == pytest.approx(40000, rel=1e-3)
+    assert series["ata_deg"][10] == pytest.approx(0, abs=1) and series["closure_mps"][10] == pytest.approx(500, rel=0.01)
+
+
+def test_pruned_search_matches_all_pairs():
+    rng = np.random.default_rng(7)
+    t = np.arange(0, 600, 1.0)
+    tracks = {}
+    for k in range(60):
+        lat0, lon0 = 42 + rng.uniform(-0.5, 0.5), 41 + rng.uniform(-0.5, 0.5)
+        heading = rng.uniform(0, 2 * np.pi)
+        alive = slice(int(rng.integers(0, 200)), int(rng.integers(300, 600)))
+        tracks[f"o{k:02d}"] = tuple(a[alive] for a in _track(
+            t, lat0 + 0.002 * np.cos(heading) * t, lon0 + 0.0025 * np.sin(heading) * t, 3000 + 10 * k))
+    radius = proximity.WITHIN_NM * proximity.METERS_PER_NM
+    intervals, _ = proximity.analyze(tracks)
+
+    obj_ids, grid, pos = proximity.resample(tracks)
+    with np.errstate(invalid='ignore'):
+        close = np.linalg.norm(pos[:, None] - pos[None, :], axis=-1) <= radius
+    want = {(obj_ids[i], obj_ids[j], f) for i, j, f in zip(*np.nonzero(close)) if i < j}
+    got = {(e["a"], e["b"], f) for e in intervals
+           for f in range(int(np.searchsorted(grid, e["start"])), int(np.searchsorted(grid, e["end"])) + 1)}
+    assert want and got == want
@@ -0,0 +1,96 @@
+import asyncio
+import sqlite3
+import orjson
+import pytest
+from src import realtime
+from src.db_init import init_db
+from src.parser import AcmiParser, RAW_INLINE
+from src.replay import ReplayServer
+
+
+def _recording(tmp_path):
+    acmi = tmp_path / "live.acmi"
+    lines = ["FileType=text/acmi/tacview", "FileVersion=2.2",
+             "0,ReferenceTime=2026-02-01T10:00:00Z,ReferenceLongitude=40,ReferenceLatitude=41",
+             "0,RecordingPlayerName=Maverick"]
+    for t in range(60):
+        lines.append(f"#{t * 0.5}")
+        if t == 0:
+            lines.append("a1,T=0.1|0.2|1000|0|2|90,Name=F-16C,Type=Air+FixedWing,Pilot=Viper")
+            lines.append("b2,T=0.3|0.4|0,Type=Ground+Static")
+        else:
+            lines.append(f"a1,T={0.1 + t * 0.001}||{1000 + t}")
+        if t == 30:
+            lines.append("0,Event=Message|a1|fox two")
+            lines.append("-b2")
+    acmi.write_text("\n".join(lines) + "\n")
+    return acmi
+
+
+def _telemetry(db):
+    conn = sqlite3.connect(db)
+    rows = conn.execute("SELECT obj_id, time_offset, lat, lon, alt, roll, pitch, yaw, raw FROM telemetry "
+                        "ORDER BY obj_id, time_offset").fetchall()
+    events = conn.execute("SELECT time_offset, event_type, text FROM events ORDER BY id").fetchall()
+    conn.close()
+    return rows, events
+
+
+def test_live_session_records_replayed_stream(tmp_path):
+    acmi = _recording(tmp_path)
+    parsed = str(tmp_path / "parsed.db")
+    init_db(parsed)
+    AcmiParser(db_path=parsed, raw_mode=RAW_INLINE).parse_file(str(acmi))
+
+    db = str(tmp_path / "live.db")
+    init_db(db)
+    server = ReplayServer(str(acmi), port=0, speed=200).start()
+    finished = []
+    try:
+        session = realtime.LiveSession(db, "127.0.0.1", server.server_address[1], on_finished=finished.append)
+        session.start()
+        session._thread.join(30)
+    finally:
+        server.stop()
+    assert session.status == realtime.STATUS_DONE, session.error
+    assert session.host_name == "DCS Web-Tac replay"
+    assert finished == [session.sortie_id]
+    assert _telemetry(db) == _telemetry(parsed)
+    conn = sqlite3.connect(db)
+    assert conn.execute("SELECT parse_status FROM sorties").fetchone()[0] == "done"
+    conn.close()
+    snapshot = orjson.loads(session.snapshot())
+    assert snapshot["n"] == session.frames == 60
+    # removed objects leave the live view; positions are absolute
+    assert list(snapshot["objects"]) == ["a1"]
+    assert snapshot["objects"]["a1"][:3] == pytest.approx([40.159, 41.2, 1059])
+    assert snapshot["meta"]["a1"]["pilot"] == "Viper"
+    assert session.header["pilot_name"] == "Maverick"
+
+    # kept listed for a while after finishing, then dropped
+    realtime.sessions[session.session_id] = session
+    assert realtime.get_session(session.session_id) is session
+    realtime.prune_sessions(now=session.finished_at + realtime.FINISHED_SESSION_SECONDS + 1)
+    assert session.session_id not in realtime.sessions
+
+
+def test_slow_subscriber_gets_snapshot_instead_of_backlog():
+    async def run():
+        hub = realtime.FrameHub(lambda: b"snapshot", max_pending=2)
+        fast, slow = hub.subscribe(), hub.subscribe()
+        fast_messages = hub.stream(fast)
+        assert await anext(fast_messages) == b"snapshot"
+        for i in range(5):
+            hub.publish(b"%d" % i)
+            await asyncio.sleep(0)
+            assert await anext(fast_messages) == b"%d" % i
+        hub.close(b"end")
+        await asyncio.sleep(0)
+        assert [m async for m in fast_messages] == [b"end"]
+        # the slow one never read: its backlog was dropped for a snapshot, the end message kept
+        assert [m async for m in hub.stream(slow)] == [b"snapshot", b"end"]
+        assert slow.dropped == 1
+        # late subscribers still get the final state
+        assert [m async for m in hub.stream(hub.subscribe())] == [b"snapshot", b"end"]
+
+    asyncio.run(run())
@@ -0,0 +1,64 @@
+import sqlite3
+import numpy as np
+import pytest
+from src.db_init import init_db
+from src.parser import AcmiParser
+from src import columnar, snapshot
+
+
+def _parse(tmp_path):
+    acmi = tmp_path / "scrub.acmi"
+    lines = ["0,ReferenceTime=2026-02-01T10:00:00Z"]
+    for t in range(40):
+        lines.append(f"#{t:.1f}")
+        # a turns right through north: yaw 350, 354, ... 358, 2, ...
+        lines.append(f"a,T={t * 0.01}|1|{1000 + 10 * t}|0|0|{(350 + 4 * t) % 360}"
+                     + (",Name=F-16C,Type=Air+FixedWing" if t == 0 else f",IAS={300 + t}"))
+        if 10 <= t < 20:
+            lines.append(f"b,T=2|{t * 0.02}|500" + (",Name=Su-27,Type=Air+FixedWing" if t == 10 else ""))
+    acmi.write_text("\n".join(lines) + "\n")
+    db = str(tmp_path / "flight.db")
+    init_db(db)
+    parser = AcmiParser(db_path=db)
+    parser.parse_file(str(acmi))
+    return db, parser.sortie_id
+
+
+def test_angles_take_the_short_way_round():
+    a, b, half = np.array([350.0, 10.0, 170.0]), np.array([10.0, 350.0, -170.0]), np.full(3, 0.5)
+    assert snapshot.blend("heading", a, b, half).tolist() == pytest.approx([0.0, 0.0, 180.0])
+    assert snapshot.blend("roll", a - 180, b - 180, half).tolist() == pytest.approx([-180.0, -180.0, 0.0])
+    assert snapshot.blend("alt", a, b, half).tolist() == pytest.approx([180.0, 180.0, 0.0])
+    # a missing endpoint keeps the other value
+    assert snapshot.blend("ias", np.array([np.nan, 5.0]), np.array([7.0, np.nan]), np.full(2, 0.25)).tolist() == [7.0, 5.0]
+
+
+def test_store_and_sql_snapshots_agree(tmp_path):
+    db, sortie_id = _parse(tmp_path)
+    store = columnar.open_store(db, sortie_id)
+    times = snapshot.frame_times(start=4.5, end=16.5, step=4)
+    from_store = snapshot.from_store(store, times)
+    conn = sqlite3.connect(db)
+    from_sql = snapshot.from_sql(conn, sortie_id, times)
+    conn.close()
+    assert from_store["obj_id"].tolist() == from_sql["obj_id"].tolist() == ["a", "a", "a", "b", "a", "b"]
+    for name in ("time_offset",) + snapshot.CHANNELS:
+        np.testing.assert_allclose(from_store[name], from_sql[name], equal_nan=True)
+
+    frames = snapshot.to_frames(from_store)
+    assert [f["time_offset"] for f in frames] == [4.5, 8.5, 12.5, 16.5]
+    a = frames[0]["objects"][0]
+    # between yaw 6 and 10 (samples 4 and 5 after wrapping), 1045 m
+    assert a["yaw"] == pytest.approx(8.0) and a["alt"] == pytest.approx(1045.0) and a["ias"] == pytest.approx(304.5)
+    # yaw 358 -> 2 crosses north
+    assert snapshot.from_store(store, np.array([2.5]), ["a"])["yaw"].tolist() == pytest.approx([0.0])
+    # b exists from t=10 to t=19 only
+    assert [len(f["objects"]) for f in frames] == [1, 1, 2, 2]
+    assert snapshot.from_store(store, np.array([25.0]), ["b", "missing"])["obj_id"].tolist() == []
+
+
+def test_frame_count_is_bounded():
+    assert snapshot.frame_times(t=3.0).tolist() == [3.0]
+    assert len(snapshot.frame_times(start=0, end=59.9, step=0.1)) == snapshot.MAX_FRAMES
+    with pytest.raises(ValueError):
+        snapshot.frame_times(start=0, end=60, step=0.1)
@@ -0,0 +1,64 @@
+import sqlite3
+import numpy as np
+from src.db_init import init_db
+from src.parser import AcmiParser
+from src import columnar, spatial
+
+
+def _parse(tmp_path, name, lon0):
+    acmi = tmp_path / f"{name}.acmi"
+    lines = ["0,ReferenceTime=2026-02-01T10:00:00Z"]
+    for t in range(300):
+        lines.append(f"#{t:.1f}")
+        # a flies east, b orbits in place
+        lines.append(f"a,T={lon0 + t * 0.001}|42|{1000 + t}" + (",Name=F-16C,Type=Air+FixedWing" if t == 0 else ""))
+        lines.append(f"b,T={lon0 + 0.05 * np.cos(t / 20):.5f}|{42.5 + 0.05 * np.sin(t / 20):.5f}|5000"
+                     + (",Name=Su-27,Type=Air+FixedWing" if t == 0 else ""))
+    acmi.write_text("\n".join(lines) + "\n")
+    parser = AcmiParser(db_path=str(tmp_path / "flight.db"))
+    parser.parse_file(str(acmi))
+    return parser.sortie_id
+
+
+def test_segments_cover_every_sample_and_gap():
+    n = 200
+    t = np.arange(n, dtype=float)
+    lon, lat, alt = np.sin(t / 7), np.cos(t / 11), np.full(n, np.nan)
+    boxes = spatial.segment_boxes(t, lon, lat, alt, 0, n, size=64)
+    assert len(boxes[0]) == 4
+    for i in range(n):
+        # sample i lies in its own segment's box, segment boundaries in both neighbours
+        for k in {i // 64, (i - 1) // 64} if i % 64 == 0 and i else {i // 64}:
+            assert boxes[0][k] <= t[i] <= boxes[1][k]
+            assert boxes[2][k] <= lon[i] <= boxes[3][k] and boxes[4][k] <= lat[i] <= boxes[5][k]
+    # unknown altitude matches any altitude
+    assert (boxes[6] == -spatial.UNBOUNDED).all() and (boxes[7] == spatial.UNBOUNDED).all()
+
+
+def test_index_finds_exactly_the_samples_in_a_box(tmp_path):
+    db = str(tmp_path / "flight.db")
+    init_db(db)
+    first, second = _parse(tmp_path, "one", 40.0), _parse(tmp_path, "two", 41.0)
+    conn = sqlite3.connect(db)
+    assert conn.execute("SELECT count(*) FROM telemetry_rtree").fetchone()[0] == 2 * 2 * 5
+    box = (40.05, 40.1, 41.9, 42.1, None, 2000)
+    spans = spatial.candidates(conn, box)
+    assert {key[0] for key in spans} == {first}
+    store = columnar.open_store(db, first)
+    columns = spatial.store_rows(store, {o: r for (_, o), r in spans.items()}, columnar.CHANNELS)
+    keep = spatial.inside_mask(columns, box)
+    brute = conn.execute("SELECT obj_id, time_offset FROM telemetry WHERE sortie_id = ? AND lon BETWEEN 40.05 AND 40.1 "
+                         "AND lat BETWEEN 41.9 AND 42.1 AND alt <= 2000 ORDER BY obj_id, time_offset",
+                         (first,)).fetchall()
+    assert list(zip(columns['obj_id'][keep].tolist(), columns['time_offset'][keep].tolist())) == brute
+    assert len(brute) == 51
+
+    slab = spatial.slab(conn, second, start=100, end=120)
+    assert [s["obj_id"] for s in slab] == ["a", "b"]
+    assert slab[0]["start"] <= 100 and slab[0]["end"] >= 120 and slab[1]["min_alt"] == 5000
+
+    spatial.delete_index(conn, first)
+    assert {key[0] for key in spatial.candidates(conn, (None,) * 6)} == {second}
+    assert spatial.index_missing(conn, db) == 1
+    assert {key[0] for key in spatial.candidates(conn, (None,) * 6)} == {first, second}
+    conn.close()
@@ -0,0 +1,37 @@
+import sqlite3
+import numpy as np
+import pytest
+from src.db_init import init_db
+from src.parser import AcmiParser
+from src import stats
+
+
+def test_ingest_stats_match_a_recount_from_telemetry(tmp_path):
+    acmi = tmp_path / "stats.acmi"
+    lines = ["0,ReferenceTime=2026-02-01T10:00:00Z"]
+    for t in range(60):
+        lines.append(f"#{10 + t}")
+        lines.append(f"a,T={41 + t * 0.001}|42|{3000 + 10 * t}" + (",Name=F-16C,Type=Air+FixedWing,G=1" if t == 0 else "")
+                     + (",G=7.5,IAS=300" if t == 30 else ""))
+        if 20 <= t < 40:
+            lines.append(f"b,T={41 + t * 0.004}|42|500" + (",Name=Su-25T,Type=Air+FixedWing,G=3,IAS=200" if t == 20 else ""))
+    acmi.write_text("\n".join(lines) + "\n")
+    db = str(tmp_path / "flight.db")
+    init_db(db)
+    parser = AcmiParser(db_path=db)
+    parser.parse_file(str(acmi))
+    conn = sqlite3.connect(db)
+    query = f"SELECT {', '.join(stats.STAT_COLUMNS)} FROM sortie_stats WHERE sortie_id = ?"
+    row = conn.execute(query, (parser.sortie_id,)).fetchone()
+    assert row[:3] == (59, 2, 80)
+    assert row[3:6] == (7.5, 3590, 300)
+    tracks = [np.array(conn.execute("SELECT lat, lon, alt FROM telemetry WHERE obj_id = ? ORDER BY time_offset",
+                                    (obj_id,)).fetchall()) for obj_id in ("a", "b")]
+    assert row[6] == pytest.approx(sum(stats.path_length(*track.T) for track in tracks))
+    assert row[6] == pytest.approx(59 * np.hypot(0.001 * 82862, 10) + 19 * 0.004 * 82862, rel=1e-3)
+    assert stats.compute(conn, parser.sortie_id).values() == pytest.approx(row)
+
+    stats.delete_stats(conn, parser.sortie_id)
+    assert stats.stats_missing(conn) == 1 and stats.stats_missing(conn) == 0
+    assert conn.execute(query, (parser.sortie_id,)).fetchone() == pytest.approx(row)
+    conn.close()
@@ -0,0 +1,40 @@
+import gzip
+import zipfile
+from src.stream import open_acmi
+
+LINES = ["0,MissionTitle=Stream_Test", "#0.00", "1,T=1|2|3,Name=Jet,Type=Air+FixedWing"] * 2000
+
+
+def _write_variants(tmp_path):
+    text = "\n".join(LINES) + "\n"
+    plain = tmp_path / "rec.acmi"
+    plain.write_text(text, encoding="utf-8")
+    gz = tmp_path / "rec.acmi.gz"
+    with gzip.open(gz, "wt", encoding="utf-8") as f:
+        f.write(text)
+    zp = tmp_path / "rec.zip"
+    with zipfile.ZipFile(zp, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        z.writestr("readme.txt", "not a recording")
+        z.writestr("rec.acmi", text)
+    return [plain, gz, zp]
+
+
+def test_all_formats_yield_same_lines_and_reach_full_progress(tmp_path):
+    for path in _write_variants(tmp_path):
+        with open_acmi(str(path)) as stream:
+            assert stream.fraction() == 0.0
+            got = [line.rstrip("\n") for line in stream]
+            assert got == LINES
+            assert stream.fraction() == 1.0
+
+
+def test_resume_from_line_position(tmp_path):
+    for path in _write_variants(tmp_path):
+        with open_acmi(str(path)) as stream:
+            for i, _ in enumerate(stream):
+                if i == 3001:
+                    start = stream.position
+                    break
+        with open_acmi(str(path), start) as stream:
+            assert [line.rstrip("\n") for line in stream] == LINES[3001:]
+            assert stream.fraction() == 1.0
@@ -0,0 +1,31 @@
+from src.tokenizer import (tokenize_line, iter_logical_lines, AcmiRecord,
+                           KIND_GLOBAL, KIND_FRAME, KIND_REMOVE, KIND_OBJECT)
+
+
+def test_object_line_with_omitted_coords():
+    rec = tokenize_line("a1,T=1.5||300|10|2|90,IAS=250,G=bad,Name=F-16C")
+    assert rec.kind == KIND_OBJECT
+    assert rec.obj_id == "a1"
+    assert rec.coords == [1.5, None, 300.0, 10.0, 2.0, 90.0]
+    assert rec.t == "1.5||300|10|2|90"
+    assert rec.get("IAS") == 250.0
+    assert rec.get("G", 1.0) == 1.0
+    assert rec.get("Name") == "F-16C"
+
+
+def test_escaped_commas_and_continuation():
+    lines = ["0,Comment=first\\, second", "0,Briefing=line one\\", "line two", "#2.5", "-a1"]
+    recs = [tokenize_line(l) for l in iter_logical_lines(lines)]
+    assert recs[0].kind == KIND_GLOBAL
+    assert recs[0].props == {"Comment": "first, second"}
+    assert recs[1].props == {"Briefing": "line one\nline two"}
+    assert recs[2].kind == KIND_FRAME and recs[2].time == 2.5
+    assert recs[3].kind == KIND_REMOVE and recs[3].obj_id == "a1"
+
+
+def test_record_reuse_resets_fields():
+    rec = AcmiRecord()
+    tokenize_line("1,T=1|2|3,Name=A", rec)
+    tokenize_line("#1", rec)
+    assert rec.kind == KIND_FRAME
+    assert rec.coords is None and rec.props == {}
@@ -0,0 +1,80 @@
+import sqlite3
+import time
+from src import db_init, worker
+
+
+def _db(tmp_path):
+    db = str(tmp_path / "jobs.db")
+    db_init.init_db(db)
+    return db, sqlite3.connect(db)
+
+
+def test_claim_is_exclusive_and_fifo(tmp_path):
+    db, conn = _db(tmp_path)
+    worker.enqueue(conn, "a", "a.acmi", "/x/a.acmi")
+    worker.enqueue(conn, "b", "b.acmi", "/x/b.acmi")
+    conn.commit()
+    other = sqlite3.connect(db)
+    assert worker.claim_job(conn, "w1") == ("a", "/x/a.acmi", "a.acmi")
+    assert worker.claim_job(other, "w2") == ("b", "/x/b.acmi", "b.acmi")
+    assert worker.claim_job(conn, "w1") is None
+    rows = dict(conn.execute("SELECT id, worker FROM parse_jobs").fetchall())
+    assert rows == {"a": "w1", "b": "w2"}
+
+
+def test_stale_jobs_are_requeued_then_failed(tmp_path):
+    _, conn = _db(tmp_path)
+    worker.enqueue(conn, "a", "a.acmi", "/x/a.acmi")
+    conn.commit()
+    for attempt in range(1, worker.MAX_ATTEMPTS + 1):
+        assert worker.claim_job(conn, "dead") is not None
+        conn.execute("UPDATE parse_jobs SET heartbeat_at = datetime('now', '-1 hour')")
+        assert worker.recover_stale(conn, stale_after=60) == ["a"]
+    status, error = conn.execute("SELECT status, error FROM parse_jobs").fetchone()
+    assert status == "failed" and "worker lost" in error
+    # a fresh heartbeat is left alone
+    worker.enqueue(conn, "b", "b.acmi", "/x/b.acmi")
+    worker.claim_job(conn, "live")
+    assert worker.recover_stale(conn, stale_after=60) == []
+
+
+def test_worker_parses_in_child_process(tmp_path):
+    db, conn = _db(tmp_path)
+    acmi = tmp_path / "w.acmi"
+    acmi.write_text("0,ReferenceTime=2026-02-01T10:00:00Z\n#0\na1,T=41|42|1000,Name=F-16C,Type=Air+FixedWing\n#1\na1,T=41.1|42|1010\n")
+    worker.enqueue(conn, "ok", "w.acmi", str(acmi))
+    worker.enqueue(conn, "missing", "m.acmi", str(tmp_path / "nope.acmi"))
+    conn.commit()
+    finished = []
+    reported = []
+    w = worker.Worker(db_path=db, concurrency=2, on_finished=lambda job_id, sortie_id: finished.append(job_id),
+                      on_progress=lambda job_id, **fields: reported.append((job_id, fields.get("status"))))
+    assert w.run_once(conn) == 2
+    deadline = time.time() + 60
+    while w.running and time.time() < deadline:
+        time.sleep(0.1)
+        w.run_once(conn)
+    assert sorted(finished) == ["missing", "ok"]
+    jobs = {r[0]: r[1:] for r in conn.execute("SELECT id, status, sortie_id FROM parse_jobs")}
+    assert jobs["ok"][0] == "done"
+    assert jobs["missing"][0] == "failed"
+    assert [status for job_id, status in reported if job_id == "ok" and status] == ["running", "done"]
+    assert conn.execute("SELECT count(*) FROM telemetry WHERE sortie_id = ?", (jobs["ok"][1],)).fetchone()[0] == 2
+
+
+def test_standalone_supervisor_writes_throttled_progress(tmp_path):
+    db, conn = _db(tmp_path)
+    worker.enqueue(conn, "a", "a.acmi", "/x/a.acmi")
+    conn.commit()
+    worker.claim_job(conn, "w1")
+    w = worker.Worker(db_path=db)
+    queue = w._progress_queue()
+    for pct in (5, 10, 15):
+        queue.put(("a", pct))
+    deadline = time.time() + 10
+    while conn.execute("SELECT progress_pct FROM parse_jobs").fetchone()[0] != 5 and time.time() < deadline:
+        time.sleep(0.05)
+    # 10 and 15 arrive within the write interval and are skipped
+    time.sleep(0.3)
+    assert conn.execute("SELECT progress_pct FROM parse_jobs").fetchone()[0] == 5
+    queue.put(None)
@@ -0,0 +1,32 @@
+import sqlite3
+from src.writer import BatchWriter
+
+
+def _conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE global_props (id INTEGER PRIMARY KEY AUTOINCREMENT, sortie_id INTEGER, key TEXT, value TEXT)")
+    return conn
+
+
+def test_batch_writer_flushes_in_batches():
+    conn = _conn()
+    writer = BatchWriter(conn, batch_size=3, txn_rows=3)
+    for i in range(7):
+        writer.add("global_props", (1, f"k{i}", str(i)))
+    # two full batches written, one row still buffered
+    assert writer.rows_written == 6
+    assert len(writer.buffers["global_props"]) == 1
+    writer.commit()
+    rows = conn.execute("SELECT key FROM global_props ORDER BY id").fetchall()
+    assert [r[0] for r in rows] == [f"k{i}" for i in range(7)]
+
+
+def test_batch_writer_discard_drops_uncommitted_rows():
+    conn = _conn()
+    writer = BatchWriter(conn, batch_size=2, txn_rows=100)
+    writer.add("global_props", (1, "a", "1"))
+    writer.commit()
+    writer.add("global_props", (1, "b", "2"))
+    writer.add("global_props", (1, "c", "3"))
+    writer.discard()
+    assert conn.execute("SELECT count(*) FROM global_props").fetchone()[0] == 1